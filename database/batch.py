@@ -0,0 +1,300 @@
+"""
+Batch query execution for python-pokedex
+
+Runs many queries written in the query language at once, see
+database.plan. Every distinct filter in a batch is evaluated once as a
+mask over the whole table, queries with the same filters share the
+AND of their masks, and identical queries share their result.
+
+Large batches fan out over a process pool. Workers load the database
+from its snapshot, so the numeric columns are memory-mapped from the
+same files and shared through the page cache instead of being copied
+into every task. Queries with the same filters go to the same worker.
+What the snapshot does not hold comes from the parent: the rows appended
+to the database when the pool starts, and the favorite rows with every
+batch, since they change between batches.
+
+Run as a module to time a batch, one query per line:
+    python -m database.batch <queries file> [workers]
+
+:Author:    Jose Enrico Salinas
+:Version:   20181204
+"""
+
+import concurrent.futures
+import os
+import re
+import sys
+import time
+import numpy as np
+from . import plan as query_plan
+from .database import Database
+
+# Batches smaller than this run in the calling process
+POOL_THRESHOLD = 256
+
+# The database of a worker process
+worker_database = None
+
+
+def filter_key(plan):
+    """
+    Identifies the filters of a plan, the order of the filters does not matter
+
+    Args:
+        plan(Plan): A parsed query
+    Returns:
+        tuple: the sorted keys of the plan's distinct predicates
+    """
+    return tuple(sorted(set(predicate.key() for predicate in plan.predicates)))
+
+
+def group_key(text):
+    """
+    Cheaply groups queries that likely share their filters, without parsing them
+
+    Args:
+        text(str): A lowercase query
+    Returns:
+        tuple: the sorted filter terms of the query
+    """
+    return tuple(sorted(term for term in re.split(r"[\s,]+", text)
+                        if term and not term.startswith(("sort:", "limit:"))))
+
+
+def evaluate(database, texts):
+    """
+    Runs a batch of queries in this process
+
+    Args:
+        database(DatabaseQuery): The database to be searched
+        texts(list): The queries
+    Returns:
+        list: the matching row positions of each query, None for invalid queries
+    """
+    columns, indexes = database.columns, database.indexes
+    everything = database.indices
+    masks = {}
+    filters = {}
+    results = {}
+    found = []
+    for text in texts:
+        try:
+            plan = query_plan.parse(text)
+        except ValueError:
+            found.append(None)
+            continue
+        keys = filter_key(plan)
+        result_key = (keys, plan.sort, plan.descending, plan.limit)
+        if result_key not in results:
+            if keys not in filters:
+                combined = None
+                for predicate in plan.predicates:
+                    key = predicate.key()
+                    if key not in masks:
+                        bits = predicate.bitset(columns, indexes)
+                        if bits is not None:
+                            masks[key] = bits.mask()
+                        else:
+                            masks[key] = np.zeros(len(columns["index"]), dtype=bool)
+                            masks[key][everything] = predicate.mask(columns, indexes, everything)
+                    combined = masks[key] if combined is None else combined & masks[key]
+                filters[keys] = everything if combined is None else everything[combined[everything]]
+            results[result_key] = plan.order(columns, indexes, filters[keys])
+        found.append(results[result_key])
+    return found
+
+
+class FavoriteRows():
+    """
+    Favorites already resolved to row positions by the parent process
+    Stands in for fav.Favorites in the indexes of a worker's database
+    """
+
+    def __init__(self, bits):
+        """
+        Creates the stand in
+
+        Args:
+            bits(Bitset): The rows holding favorite pokemon
+        """
+        self.bits = bits
+
+    def rows(self, keys):
+        """
+        Gets the rows holding favorite pokemon
+
+        Args:
+            keys(numpy.ndarray): The pokemon index of every row
+        Returns:
+            Bitset: the favorite rows
+        """
+        return self.bits
+
+
+def appended_rows(database):
+    """
+    Gets the rows appended to a database since it was loaded
+
+    Args:
+        database(Database): The database
+    Returns:
+        dict: maps column names to the appended values, None if there are none
+    """
+    if not database.appended:
+        return None
+    start = len(database.columns["index"]) - database.appended
+    return {name: column[start:] for name, column in database.columns.items()}
+
+
+def favorite_rows(database):
+    """
+    Resolves the favorites of a database to row positions
+
+    Args:
+        database(Database): The database
+    Returns:
+        Bitset: the favorite rows, None if the database has no favorites
+    """
+    favorites = database.indexes.get("favorites")
+    if favorites is None:
+        return None
+    return favorites.rows(database.columns["index"])
+
+
+def start_worker(address, appended=None):
+    """
+    Loads the database of a worker process
+
+    Args:
+        address(str): Address of the pokemon csv
+        appended(dict): The rows appended to the parent's database, see appended_rows
+    """
+    global worker_database
+    worker_database = Database(address)
+    if appended is not None:
+        worker_database.extend(appended)
+
+
+def evaluate_in_worker(texts, favorites=None):
+    """
+    Runs a batch of queries in a worker process
+
+    Args:
+        texts(list): The queries
+        favorites(Bitset): The favorite rows of the parent's database, None if it has none
+    Returns:
+        list: the matching row positions of each query, None for invalid queries
+    """
+    if favorites is None:
+        worker_database.indexes.pop("favorites", None)
+    else:
+        worker_database.indexes["favorites"] = FavoriteRows(favorites)
+    return evaluate(worker_database, texts)
+
+
+class BatchExecutor():
+    """
+    Runs batches of queries, over a process pool when they are large
+    """
+
+    def __init__(self, database=None, workers=None):
+        """
+        Creates a new executor, the pool starts with the first large batch
+
+        Args:
+            database(Database): The database to be searched, loads the default one if None
+            workers(int): The number of worker processes, the number of cores if None
+        """
+        self.database = database if database is not None else Database()
+        self.workers = workers if workers is not None else os.cpu_count() or 1
+        self.pool = None
+        # Appended rows the workers were started with
+        self.pool_rows = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+    def run(self, texts):
+        """
+        Runs a batch of queries
+
+        Args:
+            texts(list): The queries, e.g. ["type:fire sort:-attack limit:10", "legendary"]
+        Returns:
+            list: a DatabaseQuery for each query, None for invalid queries
+        """
+        texts = [text.lower() for text in texts]
+        if self.workers <= 1 or len(texts) < POOL_THRESHOLD:
+            found = evaluate(self.database, texts)
+        else:
+            found = self.fan_out(texts)
+        return [None if positions is None else self.database.take(positions) for positions in found]
+
+    def fan_out(self, texts):
+        """
+        Splits a batch over the worker processes
+        Queries with the same filters go to the same worker so they still
+        share their masks
+
+        Args:
+            texts(list): The lowercase queries
+        Returns:
+            list: the matching row positions of each query, None for invalid queries
+        """
+        if self.pool is not None and self.pool_rows != self.database.appended:
+            # Rows were appended since the workers started
+            self.close()
+        if self.pool is None:
+            self.pool = concurrent.futures.ProcessPoolExecutor(
+                self.workers, initializer=start_worker,
+                initargs=(self.database.database_address, appended_rows(self.database)))
+            self.pool_rows = self.database.appended
+        favorites = favorite_rows(self.database)
+
+        groups = {}
+        for number, text in enumerate(texts):
+            groups.setdefault(group_key(text), []).append(number)
+
+        # Deal the groups out largest first to even out the workers
+        chunks = [[] for _ in range(self.workers)]
+        sizes = [0] * self.workers
+        for numbers in sorted(groups.values(), key=len, reverse=True):
+            smallest = sizes.index(min(sizes))
+            chunks[smallest].extend(numbers)
+            sizes[smallest] += len(numbers)
+
+        found = [None] * len(texts)
+        futures = {self.pool.submit(evaluate_in_worker, [texts[number] for number in chunk], favorites): chunk
+                   for chunk in chunks if chunk}
+        for future in concurrent.futures.as_completed(futures):
+            for number, positions in zip(futures[future], future.result()):
+                found[number] = positions
+        return found
+
+    def close(self):
+        """
+        Stops the worker processes
+        """
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python -m database.batch <queries file> [workers]")
+        sys.exit(1)
+    with open(sys.argv[1]) as query_file:
+        queries = [line.strip() for line in query_file if line.strip()]
+    with BatchExecutor(workers=int(sys.argv[2]) if len(sys.argv) > 2 else None) as executor:
+        # Start the workers before timing
+        executor.run(queries)
+        start = time.perf_counter()
+        results = executor.run(queries)
+        elapsed = time.perf_counter() - start
+    print("{} queries in {:.3f} s, {:.0f} queries/s, {} invalid".format(
+        len(queries), elapsed, len(queries) / elapsed, sum(result is None for result in results)))
@@ -0,0 +1,261 @@
+"""
+Bitmap indexes over low cardinality columns for python-pokedex
+
+:Author:    Jose Enrico Salinas
+:Version:   20181204
+"""
+
+import numpy as np
+
+WORD = 64
+SHIFTS = np.arange(WORD, dtype=np.uint64)
+POPCOUNT = np.array([bin(byte).count("1") for byte in range(256)], dtype=np.uint8)
+
+
+class Bitset():
+    """
+    Set of row positions packed into 64 bit words
+    """
+
+    def __init__(self, words, size):
+        """
+        Creates a bitset from packed words
+
+        Args:
+            words(numpy.ndarray): uint64 words, bit i of word w is row 64*w + i
+            size(int): The number of rows the bitset covers
+        """
+        self.words = words
+        self.size = size
+
+    @classmethod
+    def from_mask(cls, mask):
+        """
+        Packs a boolean mask into a bitset
+
+        Args:
+            mask(numpy.ndarray): True for every row in the set
+        Returns:
+            Bitset: the packed mask
+        """
+        size = len(mask)
+        padded = np.zeros(-(-size // WORD) * WORD, dtype=np.uint64)
+        padded[:size] = mask
+        words = (padded.reshape(-1, WORD) << SHIFTS).sum(axis=1, dtype=np.uint64)
+        return cls(words, size)
+
+    @classmethod
+    def from_positions(cls, positions, size):
+        """
+        Creates a bitset from row positions
+
+        Args:
+            positions(numpy.ndarray): row positions in the set
+            size(int): The number of rows the bitset covers
+        Returns:
+            Bitset: the set of positions
+        """
+        mask = np.zeros(size, dtype=bool)
+        mask[positions] = True
+        return cls.from_mask(mask)
+
+    @classmethod
+    def empty(cls, size):
+        """
+        Creates a bitset without any rows
+
+        Args:
+            size(int): The number of rows the bitset covers
+        Returns:
+            Bitset: the empty set
+        """
+        return cls(np.zeros(-(-size // WORD), dtype=np.uint64), size)
+
+    def __and__(self, other):
+        return Bitset(self.words & other.words, self.size)
+
+    def __or__(self, other):
+        return Bitset(self.words | other.words, self.size)
+
+    def __sub__(self, other):
+        return Bitset(self.words & ~other.words, self.size)
+
+    def __invert__(self):
+        return Bitset.from_mask(~self.mask())
+
+    def __len__(self):
+        return int(POPCOUNT[self.words.view(np.uint8)].sum(dtype=np.int64))
+
+    def __contains__(self, position):
+        if not 0 <= position < self.size:
+            return False
+        return bool((int(self.words[position // WORD]) >> (position % WORD)) & 1)
+
+    def add(self, position):
+        """
+        Adds a row position to the set in place
+
+        Args:
+            position(int): The row position, less than size
+        """
+        self.words[position // WORD] |= np.uint64(1 << (position % WORD))
+
+    def discard(self, position):
+        """
+        Removes a row position from the set in place if it is there
+
+        Args:
+            position(int): The row position
+        """
+        if 0 <= position < self.size:
+            self.words[position // WORD] &= ~np.uint64(1 << (position % WORD))
+
+    def update(self, positions):
+        """
+        Adds many row positions to the set in place
+
+        Args:
+            positions(numpy.ndarray): The row positions, less than size
+        """
+        positions = np.asarray(positions, dtype=np.uint64)
+        np.bitwise_or.at(self.words, (positions // np.uint64(WORD)).astype(np.intp),
+                         np.uint64(1) << (positions % np.uint64(WORD)))
+
+    def resize(self, size):
+        """
+        Grows the set in place to cover more rows
+
+        Args:
+            size(int): The new number of rows, at least the current size
+        """
+        words = -(-size // WORD)
+        if words > len(self.words):
+            self.words = np.concatenate((self.words, np.zeros(words - len(self.words), dtype=np.uint64)))
+        self.size = size
+
+    def mask(self):
+        """
+        Unpacks the bitset into a boolean mask
+
+        Returns:
+            numpy.ndarray: True for every row in the set
+        """
+        bits = (self.words[:, None] >> SHIFTS) & np.uint64(1)
+        return bits.astype(bool).ravel()[:self.size]
+
+    def positions(self):
+        """
+        Gets the row positions in the set
+
+        Returns:
+            numpy.ndarray: the row positions in ascending order
+        """
+        return np.flatnonzero(self.mask())
+
+    def test(self, positions):
+        """
+        Checks which row positions are in the set
+        Only reads the words holding the given positions
+
+        Args:
+            positions(numpy.ndarray): row positions to be checked
+        Returns:
+            numpy.ndarray: True for every position in the set
+        """
+        positions = np.asarray(positions, dtype=np.uint64)
+        words = self.words[(positions // np.uint64(WORD)).astype(np.intp)]
+        return ((words >> (positions % np.uint64(WORD))) & np.uint64(1)).astype(bool)
+
+
+class BitmapIndex():
+    """
+    One bitset per distinct value of one or more columns
+    A row is in a value's bitset if any of the columns hold that value
+    """
+
+    def __init__(self, *columns):
+        """
+        Builds the bitsets
+
+        Args:
+            columns(numpy.ndarray): The columns to be indexed, equal length
+        """
+        self.size = len(columns[0])
+        values = set()
+        for column in columns:
+            values.update(column.tolist())
+        self.bitsets = {}
+        for value in values:
+            mask = np.zeros(self.size, dtype=bool)
+            for column in columns:
+                mask |= column == value
+            self.bitsets[value] = Bitset.from_mask(mask)
+
+    def extend(self, *columns):
+        """
+        Adds appended rows to the bitsets in place
+
+        Args:
+            columns(numpy.ndarray): The indexed columns including the new rows
+        """
+        start = self.size
+        self.size = len(columns[0])
+        for bits in self.bitsets.values():
+            bits.resize(self.size)
+        for column in columns:
+            added = {}
+            for offset, value in enumerate(column[start:].tolist()):
+                # Missing values never equal anything, like in __init__
+                if value == value:
+                    added.setdefault(value, []).append(start + offset)
+            for value, positions in added.items():
+                if value not in self.bitsets:
+                    self.bitsets[value] = Bitset.empty(self.size)
+                self.bitsets[value].update(positions)
+
+    def values(self):
+        """
+        Gets the indexed values
+
+        Returns:
+            list: every distinct value
+        """
+        return list(self.bitsets)
+
+    def get(self, value):
+        """
+        Gets the rows holding a value
+
+        Args:
+            value: The value to be looked up
+        Returns:
+            Bitset: the rows holding the value
+        """
+        if value in self.bitsets:
+            return self.bitsets[value]
+        return Bitset.empty(self.size)
+
+    def any(self, values):
+        """
+        Gets the rows holding any of several values
+
+        Args:
+            values(iterable): The values to be looked up
+        Returns:
+            Bitset: the union of the rows holding each value
+        """
+        result = Bitset.empty(self.size)
+        for value in values:
+            result = result | self.get(value)
+        return result
+
+    def where(self, condition):
+        """
+        Gets the rows whose value passes a condition
+
+        Args:
+            condition(callable): Takes a value and returns True to keep its rows
+        Returns:
+            Bitset: the union of the rows of every passing value
+        """
+        return self.any(value for value in self.bitsets if condition(value))
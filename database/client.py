@@ -0,0 +1,179 @@
+"""
+Client and benchmark for the python-pokedex query server, see database.server
+
+Run as a module to benchmark a running server:
+    python -m database.client [--tcp HOST:PORT | --unix PATH]
+        [--clients N] [--depth N] [--requests N]
+
+:Author:    Jose Enrico Salinas
+:Version:   20181204
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import time
+from .server import parse_address
+
+# Requests cycled through by the benchmark
+WORKLOAD = [
+    {"op": "search", "query": "type:fire sort:-speed", "limit": 10},
+    {"op": "filter", "type": "water", "legendary": False, "limit": 20},
+    {"op": "sort", "column": "attack", "query": "gen:1..3", "limit": 10},
+    {"op": "lookup", "name": "Pikachu"},
+    {"op": "lookup", "index": 149},
+    {"op": "prefix", "prefix": "char"},
+    {"op": "fuzzy", "name": "bulbasor"},
+    {"op": "search", "query": "hp>100 defense>=80", "fields": ["name", "hp", "defense"]},
+]
+
+
+class Client():
+    """
+    Sends pipelined requests over one connection
+    """
+
+    def __init__(self, reader, writer):
+        """
+        Creates a client over an open connection, see connect
+
+        Args:
+            reader(asyncio.StreamReader): The connection's input
+            writer(asyncio.StreamWriter): The connection's output
+        """
+        self.reader = reader
+        self.writer = writer
+        self.ids = itertools.count()
+        self.waiting = {}
+        self.receiver = asyncio.ensure_future(self.receive())
+
+    @classmethod
+    async def connect(cls, tcp=("127.0.0.1", 8765), unix=None):
+        """
+        Connects to a server
+
+        Args:
+            tcp(tuple): The (host, port) of the server
+            unix(str): The Unix socket path of the server, used instead of tcp if given
+        Returns:
+            Client: the connected client
+        """
+        if unix is not None:
+            reader, writer = await asyncio.open_unix_connection(unix)
+        else:
+            reader, writer = await asyncio.open_connection(*tcp)
+        return cls(reader, writer)
+
+    async def receive(self):
+        """
+        Resolves the waiting requests as their responses arrive
+        """
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                break
+            response = json.loads(line)
+            future = self.waiting.pop(response.get("id"), None)
+            if future is not None and not future.done():
+                future.set_result(response)
+        for future in self.waiting.values():
+            if not future.done():
+                future.set_exception(ConnectionError("Server closed the connection"))
+
+    async def request(self, request):
+        """
+        Sends a request without waiting for earlier ones
+
+        Args:
+            request(dict): The request, see database.server
+        Returns:
+            dict: the response
+        """
+        request = dict(request, id=next(self.ids))
+        future = asyncio.get_event_loop().create_future()
+        self.waiting[request["id"]] = future
+        self.writer.write(json.dumps(request, separators=(",", ":")).encode() + b"\n")
+        return await future
+
+    async def close(self):
+        """
+        Closes the connection
+        """
+        self.writer.close()
+        await self.receiver
+
+
+async def run_client(client, requests, depth, latencies):
+    """
+    Keeps a number of requests in flight on one connection
+
+    Args:
+        client(Client): The connection
+        requests(int): The number of requests to send
+        depth(int): The number of requests in flight at once
+        latencies(list): Collects the seconds each request took
+    """
+    workload = itertools.cycle(WORKLOAD)
+
+    async def timed(request):
+        start = time.perf_counter()
+        response = await client.request(request)
+        latencies.append(time.perf_counter() - start)
+        if not response["ok"]:
+            raise ValueError(response["error"])
+
+    in_flight = set()
+    for _ in range(requests):
+        if len(in_flight) >= depth:
+            done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+        in_flight.add(asyncio.ensure_future(timed(next(workload))))
+    if in_flight:
+        for task in (await asyncio.wait(in_flight))[0]:
+            task.result()
+
+
+async def benchmark(tcp=None, unix=None, clients=4, depth=16, requests=20000):
+    """
+    Measures the throughput and latency of a server
+
+    Args:
+        tcp(tuple): The (host, port) of the server
+        unix(str): The Unix socket path of the server, used instead of tcp if given
+        clients(int): The number of concurrent connections
+        depth(int): The number of pipelined requests in flight per connection
+        requests(int): The total number of requests
+    Returns:
+        dict: requests per second and the p50, p99 and max latencies in milliseconds
+    """
+    connections = [await Client.connect(tcp, unix) for _ in range(clients)]
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(run_client(client, requests // clients, depth, latencies)
+                           for client in connections))
+    elapsed = time.perf_counter() - start
+    for client in connections:
+        await client.close()
+
+    latencies.sort()
+    def percentile(fraction):
+        return 1000 * latencies[min(len(latencies) - 1, int(fraction * len(latencies)))]
+    return {"requests": len(latencies), "seconds": elapsed,
+            "requests_per_second": len(latencies) / elapsed,
+            "p50_ms": percentile(0.50), "p99_ms": percentile(0.99), "max_ms": 1000 * latencies[-1]}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks the pokemon query server")
+    parser.add_argument("--tcp", default="127.0.0.1:8765", help="HOST:PORT of the server")
+    parser.add_argument("--unix", help="Unix socket path of the server instead")
+    parser.add_argument("--clients", type=int, default=4, help="concurrent connections")
+    parser.add_argument("--depth", type=int, default=16, help="pipelined requests per connection")
+    parser.add_argument("--requests", type=int, default=20000, help="total requests")
+    arguments = parser.parse_args()
+    result = asyncio.run(benchmark(parse_address(arguments.tcp), arguments.unix,
+                                   arguments.clients, arguments.depth, arguments.requests))
+    print("{requests} requests in {seconds:.2f} s: {requests_per_second:.0f} requests/s, "
+          "p50 {p50_ms:.2f} ms, p99 {p99_ms:.2f} ms, max {max_ms:.2f} ms".format(**result))
@@ -5,54 +5,204 @@ Database engine for python-pokedex
 :Version:   20181204
 """
 
-import csv
-import pandas as pd
+import ast
+import numpy as np
+from . import bitmap, matchups, plan, ranges, ranking, search, similar, snapshot
+
+# Columns with a cached sorted permutation
+SORTED_COLUMNS = ("hp", "attack", "defense", "sp_attack", "sp_defense", "speed",
+                  "base_total", "weight_kg", "height_m", "capture_rate")
+
+# Columns of each bitmap index
+BITMAP_COLUMNS = {
+    "type": ("type1", "type2"),
+    "generation": ("generation",),
+    "is_legendary": ("is_legendary",),
+    "experience_growth": ("experience_growth",),
+    "base_egg_steps": ("base_egg_steps",),
+}
 
 class DatabaseQuery():
     """
     A database query for python-pokedex
-    Uses pandas library to filter and sort data
+    Keeps pokemon data as numpy column arrays and represents a query
+    as an array of row positions over those columns
     """
 
-    def __init__(self, dataframe):
+    def __init__(self, columns, indices=None, indexes=None):
         """
-        Creates a new dictionary query from a pandas dataframe
+        Creates a new database query over a set of columns
 
         Args:
-            dataframe (pandas.DataFrame): a pandas dataframe containing pokemon information
+            columns(dict): maps column names to numpy arrays of equal length
+            indices(numpy.ndarray): row positions in the query, uses every row if None
+            indexes(dict): lookup structures over the columns shared by every query
         """
-
-        self.query = []
-        self.dataframe = dataframe
-        for index, row in dataframe.iterrows():
-            data = []
-            for col in row:
-                data.append(col)
-            self.query.append(DataRow(data))
+        self.columns = columns
+        self.indexes = indexes if indexes is not None else {}
+        if indices is None:
+            indices = np.arange(len(columns["index"]))
+        self.indices = indices
 
     def __getitem__(self, key):
-        return self.query[key]
-
-    def __setitem__(self, key, value):
-        self.query[key] = value
+        if isinstance(key, slice):
+            return [self.row(position) for position in self.indices[key]]
+        return self.row(self.indices[key])
 
     def __iter__(self):
-        return iter(self.query)
+        return (self.row(position) for position in self.indices)
 
     def __len__(self):
-        return len(self.query)
+        return len(self.indices)
+
+    def row(self, position):
+        """
+        Creates a DataRow for a row position in the columns
+
+        Args:
+            position(int): The row position in the underlying columns
+        Returns:
+            DataRow: contains the pokemon data at the row position
+        """
+        return DataRow(self.columns, position)
+
+    def take(self, indices):
+        """
+        Creates a new query over the same columns
+
+        Args:
+            indices(numpy.ndarray): row positions in the new query
+        Returns:
+            DatabaseQuery: contains the rows at the given positions
+        """
+        return DatabaseQuery(self.columns, indices, self.indexes)
+
+    def select(self, positions):
+        """
+        Keeps the rows of this query found in a set of row positions
+        Rows keep their order in this query
+
+        Args:
+            positions(numpy.ndarray): row positions in the underlying columns
+        Returns:
+            DatabaseQuery: contains the rows found in both
+        """
+        mask = np.zeros(len(self.columns["index"]), dtype=bool)
+        mask[positions] = True
+        return self.take(self.indices[mask[self.indices]])
+
+    def column(self, name):
+        """
+        Gets the values of a column for the rows in this query
+
+        Args:
+            name(str): The column name
+        Returns:
+            numpy.ndarray: the column values in query order
+        """
+        return self.columns[name][self.indices]
+
+    def select_bitset(self, bitset):
+        """
+        Keeps the rows of this query found in a bitset
+        Rows keep their order in this query
+
+        Args:
+            bitset(Bitset): row positions in the underlying columns
+        Returns:
+            DatabaseQuery: contains the rows found in both
+        """
+        return self.take(self.indices[bitset.test(self.indices)])
 
     def filter_by_name(self, name):
         """
         Finds a pokemon with specified name
+        Ignores case and diacritics
 
         Args:
             name(str): The name of the pokemon
         Returns:
             DatabaseQuery: contains the pokemon row if it exists
         """
-        data_query = self.dataframe.loc[self.dataframe.name == name]
-        return DatabaseQuery(data_query)
+        return self.select(self.indexes["name"].exact(name))
+
+    def filter_by_prefix(self, prefix):
+        """
+        Finds all pokemon whose name starts with a prefix
+        Ignores case and diacritics
+
+        Args:
+            prefix(str): The start of the name
+        Returns:
+            DatabaseQuery: contains all pokemon with a matching name
+        """
+        return self.select(self.indexes["name"].prefix(prefix))
+
+    def filter_by_fuzzy_name(self, name, distance=2, limit=10):
+        """
+        Finds the pokemon whose names are closest to a misspelled name
+
+        Args:
+            name(str): The name of the pokemon
+            distance(int): The largest number of typos to accept
+            limit(int): The largest number of names to return
+        Returns:
+            DatabaseQuery: contains the closest pokemon, closest first
+        """
+        positions = self.indexes["fuzzy"].positions(name, distance, limit)
+        mask = np.zeros(len(self.columns["index"]), dtype=bool)
+        mask[self.indices] = True
+        return self.take(positions[mask[positions]])
+
+    def filter_by_range(self, column, low=None, high=None):
+        """
+        Finds all pokemon with a numeric column within a range
+        Binary searches the column's sorted permutation, see database.ranges
+
+        Args:
+            column(str): The column name, one of ranges.RANGE_COLUMNS
+            low(float): The inclusive low bound, None for no bound
+            high(float): The inclusive high bound, None for no bound
+        Returns:
+            DatabaseQuery: contains all pokemon in range
+        """
+        return self.select(self.indexes["ranges"].between(column, low, high))
+
+    def filter_by_ranges(self, **bounds):
+        """
+        Finds all pokemon within a range on every given column
+        Several columns are searched together through a k-d tree, see database.ranges
+        Strict bounds use ranges.above and ranges.below, e.g.
+        filter_by_ranges(speed=(90, 120), hp=(ranges.above(80), None))
+
+        Args:
+            bounds(tuple): (low, high) inclusive bounds of each column, None for no bound
+        Returns:
+            DatabaseQuery: contains all pokemon in every range
+        """
+        return self.select(self.indexes["ranges"].box(bounds))
+
+    def search(self, text):
+        """
+        Runs a query written in the query language, see database.plan
+
+        Args:
+            text(str): The query, e.g. "type:fire gen:1..3 sort:-speed limit:20"
+        Returns:
+            DatabaseQuery: contains the matching pokemon
+        Raises:
+            ValueError: if the query is not valid
+        """
+        return plan.parse(text).execute(self)
+
+    def prefix_cursor(self):
+        """
+        Creates an incremental name search for as-you-type input
+
+        Returns:
+            PrefixCursor: narrows its previous matches as characters are typed
+        """
+        return search.PrefixCursor(self.indexes["name"])
 
     def filter_by_type(self, pokemon_type):
         """
@@ -63,8 +213,7 @@ class DatabaseQuery():
         Returns:
             DatabaseQuery: contains all pokemon with specified type if they exist
         """
-        data_query = self.dataframe.loc[(self.dataframe.type1 == pokemon_type.lower()) | (self.dataframe.type2 == pokemon_type.lower())]
-        return DatabaseQuery(data_query)
+        return self.select_bitset(self.indexes["bitmaps"]["type"].get(pokemon_type.lower()))
 
     def filter_by_legendary(self, value):
         """
@@ -79,8 +228,150 @@ class DatabaseQuery():
             query = 1
         else:
             query = 0
-        data_query = self.dataframe.loc[(self.dataframe.is_legendary == query)]
-        return DatabaseQuery(data_query)
+        return self.select_bitset(self.indexes["bitmaps"]["is_legendary"].get(query))
+
+    def filter_by_favorites(self, favorites=None):
+        """
+        Finds all favorite pokemon
+
+        Args:
+            favorites(Favorites): The favorites, None for the ones given to use_favorites
+        Returns:
+            DatabaseQuery: contains the favorite pokemon in query order
+        """
+        if favorites is None:
+            favorites = self.indexes["favorites"]
+        return self.select_bitset(favorites.rows(self.columns["index"]))
+
+    def count_favorites(self, favorites=None):
+        """
+        Counts the favorite pokemon in the query
+
+        Args:
+            favorites(Favorites): The favorites, None for the ones given to use_favorites
+        Returns:
+            int: the number of favorite pokemon
+        """
+        if favorites is None:
+            favorites = self.indexes["favorites"]
+        return int(np.count_nonzero(favorites.rows(self.columns["index"]).test(self.indices)))
+
+    def filter_by_resistance(self, *types):
+        """
+        Finds all pokemon that take less than normal damage from every given type
+
+        Args:
+            types(str): The lowercase attacking types
+        Returns:
+            DatabaseQuery: contains all pokemon resisting every type
+        """
+        mask = self.indexes["matchups"].resisting(types)
+        return self.take(self.indices[mask[self.indices]])
+
+    def counters(self, target, limit=10):
+        """
+        Finds the pokemon that best counter a pokemon
+        Counters hit the target hard with their types and take little
+        damage from the target's types, see matchups.MatchupIndex.counters
+
+        Args:
+            target(DataRow): The pokemon to be countered
+            limit(int): The largest number of counters to return
+        Returns:
+            DatabaseQuery: contains the best counters, best first
+        """
+        candidates = self.indices[self.indices != target.position]
+        scores = self.indexes["matchups"].counters(target.position, candidates)
+        # Ties go to the stronger pokemon
+        order = np.lexsort((-self.columns["base_total"][candidates], -scores))[:limit]
+        return self.take(candidates[order])
+
+    def team_report(self, team):
+        """
+        Scores a team against every pokemon in this query
+
+        Args:
+            team(iterable): DataRows of the team members
+        Returns:
+            dict: coverage, exposure and score of the team, see database.matchups
+        """
+        positions = np.array([row.position for row in team])
+        return self.indexes["matchups"].team_report(positions, self.indices)
+
+    def best_teams(self, targets=None, size=6, limit=10, workers=None):
+        """
+        Finds the best scoring teams made of pokemon in this query
+        Searches every team with branch and bound, see database.matchups
+        Raises ValueError above matchups.MAX_SIZE members or MAX_POOL distinct pokemon
+
+        Args:
+            targets(DatabaseQuery): The pokemon the teams are scored against, this query if None
+            size(int): The number of members in a team
+            limit(int): The number of teams to return
+            workers(int): The number of processes to search with, None for this process
+        Returns:
+            list: (score, DatabaseQuery of the members) tuples, best first
+        """
+        targets = self if targets is None else targets
+        teams = matchups.best_teams(self.indexes["matchups"], self.indices, targets.indices,
+                                    size, limit, workers)
+        return [(score, self.take(members)) for score, coverage, exposure, members in teams]
+
+    def similar_to(self, target, limit=10, types=False, size=False):
+        """
+        Finds the pokemon in this query with the most similar base stats
+        See database.similar
+
+        Args:
+            target(DataRow): The pokemon to compare with
+            limit(int): The largest number of pokemon to return
+            types(bool): Also compares types if True
+            size(bool): Also compares weight and height if True
+        Returns:
+            DatabaseQuery: contains the most similar pokemon, most similar first
+        """
+        # Queries over every row read the saved neighbor table
+        candidates = None if len(self.indices) == len(self.columns["index"]) else self.indices
+        return self.take(self.indexes["similar"].nearest(target.position, limit, candidates, types, size))
+
+    def membership(self):
+        """
+        Gets a mask of the row positions in this query
+
+        Returns:
+            numpy.ndarray: True for every row position in this query, None if
+                the query holds every row
+        """
+        total = len(self.columns["index"])
+        if len(self.indices) == total:
+            return None
+        mask = np.zeros(total, dtype=bool)
+        mask[self.indices] = True
+        return mask
+
+    def sort_by_column(self, name, descending=True, limit=None):
+        """
+        Sorts all pokemon by a numeric column, in either direction
+        Missing values come last either way
+        Uses the cached permutation of the column if there is one, where
+        ties are ordered by row position, else ties keep their current order
+
+        Args:
+            name(str): The column to sort by
+            descending(bool): Sorts in descending order if True
+            limit(int): The largest number of pokemon to keep, None for all
+        Returns:
+            DatabaseQuery: contains the pokemon sorted by the column, descending
+                or ascending as asked, at most limit of them
+        """
+        sorted_index = self.indexes.get("sorted")
+        if sorted_index is not None and name in sorted_index:
+            return self.take(sorted_index.sort(name, self.membership(), descending, limit))
+        keys = self.column(name)
+        if descending:
+            keys = -keys
+        order = np.argsort(keys, kind="stable")[:limit]
+        return self.take(self.indices[order])
 
     def sort_by_hp(self):
         """
@@ -89,8 +380,7 @@ class DatabaseQuery():
         Returns:
             DatabaseQuery: contains all pokemon sorted by hp in descending order
         """
-        data_query = self.dataframe.sort_values(by=["hp"], ascending=False)
-        return data_query
+        return self.sort_by_column("hp")
 
     def sort_by_attack(self):
         """
@@ -99,8 +389,7 @@ class DatabaseQuery():
         Returns:
             DatabaseQuery: contains all pokemon sorted by attack in descending order
         """
-        data_query = self.dataframe.sort_values(by=["attack"], ascending=False)
-        return data_query
+        return self.sort_by_column("attack")
 
     def sort_by_defense(self):
         """
@@ -109,8 +398,7 @@ class DatabaseQuery():
         Returns:
             DatabaseQuery: contains all pokemon sorted by defense in descending order
         """
-        data_query = self.dataframe.sort_values(by=["defense"], ascending=False)
-        return data_query
+        return self.sort_by_column("defense")
 
     def sort_by_speed(self):
         """
@@ -119,8 +407,7 @@ class DatabaseQuery():
         Returns:
             DatabaseQuery: contains all pokemon sorted by speed in descending order
         """
-        data_query = self.dataframe.sort_values(by=["speed"], ascending=False)
-        return data_query
+        return self.sort_by_column("speed")
     
     def sort_by_sp_defense(self):
         """
@@ -129,8 +416,7 @@ class DatabaseQuery():
         Returns:
             DatabaseQuery: contains all pokemon sorted by special defense in descending order
         """
-        data_query = self.dataframe.sort_values(by=["sp_defense"], ascending=False)
-        return data_query
+        return self.sort_by_column("sp_defense")
 
     def sort_by_sp_attack(self):
         """
@@ -139,8 +425,7 @@ class DatabaseQuery():
         Returns:
             DatabaseQuery: contains all pokemon sorted by special attack in descending order
         """
-        data_query = self.dataframe.sort_values(by=["sp_attack"], ascending=False)
-        return data_query
+        return self.sort_by_column("sp_attack")
 
     def sort_by_stat(self, stat):
         """
@@ -154,7 +439,7 @@ class DatabaseQuery():
         if stat == "hp":
             data_query = self.sort_by_hp()
         elif stat == "attack":
-            data_query = self.sort_by_sp_attack()
+            data_query = self.sort_by_attack()
         elif stat == "defense":
             data_query = self.sort_by_defense()
         elif stat == "speed":
@@ -163,7 +448,7 @@ class DatabaseQuery():
             data_query = self.sort_by_sp_attack()
         elif stat == "spdefense":
             data_query = self.sort_by_sp_defense()
-        return DatabaseQuery(data_query)
+        return data_query
 
     def index(self, key):
         """
@@ -175,7 +460,7 @@ class DatabaseQuery():
         Returns
             DataRow: contains the pokemon data at the index
         """
-        return self.query[key]
+        return self[key]
 
     def first(self):
         """
@@ -184,7 +469,7 @@ class DatabaseQuery():
         Returns:
             DataRow: contains the pokemon data at the top of the database
         """
-        return self.query[0]
+        return self[0]
 
     def isempty(self):
         """
@@ -193,59 +478,100 @@ class DatabaseQuery():
         Returns:
             bool: True if the database is empty, else False
         """
-        if len(self.query) == 0:
+        if len(self.indices) == 0:
             return True
         else:
             return False
 
+def column_property(name):
+    """
+    Creates a read-only DataRow attribute backed by a column
+
+    Args:
+        name(str): The column to read from
+    Returns:
+        property: reads the row's value from the column
+    """
+    def getter(self):
+        value = self.columns[name][self.position]
+        if isinstance(value, np.generic):
+            return value.item()
+        return value
+    return property(getter)
+
 class DataRow():
     """
     Data container for pokemon data
+    A lightweight view that reads a single row from shared columns
     """
 
-    def __init__(self, serial):
-        self.index = serial[0]
-        self.abilities = [i.strip("\'") for i in serial[1].strip('[').strip(']').split(',')]
-        self.against_bug = serial[2]
-        self.against_dark = serial[3]
-        self.against_dragon = serial[4]
-        self.against_electric = serial[5]
-        self.against_fairy = serial[6]
-        self.against_fight = serial[7]
-        self.gainst_fire = serial[8]
-        self.against_flying = serial[9]
-        self.against_ghost = serial[10]
-        self.against_grass = serial[11]
-        self.against_ground = serial[12]
-        self.against_ice = serial[13]
-        self.against_normal = serial[14]
-        self.against_poison = serial[15]
-        self.against_psychic = serial[16]
-        self.against_rock = serial[17]
-        self.against_steel = serial[18]
-        self.against_water = serial[19]
-        self.attack = serial[20]
-        self.base_egg_steps = serial[21]
-        self.base_happiness = serial[22]
-        self.base_total = serial[23]
-        self.capture_rate = serial[24]
-        self.classfication = serial[25]
-        self.defense = serial[26]
-        self.experience_growth = serial[27]
-        self.height = serial[28]
-        self.hp = serial[29]
-        self.japanese_name = serial[30]
-        self.name = serial[31]
-        self.percentage_male = serial[32]
-        self.pokedex_number = serial[33]
-        self.sp_attack = serial[34]
-        self.sp_defense = serial[35]
-        self.speed = serial[36]
-        self.type1 = serial[37]
-        self.type2 = serial[38]
-        self.weight = serial[39]
-        self.generation = serial[40]
-        self.is_legendary = serial[41]
+    __slots__ = ("columns", "position", "_abilities")
+
+    def __init__(self, columns, position):
+        """
+        Creates a view of a row
+
+        Args:
+            columns(dict): maps column names to numpy arrays
+            position(int): The row position in the columns
+        """
+        self.columns = columns
+        self.position = position
+        self._abilities = None
+
+    @property
+    def abilities(self):
+        """
+        Parses the abilities list on first access
+
+        Returns:
+            list: the names of the pokemon's abilities
+        """
+        if self._abilities is None:
+            self._abilities = list(ast.literal_eval(self.columns["abilities"][self.position]))
+        return self._abilities
+
+    index = column_property("index")
+    against_bug = column_property("against_bug")
+    against_dark = column_property("against_dark")
+    against_dragon = column_property("against_dragon")
+    against_electric = column_property("against_electric")
+    against_fairy = column_property("against_fairy")
+    against_fight = column_property("against_fight")
+    against_fire = column_property("against_fire")
+    against_flying = column_property("against_flying")
+    against_ghost = column_property("against_ghost")
+    against_grass = column_property("against_grass")
+    against_ground = column_property("against_ground")
+    against_ice = column_property("against_ice")
+    against_normal = column_property("against_normal")
+    against_poison = column_property("against_poison")
+    against_psychic = column_property("against_psychic")
+    against_rock = column_property("against_rock")
+    against_steel = column_property("against_steel")
+    against_water = column_property("against_water")
+    attack = column_property("attack")
+    base_egg_steps = column_property("base_egg_steps")
+    base_happiness = column_property("base_happiness")
+    base_total = column_property("base_total")
+    capture_rate = column_property("capture_rate")
+    classfication = column_property("classfication")
+    defense = column_property("defense")
+    experience_growth = column_property("experience_growth")
+    height = column_property("height_m")
+    hp = column_property("hp")
+    japanese_name = column_property("japanese_name")
+    name = column_property("name")
+    percentage_male = column_property("percentage_male")
+    pokedex_number = column_property("pokedex_number")
+    sp_attack = column_property("sp_attack")
+    sp_defense = column_property("sp_defense")
+    speed = column_property("speed")
+    type1 = column_property("type1")
+    type2 = column_property("type2")
+    weight = column_property("weight_kg")
+    generation = column_property("generation")
+    is_legendary = column_property("is_legendary")
 
 class Database(DatabaseQuery):
 
@@ -253,10 +579,140 @@ class Database(DatabaseQuery):
         """
         Loads pokemon data from a csv
         Uses "resources/data/data.csv" as default database
+        Reads the csv through its binary snapshot, see database.snapshot
 
         Args:
             database(str): Address of the csv to be used
         """
         self.database_address = database
-        self.dataframe = pd.read_csv(self.database_address)
-        super().__init__(self.dataframe)
+        columns = snapshot.load(self.database_address)
+        names = search.NameIndex(columns["name"])
+        bitmaps = {index: bitmap.BitmapIndex(*(columns[name] for name in names))
+                   for index, names in BITMAP_COLUMNS.items()}
+        sorted_index = ranking.SortedIndex(columns, SORTED_COLUMNS)
+        super().__init__(columns, indexes={"name": names, "fuzzy": search.FuzzyIndex(names),
+                                           "bitmaps": bitmaps, "sorted": sorted_index,
+                                           "matchups": matchups.MatchupIndex(columns),
+                                           "similar": similar.SimilarityIndex(columns, database),
+                                           "ranges": ranges.RangeIndex(columns)})
+        self.kinds = {name: snapshot.column_kind(name, column) for name, column in columns.items()}
+        # Appended rows go into arrays with room to spare, see extend
+        self.buffers = {}
+        self.appended = 0
+
+    def select(self, positions):
+        """
+        Keeps the rows found in a set of row positions
+        The database holds every row in position order, so the rows only
+        need sorting instead of a pass over the whole table
+
+        Args:
+            positions(numpy.ndarray): row positions in the underlying columns
+        Returns:
+            DatabaseQuery: contains the rows at the given positions
+        """
+        return self.take(np.unique(np.asarray(positions, dtype=np.int64)))
+
+    def extend(self, arrays):
+        """
+        Appends rows and extends every index in place instead of reloading
+        Appended rows are kept in memory, the csv is not changed
+
+        Args:
+            arrays(dict): maps every column name to the typed values of the
+                new rows, see snapshot.coerce
+        """
+        missing = set(self.columns) - set(arrays)
+        if missing:
+            raise ValueError("Missing columns: {}".format(", ".join(sorted(missing))))
+        count = len(arrays["index"])
+        if count == 0:
+            return
+        # Every column is checked before any is written, so a bad column
+        # leaves the table and its indexes as they were
+        converted = {}
+        for name, column in self.columns.items():
+            values = arrays[name]
+            if isinstance(values, list):
+                values = snapshot.string_column(values)
+            if len(values) != count:
+                raise ValueError("Column '{}' has {} rows, expected {}".format(name, len(values), count))
+            try:
+                converted[name] = np.asarray(values).astype(column.dtype, casting="same_kind")
+            except (TypeError, ValueError):
+                raise ValueError("Column '{}' expects {} values".format(name, column.dtype))
+        start = len(self.columns["index"])
+        for name, column in self.columns.items():
+            values = converted[name]
+            # Grow by doubling so appending a chunk at a time stays linear
+            buffer = self.buffers.get(name)
+            if buffer is None or len(buffer) < start + count:
+                buffer = np.empty(max(2 * start, start + count), dtype=column.dtype)
+                buffer[:start] = column
+                self.buffers[name] = buffer
+            buffer[start:start + count] = values
+            self.columns[name] = buffer[:start + count]
+        self.indices = np.arange(start + count)
+        self.appended += count
+
+        indexes = self.indexes
+        indexes["fuzzy"].extend(indexes["name"].extend(self.columns["name"][start:], start))
+        for index, names in BITMAP_COLUMNS.items():
+            indexes["bitmaps"][index].extend(*(self.columns[name] for name in names))
+        indexes["sorted"].extend(start)
+        indexes["ranges"].extend(start)
+        indexes["matchups"].extend(self.columns, start)
+        indexes["similar"].extend()
+
+    def append(self, rows):
+        """
+        Appends rows given as they would be written in the csv
+
+        Args:
+            rows(iterable): dicts mapping column names to values, e.g.
+                {"name": "Pikachu", "abilities": ["Static"], "type2": None, ...}
+        """
+        rows = list(rows)
+        arrays = {}
+        for name, kind in self.kinds.items():
+            cells = []
+            for row in rows:
+                value = row.get(name)
+                if value is None or (isinstance(value, float) and value != value):
+                    value = ""
+                cells.append(str(value))
+            arrays[name] = snapshot.coerce(cells, kind, name)
+        self.extend(arrays)
+
+    def append_csv(self, address, chunk_size=snapshot.CHUNK_SIZE):
+        """
+        Streams the rows of another csv with the same columns into the database
+        Only one chunk of rows is parsed at a time
+
+        Args:
+            address(str): Address of the csv
+            chunk_size(int): The most rows parsed at once
+        Returns:
+            int: the number of rows appended
+        """
+        chunks = snapshot.read_chunks(address, chunk_size)
+        names = next(chunks)
+        missing = set(self.columns) - set(names)
+        if missing:
+            raise ValueError("Missing columns: {}".format(", ".join(sorted(missing))))
+        count = 0
+        for cells in chunks:
+            self.extend({name: snapshot.coerce(values, self.kinds[name], name)
+                         for name, values in zip(names, cells) if name in self.columns})
+            count += len(cells[0])
+        return count
+
+    def use_favorites(self, favorites):
+        """
+        Makes favorites available to every query of the database, including
+        the favorites word of the query language
+
+        Args:
+            favorites(Favorites): The favorites
+        """
+        self.indexes["favorites"] = favorites
@@ -1,50 +1,167 @@
 """
 Module to save and load favorites for python-pokedex
 
+Favorites are a bitset of pokemon indexes kept in memory. Changes are
+handed to a background writer, which saves them in batches through a
+storage backend, see database.favstore.
+
 :Author:    Jose Enrico Salinas
 :Version:   20181204
 """
 
-import csv
+import atexit
+import threading
+import time
+import numpy as np
+from .bitmap import Bitset
+from .favstore import JournalStore, grow
 
 class Favorites():
     """
     Handles fav saving and reading
     """
 
-    def __init__(self):
+    def __init__(self, store=None, delay=0.05):
         """
-        Reads resources/data/fav.csv and loads a set object from it
+        Loads the favorites from a store and starts the writer
+
+        Args:
+            store: The storage backend, a JournalStore over resources/data/fav.npy if None
+            delay(float): Seconds the writer waits to coalesce changes
         """
-        with open("resources/data/fav.csv") as fav_file:
-            csv_reader = csv.reader(fav_file)
-            self.favs = {int(x[0]) for x in csv_reader if x[0] != ''}
+        self.store = store if store is not None else JournalStore()
+        self.delay = delay
+        self.favs = self.store.load()
+        self.version = 0
+        self.cached_rows = None
+        self.pending = {}
+        self.condition = threading.Condition()
+        self.closed = False
+        self.writing = False
+        self.writer = threading.Thread(target=self.write_loop, name="favorites-writer", daemon=True)
+        self.writer.start()
+        atexit.register(self.close)
 
     def __iter__(self):
-        return iter(self.favs)
+        return iter(self.favs.positions().tolist())
+
+    def __contains__(self, key):
+        return key in self.favs
+
+    def __len__(self):
+        return len(self.favs)
+
+    def rows(self, keys):
+        """
+        Gets the rows of a table holding favorite pokemon
+        The result is cached until the favorites change
+
+        Args:
+            keys(numpy.ndarray): The pokemon index of every row
+        Returns:
+            Bitset: the row positions of the favorite pokemon
+        """
+        if self.cached_rows is not None:
+            cached_keys, version, bits = self.cached_rows
+            if cached_keys is keys and version == self.version:
+                return bits
+        mask = np.zeros(len(keys), dtype=bool)
+        inside = (keys >= 0) & (keys < self.favs.size)
+        mask[inside] = self.favs.test(keys[inside])
+        bits = Bitset.from_mask(mask)
+        self.cached_rows = (keys, self.version, bits)
+        return bits
 
     def append(self, key):
         """
-        Adds an item to favorites and saves it
+        Adds an item to favorites, the writer saves it in the background
 
         Args:
-            key(str): Index of pokemon to be saved
+            key(int): Index of pokemon to be saved
         """
-        self.favs = self.favs.union({key})
-        with open("resources/data/fav.csv", "w", newline='') as fav_file:
-            csv_writer = csv.writer(fav_file, )
-            for item in self.favs:
-                csv_writer.writerow([item])
+        grow(self.favs, key)
+        self.favs.add(key)
+        self.version += 1
+        self.queue(key, True)
 
     def remove(self, key):
         """
-        Removes an item from the favorites if it exists and saves the favorites
+        Removes an item from the favorites if it exists, the writer saves it
+        in the background
+
+        Args:
+            key(int): Index of pokemon to be removed
+        """
+        self.favs.discard(key)
+        self.version += 1
+        self.queue(key, False)
+
+    def switch_profile(self, profile):
+        """
+        Saves the current profile and loads another one
+        Only stores with profiles, like SQLiteStore, can switch
 
         Args:
-            key(str): Index of pokemon to be removed
+            profile(str): The name of the profile
+        """
+        if not hasattr(self.store, "use"):
+            raise ValueError("The favorites store has no profiles.")
+        self.flush()
+        self.store.use(profile)
+        self.favs = self.store.load()
+        self.version += 1
+
+    def queue(self, key, favorite):
+        """
+        Hands a change to the writer, later changes to the same item replace it
+
+        Args:
+            key(int): Index of the changed pokemon
+            favorite(bool): True if the pokemon is now a favorite
+        """
+        with self.condition:
+            self.pending[key] = favorite
+            self.condition.notify()
+
+    def write_loop(self):
+        """
+        Saves queued changes until the favorites are closed
+        """
+        while True:
+            with self.condition:
+                while not self.pending and not self.closed:
+                    self.condition.wait()
+                if self.closed and not self.pending:
+                    return
+            # Let quick toggles pile up so they are written together
+            if not self.closed:
+                time.sleep(self.delay)
+            # Write without the lock so toggles never wait for the disk
+            with self.condition:
+                pending, self.pending = self.pending, {}
+                self.writing = True
+            self.store.save(pending)
+            with self.condition:
+                self.writing = False
+                self.condition.notify_all()
+
+    def flush(self):
+        """
+        Waits until every change made so far is saved and synced
+        """
+        with self.condition:
+            while self.pending or self.writing:
+                self.condition.wait()
+            self.store.sync()
+
+    def close(self):
+        """
+        Saves the remaining changes, stops the writer and closes the store
         """
-        self.favs = self.favs.difference({key})
-        with open("resources/data/fav.csv", "w", newline='') as fav_file:
-            csv_writer = csv.writer(fav_file)
-            for item in self.favs:
-                csv_writer.writerow([item])
+        with self.condition:
+            if self.closed:
+                return
+            self.closed = True
+            self.condition.notify_all()
+        self.writer.join()
+        self.store.close()
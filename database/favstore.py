@@ -0,0 +1,422 @@
+"""
+Storage backends for python-pokedex favorites
+
+A store loads a profile's favorites as a bitset of pokemon indexes and
+saves batches of changes, see fav.Favorites. Stores are only called by
+one thread at a time.
+
+    JournalStore    a memory-mapped bitset file and an append-only journal
+    SQLiteStore     one table of (profile, pokemon) rows in an SQLite database
+
+Run as a module to import an old favorites csv into an SQLite database:
+    python -m database.favstore <csv> <database> [profile]
+
+:Author:    Jose Enrico Salinas
+:Version:   20181204
+"""
+
+import csv
+import os
+import sqlite3
+import sys
+import time
+import numpy as np
+from .bitmap import Bitset, WORD
+from .snapshot import remove_quietly, temporary_address
+
+# When the journal store forces journal writes to disk
+SYNC_POLICIES = ("always", "interval", "never")
+
+# Bits in a new favorites bitset, enough for every pokemon
+SIZE = 1024
+
+
+def read_csv(address):
+    """
+    Reads an old favorites csv
+
+    Args:
+        address(str): Address of the favorites csv
+    Returns:
+        set: the favorite pokemon indexes, empty if the file is missing
+    """
+    try:
+        with open(address, newline='') as fav_file:
+            return {int(x[0]) for x in csv.reader(fav_file) if x and x[0] != ''}
+    except FileNotFoundError:
+        return set()
+
+
+def grow(favs, key):
+    """
+    Grows a bitset until it can hold a pokemon index
+
+    Args:
+        favs(Bitset): The favorites to grow in place
+        key(int): The pokemon index
+    """
+    if key < 0:
+        raise ValueError("Invalid pokemon index.")
+    if key >= favs.size:
+        favs.resize(max(2 * favs.size, -(-(key + 1) // WORD) * WORD))
+
+
+def from_keys(keys):
+    """
+    Creates a favorites bitset
+
+    Args:
+        keys(iterable): The favorite pokemon indexes
+    Returns:
+        Bitset: the favorites
+    """
+    favs = Bitset.empty(SIZE)
+    for key in keys:
+        grow(favs, key)
+        favs.add(key)
+    return favs
+
+
+def read_snapshot(address, legacy=None):
+    """
+    Reads a favorites bitset file
+    Changes to the mapped words are private and never reach the file
+
+    Args:
+        address(str): Address of the bitset file
+        legacy(str): Address of a favorites csv to import if there is no bitset file
+    Returns:
+        Bitset: the favorite pokemon indexes
+    """
+    try:
+        words = np.load(address, mmap_mode="c")
+        return Bitset(words, len(words) * WORD)
+    except FileNotFoundError:
+        pass
+    return from_keys(read_csv(legacy) if legacy is not None else ())
+
+
+def replay_journal(address, favs):
+    """
+    Applies the complete lines of a journal to a set of favorites
+
+    Args:
+        address(str): Address of the journal
+        favs(Bitset): The favorites to update in place
+    Returns:
+        int: the number of operations applied
+    """
+    try:
+        with open(address) as journal:
+            lines = journal.read().split("\n")
+    except FileNotFoundError:
+        return 0
+    # The last piece is either empty or a line torn by a crash
+    count = 0
+    for line in lines[:-1]:
+        try:
+            key = int(line[1:])
+        except ValueError:
+            continue
+        if line[0] == "+":
+            grow(favs, key)
+            favs.add(key)
+        elif line[0] == "-":
+            favs.discard(key)
+        count += 1
+    return count
+
+
+def trim_journal(address):
+    """
+    Cuts a line torn by a crash off the end of a journal, so the next
+    appended line starts on a line of its own
+
+    Args:
+        address(str): Address of the journal
+    """
+    try:
+        with open(address, "rb") as journal:
+            data = journal.read()
+    except FileNotFoundError:
+        return
+    end = data.rfind(b"\n") + 1
+    if end < len(data):
+        with open(address, "r+b") as journal:
+            journal.truncate(end)
+
+
+def write_snapshot(address, favs):
+    """
+    Atomically replaces a favorites bitset file
+
+    Args:
+        address(str): Address of the bitset file
+        favs(Bitset): The favorite pokemon indexes
+    """
+    # Each writer has its own temporary, so concurrent compactions never mix
+    temporary = temporary_address(address)
+    try:
+        with open(temporary, "wb") as fav_file:
+            np.save(fav_file, np.asarray(favs.words, dtype=np.uint64))
+            fav_file.flush()
+            os.fsync(fav_file.fileno())
+        os.replace(temporary, address)
+    except BaseException:
+        remove_quietly(temporary)
+        raise
+
+
+class JournalStore():
+    """
+    Saves favorites as a bitset file and a journal of changes
+    Every change is appended to the journal, which is compacted into the
+    bitset file once it grows. A crash loses at most the changes that were
+    not saved yet, a torn last journal line is ignored and the bitset file
+    is only ever replaced atomically
+    """
+
+    def __init__(self, address="resources/data/fav.npy", legacy="resources/data/fav.csv",
+                 sync="interval", interval=1.0, compact_after=256):
+        """
+        Creates a new journal store
+
+        Args:
+            address(str): Address of the bitset file, the journal is address + ".journal"
+            legacy(str): Address of a favorites csv to import if there is no bitset file
+            sync(str): always fsyncs every save, interval at most every interval
+                seconds, never leaves it to the operating system
+            interval(float): Seconds between fsyncs for the interval policy
+            compact_after(int): Journal lines before it is compacted into the bitset file
+        """
+        if sync not in SYNC_POLICIES:
+            raise ValueError("Invalid sync policy.")
+        self.address = address
+        self.legacy = legacy
+        self.journal_address = address + ".journal"
+        self.sync_policy = sync
+        self.interval = interval
+        self.compact_after = compact_after
+        self.journal = None
+        self.journal_lines = 0
+        self.saved = None
+        self.last_sync = time.monotonic()
+
+    def load(self):
+        """
+        Reads the bitset file, replays the journal and trims a torn last line
+
+        Returns:
+            Bitset: the favorites
+        """
+        favs = read_snapshot(self.address, self.legacy)
+        self.journal_lines = replay_journal(self.journal_address, favs)
+        # Saves append to the journal, never to the end of a torn line
+        trim_journal(self.journal_address)
+        self.saved = Bitset(np.array(favs.words), favs.size)
+        return favs
+
+    def save(self, changes):
+        """
+        Appends changes that differ from the saved favorites to the journal
+        Compacts the journal once it is long enough
+
+        Args:
+            changes(dict): maps pokemon indexes to True if they are favorites
+        """
+        lines = []
+        for key, favorite in changes.items():
+            if favorite and key not in self.saved:
+                grow(self.saved, key)
+                self.saved.add(key)
+                lines.append("+{}\n".format(key))
+            elif not favorite and key in self.saved:
+                self.saved.discard(key)
+                lines.append("-{}\n".format(key))
+        if not lines:
+            return
+
+        if self.journal is None:
+            self.journal = open(self.journal_address, "a")
+        self.journal.write("".join(lines))
+        self.journal.flush()
+        self.journal_lines += len(lines)
+        now = time.monotonic()
+        if self.sync_policy == "always" or (self.sync_policy == "interval" and now - self.last_sync >= self.interval):
+            os.fsync(self.journal.fileno())
+            self.last_sync = now
+
+        if self.journal_lines >= self.compact_after:
+            self.compact()
+
+    def compact(self):
+        """
+        Writes the saved favorites to the bitset file and empties the journal
+        Replaying the journal is idempotent, so a crash between the two
+        steps keeps every change
+        """
+        write_snapshot(self.address, self.saved)
+        if self.journal is not None:
+            self.journal.close()
+        self.journal = open(self.journal_address, "w")
+        self.journal_lines = 0
+
+    def sync(self):
+        """
+        Forces the saved changes to disk
+        """
+        if self.journal is not None:
+            os.fsync(self.journal.fileno())
+            self.last_sync = time.monotonic()
+
+    def close(self):
+        """
+        Compacts the journal and closes it
+        """
+        if self.journal_lines:
+            self.compact()
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+
+
+class SQLiteStore():
+    """
+    Saves the favorites of many profiles in an SQLite database
+    Favorites are rows of one table clustered by (profile, pokemon), so
+    loading a profile reads one range of the primary key however many
+    profiles there are. The database runs in WAL mode and every batch of
+    changes is written in a single transaction on one reused connection
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS profiles (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE
+        );
+        CREATE TABLE IF NOT EXISTS favorites (
+            profile INTEGER NOT NULL REFERENCES profiles(id) ON DELETE CASCADE,
+            pokemon INTEGER NOT NULL,
+            PRIMARY KEY (profile, pokemon)
+        ) WITHOUT ROWID;
+    """
+
+    def __init__(self, address="resources/data/favorites.db", profile="default"):
+        """
+        Opens the database, creating it if it is missing
+
+        Args:
+            address(str): Address of the SQLite database
+            profile(str): The name of the profile to load and save
+        """
+        self.address = address
+        # Favorites save from their writer thread, one thread at a time
+        self.connection = sqlite3.connect(address, check_same_thread=False, cached_statements=64)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("PRAGMA foreign_keys=ON")
+        self.connection.executescript(self.SCHEMA)
+        self.profile_ids = {}
+        self.profile = None
+        self.profile_id = None
+        self.use(profile)
+
+    def profile_key(self, name):
+        """
+        Gets the id of a profile, creating the profile if it is new
+
+        Args:
+            name(str): The name of the profile
+        Returns:
+            int: the profile id
+        """
+        if name not in self.profile_ids:
+            with self.connection:
+                self.connection.execute("INSERT OR IGNORE INTO profiles (name) VALUES (?)", (name,))
+            row = self.connection.execute("SELECT id FROM profiles WHERE name = ?", (name,)).fetchone()
+            self.profile_ids[name] = row[0]
+        return self.profile_ids[name]
+
+    def use(self, profile):
+        """
+        Switches the profile later loads and saves use
+
+        Args:
+            profile(str): The name of the profile
+        """
+        self.profile_id = self.profile_key(profile)
+        self.profile = profile
+
+    def profiles(self):
+        """
+        Gets every profile name
+
+        Returns:
+            list: the profile names in alphabetical order
+        """
+        return [row[0] for row in self.connection.execute("SELECT name FROM profiles ORDER BY name")]
+
+    def load(self):
+        """
+        Reads the favorites of the current profile
+
+        Returns:
+            Bitset: the favorites
+        """
+        rows = self.connection.execute("SELECT pokemon FROM favorites WHERE profile = ?", (self.profile_id,))
+        return from_keys(row[0] for row in rows)
+
+    def save(self, changes):
+        """
+        Writes a batch of changes to the current profile in one transaction
+
+        Args:
+            changes(dict): maps pokemon indexes to True if they are favorites
+        """
+        added = [(self.profile_id, key) for key, favorite in changes.items() if favorite]
+        removed = [(self.profile_id, key) for key, favorite in changes.items() if not favorite]
+        with self.connection:
+            if added:
+                self.connection.executemany(
+                    "INSERT OR IGNORE INTO favorites (profile, pokemon) VALUES (?, ?)", added)
+            if removed:
+                self.connection.executemany(
+                    "DELETE FROM favorites WHERE profile = ? AND pokemon = ?", removed)
+
+    def import_csv(self, address, profile=None):
+        """
+        Adds the favorites of an old favorites csv to a profile
+
+        Args:
+            address(str): Address of the favorites csv
+            profile(str): The name of the profile, None for the current profile
+        Returns:
+            int: the number of favorites read
+        """
+        profile_id = self.profile_id if profile is None else self.profile_key(profile)
+        keys = read_csv(address)
+        with self.connection:
+            self.connection.executemany("INSERT OR IGNORE INTO favorites (profile, pokemon) VALUES (?, ?)",
+                                        [(profile_id, key) for key in keys])
+        return len(keys)
+
+    def sync(self):
+        """
+        Forces the WAL into the database file
+        """
+        self.connection.execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+    def close(self):
+        """
+        Closes the database connection
+        """
+        self.connection.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: python -m database.favstore <csv> <database> [profile]")
+        sys.exit(1)
+    store = SQLiteStore(sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else "default")
+    print("Imported {} favorites into profile {}".format(store.import_csv(sys.argv[1]), store.profile))
+    store.close()
@@ -0,0 +1,341 @@
+"""
+Type matchups for python-pokedex
+
+The against_* columns hold the damage multiplier every pokemon takes from
+each attacking type. They are kept as one n x 18 float32 matrix, in the
+order of plan.TYPES, and a pokemon attacks with its own one or two types.
+
+Teams are scored on a pool of target pokemon:
+    coverage    fraction of the targets at least one member hits for 2x or more
+    exposure    for every attacking type, how many more members are weak to it
+                than resist it, summed over the types where that is positive
+    score       coverage - exposure / 18
+
+:Author:    Jose Enrico Salinas
+:Version:   20181204
+"""
+
+import concurrent.futures
+import heapq
+import numpy as np
+from .plan import TYPES, TYPE_ALIASES
+
+# Largest team the search accepts
+MAX_SIZE = 6
+
+# Most distinct candidates the team search accepts, see best_teams
+MAX_POOL = 24
+
+# Column of each attacking type, the csv shortens fighting
+COLUMNS = ["against_fight" if pokemon_type == "fighting" else "against_" + pokemon_type
+           for pokemon_type in TYPES]
+
+
+def type_number(pokemon_type):
+    """
+    Gets the column of a type in the matchup matrix
+
+    Args:
+        pokemon_type(str): The type name
+    Returns:
+        int: the position of the type in plan.TYPES
+    """
+    pokemon_type = TYPE_ALIASES.get(pokemon_type.lower(), pokemon_type.lower())
+    if pokemon_type not in TYPES:
+        raise ValueError("Unknown type '{}'".format(pokemon_type))
+    return TYPES.index(pokemon_type)
+
+
+def popcount(bits):
+    """
+    Counts the set bits of an integer
+
+    Args:
+        bits(int): The integer
+    Returns:
+        int: the number of set bits
+    """
+    return bin(bits).count("1")
+
+
+class MatchupIndex():
+    """
+    Damage multipliers and attacking types of every pokemon
+    """
+
+    def __init__(self, columns):
+        """
+        Builds the matrices
+
+        Args:
+            columns(dict): maps column names to numpy arrays
+        """
+        self.matrix = np.stack([np.asarray(columns[name], dtype=np.float32) for name in COLUMNS], axis=1)
+        self.attacks = np.zeros(self.matrix.shape, dtype=np.float32)
+        for name in ("type1", "type2"):
+            for number, pokemon_type in enumerate(TYPES):
+                self.attacks[columns[name] == pokemon_type, number] = 1
+        # +1 for every type a pokemon is weak to, -1 for every type it resists
+        self.balance = np.sign(self.matrix - 1).astype(np.int8)
+
+    def extend(self, columns, start):
+        """
+        Adds the matrix rows of appended pokemon
+
+        Args:
+            columns(dict): maps column names to numpy arrays including the new rows
+            start(int): The row position of the first appended row
+        """
+        added = MatchupIndex({name: columns[name][start:] for name in COLUMNS + ["type1", "type2"]})
+        self.matrix = np.concatenate((self.matrix, added.matrix))
+        self.attacks = np.concatenate((self.attacks, added.attacks))
+        self.balance = np.concatenate((self.balance, added.balance))
+
+    def resisting(self, types):
+        """
+        Finds the pokemon taking less than normal damage from every given type
+
+        Args:
+            types(iterable): The attacking types
+        Returns:
+            numpy.ndarray: True for every row that resists all of them
+        """
+        numbers = [type_number(pokemon_type) for pokemon_type in types]
+        return np.all(self.matrix[:, numbers] < 1, axis=1)
+
+    def effectiveness(self, attackers, defenders):
+        """
+        Gets the best multiplier each attacker hits each defender for
+
+        Args:
+            attackers(numpy.ndarray): row positions of the attackers
+            defenders(numpy.ndarray): row positions of the defenders
+        Returns:
+            numpy.ndarray: len(attackers) x len(defenders) multipliers
+        """
+        # Multipliers of the types an attacker lacks are masked to zero
+        taken = self.matrix[defenders]
+        return np.max(self.attacks[attackers][:, None, :] * taken[None, :, :], axis=2)
+
+    def counters(self, target, candidates):
+        """
+        Scores how well each candidate counters a target
+        The score is the log2 of the multiplier a candidate hits the target
+        for minus the log2 of the multiplier the target hits it for
+
+        Args:
+            target(int): The row position of the target
+            candidates(numpy.ndarray): row positions of the candidates
+        Returns:
+            numpy.ndarray: the score of each candidate
+        """
+        target = np.array([target])
+        offense = self.effectiveness(candidates, target)[:, 0]
+        defense = self.effectiveness(target, candidates)[0]
+        # Immunities count as a quarter of the damage
+        return np.log2(np.maximum(offense, 0.125)) - np.log2(np.maximum(defense, 0.125))
+
+    def team_report(self, team, targets):
+        """
+        Scores a team against a pool of targets with matrix products
+
+        Args:
+            team(numpy.ndarray): row positions of the team members
+            targets(numpy.ndarray): row positions of the targets
+        Returns:
+            dict: coverage, exposure and score of the team, the weak and
+                resist counts per attacking type and the covered targets
+        """
+        members = np.ones(len(team), dtype=np.float32)
+        # Targets x members: how many of a member's types hit a target for 2x or more
+        hits = (self.matrix[targets] >= 2).astype(np.float32) @ self.attacks[team].T
+        covered = hits.sum(axis=1) > 0
+        weak = members @ (self.matrix[team] > 1).astype(np.float32)
+        resist = members @ (self.matrix[team] < 1).astype(np.float32)
+        exposure = int(np.maximum(weak - resist, 0).sum())
+        coverage = float(covered.mean()) if len(targets) else 0.0
+        return {"coverage": coverage, "exposure": exposure, "score": coverage - exposure / len(TYPES),
+                "weak": dict(zip(TYPES, weak.astype(int).tolist())),
+                "resist": dict(zip(TYPES, resist.astype(int).tolist())),
+                "covered": targets[covered]}
+
+    def team_inputs(self, pool, targets):
+        """
+        Precomputes what the team search needs for each pool member
+
+        Args:
+            pool(numpy.ndarray): row positions of the candidates
+            targets(numpy.ndarray): row positions of the targets
+        Returns:
+            tuple: the targets each candidate covers as integer bitsets, and
+                each candidate's weak/resist balance per attacking type
+        """
+        hits = ((self.matrix[targets] >= 2).astype(np.float32) @ self.attacks[pool].T) > 0
+        weights = 1 << np.arange(len(targets), dtype=object)
+        covers = [int(weights[hits[:, member]].sum()) for member in range(len(pool))]
+        balances = [tuple(row) for row in self.balance[pool].tolist()]
+        return covers, balances
+
+
+def team_slots(covers, balances, size):
+    """
+    Collapses interchangeable candidates before a team search
+    Candidates covering the same targets with the same weak/resist balance
+    make the same teams, so each such class is searched once and appears
+    at most size times, as consecutive slots
+
+    Args:
+        covers(list): The targets each candidate covers, as integer bitsets
+        balances(list): Each candidate's weak/resist balance per attacking type
+        size(int): The number of members in a team
+    Returns:
+        tuple: the candidates of each class in pool order, and the class of
+            each slot, strongest coverage first
+    """
+    classes = {}
+    for member, key in enumerate(zip(covers, balances)):
+        classes.setdefault(key, []).append(member)
+    # Ties on coverage go to the class holding the earliest candidate
+    members = sorted(classes.values(), key=lambda found: (-popcount(covers[found[0]]), found[0]))
+    slots = [number for number, found in enumerate(members) for _ in range(min(len(found), size))]
+    return members, slots
+
+
+def search_teams(covers, balances, targets, size, limit, first=None):
+    """
+    Finds the best scoring teams with branch and bound
+    Slots are taken in order and a slot repeating the class of the slot
+    before it only follows that slot, so each team is visited once, in
+    lexicographic order. A branch is cut when even its best case cannot
+    beat the worst of the top teams, and teams tied on score rank in the
+    order they are visited, so the result does not depend on the cuts
+
+    Scores are kept as the integer coverage * 18 - exposure * targets, the
+    score of the module docstring times 18 * targets, so ties are exact
+
+    Args:
+        covers(list): The targets each slot covers, as integer bitsets, by decreasing coverage
+        balances(list): Each slot's weak/resist balance per attacking type
+        targets(int): The number of targets
+        size(int): The number of members in a team
+        limit(int): The number of teams to keep
+        first(int): Only searches teams whose first member is this slot, None for all
+    Returns:
+        list: (score, covered targets, exposure, slots) tuples, best first
+    """
+    count = len(covers)
+    weight = len(TYPES)
+    gains = [popcount(cover) for cover in covers]
+    resists = [sum(1 for value in balance if value < 0) for balance in balances]
+    # Bounds for the slots from each start: their union, the running sum of
+    # their best coverage and of their most resists, for every number of members
+    unions = [0] * (count + 1)
+    best_gains = [[0] * (size + 1) for _ in range(count + 1)]
+    best_resists = [[0] * (size + 1) for _ in range(count + 1)]
+    for start in range(count - 1, -1, -1):
+        unions[start] = unions[start + 1] | covers[start]
+        top_gains = gains[start:start + size]
+        top_resists = sorted(resists[start:], reverse=True)[:size]
+        for taken in range(1, size + 1):
+            best_gains[start][taken] = sum(top_gains[:taken])
+            best_resists[start][taken] = sum(top_resists[:taken])
+    repeats = [False] + [covers[slot] == covers[slot - 1] and balances[slot] == balances[slot - 1]
+                         for slot in range(1, count)]
+    best = []
+
+    def visit(members, covered, totals, start):
+        exposure = sum(value for value in totals if value > 0)
+        remaining = size - len(members)
+        if remaining == 0:
+            entry = (popcount(covered) * weight - exposure * targets,
+                     tuple(-member for member in members), popcount(covered), exposure)
+            if len(best) < limit:
+                heapq.heappush(best, entry)
+            elif entry > best[0]:
+                heapq.heapreplace(best, entry)
+            return
+        if count - start < remaining:
+            return
+        if len(best) == limit:
+            coverage = min(targets, popcount(covered) + best_gains[start][remaining],
+                           popcount(covered | unions[start]))
+            # Each member lowers each type's balance by at most one
+            lowest = max(sum(value - remaining for value in totals if value > remaining),
+                         exposure - best_resists[start][remaining])
+            if coverage * weight - lowest * targets <= best[0][0]:
+                return
+        for member in range(start, count - remaining + 1):
+            # A repeated class only follows its previous slot
+            if repeats[member] and member > start:
+                continue
+            balance = balances[member]
+            visit(members + [member], covered | covers[member],
+                  [total + value for total, value in zip(totals, balance)], member + 1)
+
+    if first is None:
+        visit([], 0, [0] * weight, 0)
+    else:
+        visit([first], covers[first], list(balances[first]), first + 1)
+    return [(score, covered, exposure, tuple(-member for member in members))
+            for score, members, covered, exposure in sorted(best, reverse=True)]
+
+
+def best_teams(index, pool, targets, size=6, limit=10, workers=None):
+    """
+    Finds the best scoring teams from a pool of candidates
+    Interchangeable candidates are collapsed first, see team_slots, and a
+    team holding several of them uses the earliest ones in the pool
+
+    The search is exact, so its time grows quickly with the pool and the
+    team size. A pool of one type holds 12 to 18 distinct candidates and
+    answers in a fraction of a second. Teams of 6 from MAX_POOL distinct
+    candidates took up to about a second on one core, and every 8 more
+    candidates cost several times as much, so larger pools are refused,
+    narrow them with a filter first. The search is CPU bound, run it off
+    the UI thread
+
+    Args:
+        index(MatchupIndex): The matchup matrices
+        pool(numpy.ndarray): row positions of the candidates
+        targets(numpy.ndarray): row positions of the targets
+        size(int): The number of members in a team, at most MAX_SIZE
+        limit(int): The number of teams to return
+        workers(int): Splits the search by first member over this many
+            processes, None to search in this process
+    Returns:
+        list: (score, coverage, exposure, row positions) tuples, best first
+    """
+    if size > MAX_SIZE:
+        raise ValueError("Teams have at most {} members".format(MAX_SIZE))
+    if size <= 0 or len(pool) < size or len(targets) == 0 or limit <= 0:
+        return []
+    covers, balances = index.team_inputs(pool, targets)
+    members, slots = team_slots(covers, balances, size)
+    if len(members) > MAX_POOL:
+        raise ValueError("Too many distinct candidates for a team search: {}, at most {}".format(
+            len(members), MAX_POOL))
+    slot_covers = [covers[members[number][0]] for number in slots]
+    slot_balances = [balances[members[number][0]] for number in slots]
+
+    if workers is None or workers <= 1:
+        found = search_teams(slot_covers, slot_balances, len(targets), size, limit)
+    else:
+        firsts = [slot for slot in range(len(slots) - size + 1) if slot == 0 or slots[slot] != slots[slot - 1]]
+        with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+            branches = [executor.submit(search_teams, slot_covers, slot_balances, len(targets), size, limit, first)
+                        for first in firsts]
+            found = [team for branch in branches for team in branch.result()]
+        # Same order as one search: score, then the earlier team
+        found = sorted(found, key=lambda team: (-team[0], team[3]))[:limit]
+
+    teams = []
+    scale = len(TYPES) * len(targets)
+    for score, covered, exposure, team in found:
+        used = {}
+        positions = []
+        for slot in team:
+            number = slots[slot]
+            positions.append(members[number][used.get(number, 0)])
+            used[number] = used.get(number, 0) + 1
+        teams.append((score / scale, covered / len(targets), exposure, pool[np.array(positions)]))
+    return teams
@@ -0,0 +1,495 @@
+"""
+Query language and planner for python-pokedex
+
+A query is a list of terms separated by spaces or commas:
+    type:fire gen:1..3 legendary:no sort:-speed limit:20 hp>80
+
+    type:<type>         pokemon with the type as either of their types
+    name:<prefix>       pokemon whose name starts with the prefix
+    legendary:<yes|no>  legendary or common pokemon
+    <field>:<a>..<b>    numeric field between a and b inclusive
+    <field>:<value>     numeric field equal to value
+    <field><op><value>  numeric comparison, op is one of > >= < <= = !=
+    sort:<field>        sort ascending, sort:-<field> sorts descending
+    limit:<n>           keep only the first n results
+    favorites           favorite pokemon, also fav
+    <word>              legendary, common, a type, a stat to sort by
+                        descending, or else an exact name
+
+Filters on bitmap indexed columns resolve with bitwise AND, the others
+are applied in a single pass over the columns, most selective first, and
+a sort with a limit only orders the top rows.
+
+:Author:    Jose Enrico Salinas
+:Version:   20181204
+"""
+
+import abc
+import re
+import numpy as np
+from .ranges import above, below
+
+TYPES = ("bug", "dark", "dragon", "electric", "fairy", "fighting", "fire",
+         "flying", "ghost", "grass", "ground", "ice", "normal", "poison",
+         "psychic", "rock", "steel", "water")
+
+TYPE_ALIASES = {"fight": "fighting"}
+
+FIELDS = {
+    "hp": "hp",
+    "attack": "attack",
+    "atk": "attack",
+    "defense": "defense",
+    "def": "defense",
+    "speed": "speed",
+    "spd": "speed",
+    "spattack": "sp_attack",
+    "sp_attack": "sp_attack",
+    "spatk": "sp_attack",
+    "spdefense": "sp_defense",
+    "sp_defense": "sp_defense",
+    "spdef": "sp_defense",
+    "total": "base_total",
+    "base_total": "base_total",
+    "weight": "weight_kg",
+    "height": "height_m",
+    "capture": "capture_rate",
+    "capture_rate": "capture_rate",
+    "happiness": "base_happiness",
+    "eggsteps": "base_egg_steps",
+    "base_egg_steps": "base_egg_steps",
+    "growth": "experience_growth",
+    "experience_growth": "experience_growth",
+    "male": "percentage_male",
+    "percentage_male": "percentage_male",
+    "gen": "generation",
+    "generation": "generation",
+    "dex": "pokedex_number",
+    "number": "pokedex_number",
+}
+
+# Stats sorted by the single word searches
+STATS = {"hp": "hp", "attack": "attack", "defense": "defense", "speed": "speed",
+         "spattack": "sp_attack", "spdefense": "sp_defense"}
+
+COMPARISON = re.compile(r"^([a-z_]+)(>=|<=|!=|>|<|=)(-?[0-9.]+)$")
+
+# Rows sampled to estimate how selective a filter is
+SAMPLE_SIZE = 256
+
+
+class Predicate(abc.ABC):
+    """
+    A filter on a query, evaluated on the rows that survived earlier filters
+    """
+
+    @abc.abstractmethod
+    def mask(self, columns, indexes, positions):
+        """
+        Evaluates the filter
+
+        Args:
+            columns(dict): The database columns
+            indexes(dict): The database indexes
+            positions(numpy.ndarray): row positions to be tested
+        Returns:
+            numpy.ndarray: boolean mask of the rows that pass
+        """
+
+    def key(self):
+        """
+        Identifies the filter, equal filters have equal keys
+
+        Returns:
+            tuple: the predicate's class name and its parameters
+        """
+        return (type(self).__name__,) + tuple(sorted(vars(self).items()))
+
+    def bitset(self, columns, indexes):
+        """
+        Resolves the filter from the bitmap indexes if it can
+
+        Args:
+            columns(dict): The database columns
+            indexes(dict): The database indexes
+        Returns:
+            Bitset: the rows that pass, None if no bitmap index applies
+        """
+        return None
+
+    def selectivity(self, columns, indexes):
+        """
+        Estimates the fraction of rows that pass the filter from a sample
+
+        Args:
+            columns(dict): The database columns
+            indexes(dict): The database indexes
+        Returns:
+            float: the estimated fraction of rows that pass
+        """
+        total = len(columns["index"])
+        sample = np.arange(0, total, max(1, total // SAMPLE_SIZE))
+        if len(sample) == 0:
+            return 1.0
+        return np.count_nonzero(self.mask(columns, indexes, sample)) / len(sample)
+
+
+class Compare(Predicate):
+    """
+    Compares a numeric column against a value
+    """
+
+    OPERATORS = {">": np.greater, ">=": np.greater_equal, "<": np.less,
+                 "<=": np.less_equal, "=": np.equal, "!=": np.not_equal}
+
+    def __init__(self, column, operator, value):
+        self.column = column
+        self.operator = operator
+        self.value = value
+
+    def mask(self, columns, indexes, positions):
+        return self.OPERATORS[self.operator](columns[self.column][positions], self.value)
+
+    def bitset(self, columns, indexes):
+        bitmaps = indexes.get("bitmaps", {})
+        if self.column not in bitmaps:
+            return None
+        compare = self.OPERATORS[self.operator]
+        return bitmaps[self.column].where(lambda value: compare(value, self.value))
+
+    def selectivity(self, columns, indexes):
+        range_index = indexes.get("ranges")
+        if range_index is None or self.column not in range_index:
+            return super().selectivity(columns, indexes)
+        # Counts the rows from the range index instead of sampling
+        bounds = {">": (above(self.value), None), ">=": (self.value, None), "<": (None, below(self.value)),
+                  "<=": (None, self.value), "=": (self.value, self.value), "!=": (self.value, self.value)}
+        count = range_index.count(self.column, *bounds[self.operator])
+        if self.operator == "!=":
+            count = len(columns["index"]) - count
+        return count / max(1, len(columns["index"]))
+
+
+class Between(Predicate):
+    """
+    Checks a numeric column is within an inclusive range
+    """
+
+    def __init__(self, column, low, high):
+        self.column = column
+        self.low = low
+        self.high = high
+
+    def mask(self, columns, indexes, positions):
+        values = columns[self.column][positions]
+        return (values >= self.low) & (values <= self.high)
+
+    def bitset(self, columns, indexes):
+        bitmaps = indexes.get("bitmaps", {})
+        if self.column not in bitmaps:
+            return None
+        return bitmaps[self.column].where(lambda value: self.low <= value <= self.high)
+
+    def selectivity(self, columns, indexes):
+        range_index = indexes.get("ranges")
+        if range_index is None or self.column not in range_index:
+            return super().selectivity(columns, indexes)
+        return range_index.count(self.column, self.low, self.high) / max(1, len(columns["index"]))
+
+
+class HasType(Predicate):
+    """
+    Checks either type of a pokemon
+    """
+
+    def __init__(self, pokemon_type):
+        self.pokemon_type = pokemon_type
+
+    def mask(self, columns, indexes, positions):
+        return ((columns["type1"][positions] == self.pokemon_type) |
+                (columns["type2"][positions] == self.pokemon_type))
+
+    def bitset(self, columns, indexes):
+        bitmaps = indexes.get("bitmaps", {})
+        if "type" not in bitmaps:
+            return None
+        return bitmaps["type"].get(self.pokemon_type)
+
+
+class IsFavorite(Predicate):
+    """
+    Checks a pokemon is a favorite using the favorites bitset
+    """
+
+    def mask(self, columns, indexes, positions):
+        favorites = indexes.get("favorites")
+        if favorites is None:
+            return np.zeros(len(positions), dtype=bool)
+        return favorites.rows(columns["index"]).test(positions)
+
+    def bitset(self, columns, indexes):
+        favorites = indexes.get("favorites")
+        if favorites is None:
+            return None
+        return favorites.rows(columns["index"])
+
+
+class NameMatch(Predicate):
+    """
+    Checks a pokemon's name against the rows found in the name index
+    """
+
+    @abc.abstractmethod
+    def matches(self, indexes):
+        """
+        Looks the name up
+
+        Args:
+            indexes(dict): The database indexes
+        Returns:
+            numpy.ndarray: row positions of the matching names
+        """
+
+    def mask(self, columns, indexes, positions):
+        return np.isin(positions, self.matches(indexes))
+
+    def selectivity(self, columns, indexes):
+        return len(self.matches(indexes)) / max(1, len(columns["index"]))
+
+
+class NamePrefix(NameMatch):
+    """
+    Checks the start of a pokemon's name using the name index
+    """
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+
+    def matches(self, indexes):
+        return indexes["name"].prefix(self.prefix)
+
+
+class NameEquals(NameMatch):
+    """
+    Checks a pokemon's whole name using the name index
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def matches(self, indexes):
+        return indexes["name"].exact(self.name)
+
+
+class Plan():
+    """
+    A parsed query: filters, an optional sort and an optional limit
+    """
+
+    def __init__(self, predicates=None, sort=None, descending=False, limit=None):
+        """
+        Creates a new plan
+
+        Args:
+            predicates(list): Predicates every result must pass
+            sort(str): The column to sort by, None to keep the query order
+            descending(bool): Sorts in descending order if True
+            limit(int): The largest number of results, None for all
+        """
+        self.predicates = predicates if predicates is not None else []
+        self.sort = sort
+        self.descending = descending
+        self.limit = limit
+
+    def filter(self, columns, indexes, positions):
+        """
+        Applies every predicate
+        Predicates with a bitmap index are resolved first with bitwise AND,
+        the rest run most selective first on the rows that passed so far
+
+        Args:
+            columns(dict): The database columns
+            indexes(dict): The database indexes
+            positions(numpy.ndarray): row positions to be filtered
+        Returns:
+            numpy.ndarray: the row positions that pass every predicate
+        """
+        # Predicates on bitmap indexed columns combine into one bitset
+        combined = None
+        remaining = []
+        for predicate in self.predicates:
+            bits = predicate.bitset(columns, indexes)
+            if bits is None:
+                remaining.append(predicate)
+            elif combined is None:
+                combined = bits
+            else:
+                combined = combined & bits
+        if combined is not None:
+            positions = positions[combined.test(positions)]
+
+        ordered = sorted(remaining, key=lambda predicate: predicate.selectivity(columns, indexes))
+        for predicate in ordered:
+            if len(positions) == 0:
+                break
+            positions = positions[predicate.mask(columns, indexes, positions)]
+        return positions
+
+    def order(self, columns, indexes, positions):
+        """
+        Sorts and limits row positions
+        Sorts through the cached permutation of the column if there is one,
+        where ties are ordered by row position, else only the top rows are
+        partitioned out and sorted, and ties keep their query order
+
+        Args:
+            columns(dict): The database columns
+            indexes(dict): The database indexes
+            positions(numpy.ndarray): row positions to be ordered
+        Returns:
+            numpy.ndarray: the ordered row positions
+        """
+        if self.sort is None:
+            return positions[:self.limit]
+        sorted_index = indexes.get("sorted")
+        if sorted_index is not None and self.sort in sorted_index:
+            mask = np.zeros(len(columns["index"]), dtype=bool)
+            mask[positions] = True
+            return sorted_index.sort(self.sort, mask, self.descending, self.limit)
+        keys = columns[self.sort][positions]
+        if self.descending:
+            keys = -keys
+        if self.limit is not None and self.limit < len(positions):
+            if self.limit == 0:
+                return positions[:0]
+            # Take every row before the cut-off key, then the earliest rows
+            # tied with it, so the result matches the full stable sort
+            cutoff = np.partition(keys, self.limit - 1)[self.limit - 1]
+            if cutoff != cutoff:
+                # Missing values sort last, after every present value
+                before = np.flatnonzero(~np.isnan(keys))
+                tied = np.flatnonzero(np.isnan(keys))[:self.limit - len(before)]
+            else:
+                before = np.flatnonzero(keys < cutoff)
+                tied = np.flatnonzero(keys == cutoff)[:self.limit - len(before)]
+            top = np.concatenate((before, tied))
+            return positions[top[np.argsort(keys[top], kind="stable")]]
+        return positions[np.argsort(keys, kind="stable")]
+
+    def execute(self, query):
+        """
+        Runs the plan on a query
+
+        Args:
+            query(DatabaseQuery): The query to be searched
+        Returns:
+            DatabaseQuery: contains the matching pokemon
+        """
+        positions = self.filter(query.columns, query.indexes, query.indices)
+        return query.take(self.order(query.columns, query.indexes, positions))
+
+
+def parse_number(text):
+    """
+    Converts a query value into a number
+
+    Args:
+        text(str): The value
+    Returns:
+        int or float: the number
+    """
+    try:
+        return int(text)
+    except ValueError:
+        try:
+            return float(text)
+        except ValueError:
+            raise ValueError("Expected a number, got '{}'".format(text))
+
+
+def parse_field(name):
+    """
+    Converts a query field into a column name
+
+    Args:
+        name(str): The field
+    Returns:
+        str: the column name
+    """
+    if name not in FIELDS:
+        raise ValueError("Unknown field '{}'".format(name))
+    return FIELDS[name]
+
+
+def parse_term(term, plan):
+    """
+    Adds a single query term to a plan
+
+    Args:
+        term(str): The lowercase query term
+        plan(Plan): The plan being built
+    """
+    comparison = COMPARISON.match(term)
+    if comparison:
+        field, operator, value = comparison.groups()
+        plan.predicates.append(Compare(parse_field(field), operator, parse_number(value)))
+        return
+
+    if ":" not in term:
+        term = TYPE_ALIASES.get(term, term)
+        if term == "legendary":
+            plan.predicates.append(Compare("is_legendary", "=", 1))
+        elif term == "common":
+            plan.predicates.append(Compare("is_legendary", "=", 0))
+        elif term in ("favorites", "fav"):
+            plan.predicates.append(IsFavorite())
+        elif term in TYPES:
+            plan.predicates.append(HasType(term))
+        elif term in STATS:
+            plan.sort, plan.descending = STATS[term], True
+        else:
+            plan.predicates.append(NameEquals(term))
+        return
+
+    field, value = term.split(":", 1)
+    if field == "type":
+        value = TYPE_ALIASES.get(value, value)
+        if value not in TYPES:
+            raise ValueError("Unknown type '{}'".format(value))
+        plan.predicates.append(HasType(value))
+    elif field == "name":
+        plan.predicates.append(NamePrefix(value))
+    elif field == "legendary":
+        if value not in ("yes", "no", "true", "false", "1", "0"):
+            raise ValueError("Expected yes or no, got '{}'".format(value))
+        plan.predicates.append(Compare("is_legendary", "=", int(value in ("yes", "true", "1"))))
+    elif field == "sort":
+        plan.descending = value.startswith("-")
+        plan.sort = parse_field(value.lstrip("-+"))
+    elif field == "limit":
+        plan.limit = parse_number(value)
+        if not isinstance(plan.limit, int) or plan.limit < 0:
+            raise ValueError("Expected a positive whole number, got '{}'".format(value))
+    elif ".." in value:
+        low, high = value.split("..", 1)
+        plan.predicates.append(Between(parse_field(field), parse_number(low), parse_number(high)))
+    else:
+        plan.predicates.append(Compare(parse_field(field), "=", parse_number(value)))
+
+
+def parse(text):
+    """
+    Parses a query string into a plan
+
+    Args:
+        text(str): The query string
+    Returns:
+        Plan: the parsed query
+    Raises:
+        ValueError: if the query is not valid
+    """
+    plan = Plan()
+    for term in re.split(r"[\s,]+", text.strip().lower()):
+        if term:
+            parse_term(term, plan)
+    return plan
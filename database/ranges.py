@@ -0,0 +1,327 @@
+"""
+Range indexes over numeric columns for python-pokedex
+
+A range on one column is found by binary search in the column's sorted
+permutation, the matching rows are one slice of it. Ranges on several
+columns go through a k-d tree over those columns, whose subtrees are
+slices of its own permutation, so a subtree inside every range is
+returned whole and only the leaves crossing a range edge are tested.
+
+Bounds are inclusive, None leaves a side open. Strict bounds are the
+next float past a value, e.g. hp > 80 is the range (above(80), None).
+Rows missing a value are never in a range on that column.
+
+:Author:    Jose Enrico Salinas
+:Version:   20181204
+"""
+
+import numpy as np
+from .ranking import merge
+
+# Columns that can be searched by range
+RANGE_COLUMNS = ("hp", "attack", "defense", "sp_attack", "sp_defense", "speed", "base_total",
+                 "weight_kg", "height_m", "capture_rate", "base_egg_steps", "percentage_male")
+
+# Rows in a k-d tree leaf, tested one by one when a leaf crosses a range edge
+LEAF_SIZE = 32
+
+
+def above(value):
+    """
+    Gets the inclusive low bound of a strict comparison
+
+    Args:
+        value(float): The bound
+    Returns:
+        float: the smallest float greater than value
+    """
+    return float(np.nextafter(float(value), np.inf))
+
+
+def below(value):
+    """
+    Gets the inclusive high bound of a strict comparison
+
+    Args:
+        value(float): The bound
+    Returns:
+        float: the largest float less than value
+    """
+    return float(np.nextafter(float(value), -np.inf))
+
+
+def slices(starts, ends):
+    """
+    Joins many ranges of positions without a python loop
+
+    Args:
+        starts(numpy.ndarray): The first position of each range
+        ends(numpy.ndarray): The position after the last of each range
+    Returns:
+        numpy.ndarray: the positions of every range, one range after another
+    """
+    lengths = ends - starts
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return offsets + np.arange(len(offsets))
+
+
+class KDTree():
+    """
+    Static k-d tree over the rows of a few numeric columns
+    Each node owns a slice of the tree's permutation and the bounding box
+    of the points in it
+    """
+
+    def __init__(self, points, positions, leaf_size=LEAF_SIZE):
+        """
+        Builds the tree a level at a time, splitting each node at the median
+        of its widest column
+        Every column keeps the points of each node sorted by that column, so
+        medians and bounding boxes are read off the ends of each node's slice
+        and a split is a stable partition of every column's slice
+
+        Args:
+            points(numpy.ndarray): An n x d float64 matrix without missing values
+            positions(numpy.ndarray): The row position of each point
+            leaf_size(int): The most points in a leaf
+        """
+        count, dimensions = points.shape
+        by_column = [np.argsort(points[:, axis], kind="stable") for axis in range(dimensions)]
+        starts, ends, lows, highs, children = [], [], [], [], []
+        nodes = 0
+        level_starts = np.array([0])
+        level_ends = np.array([count])
+        while len(level_starts):
+            starts.append(level_starts)
+            ends.append(level_ends)
+            filled = level_ends > level_starts
+            last = np.maximum(level_ends - 1, level_starts)
+            level_lows = np.full((len(level_starts), dimensions), np.inf)
+            level_highs = np.full((len(level_starts), dimensions), -np.inf)
+            for axis in range(dimensions):
+                level_lows[filled, axis] = points[by_column[axis][level_starts[filled]], axis]
+                level_highs[filled, axis] = points[by_column[axis][last[filled]], axis]
+            lows.append(level_lows)
+            highs.append(level_highs)
+
+            spread = level_highs - level_lows
+            axes = np.argmax(spread, axis=1)
+            split = ((level_ends - level_starts) > leaf_size) & (spread[np.arange(len(axes)), axes] > 0)
+            level_children = np.full((len(level_starts), 2), -1)
+            nodes += len(level_starts)
+            level_children[split] = nodes + np.arange(2 * np.count_nonzero(split)).reshape(-1, 2)
+            children.append(level_children)
+
+            split_starts, split_ends, split_axes = level_starts[split], level_ends[split], axes[split]
+            middles = split_starts + (split_ends - split_starts) // 2
+            left = np.zeros(count, dtype=bool)
+            for axis in range(dimensions):
+                chosen = split_axes == axis
+                left[by_column[axis][slices(split_starts[chosen], middles[chosen])]] = True
+            # Stable partition of each split node's slice, left half first
+            lengths = split_ends - split_starts
+            where = slices(split_starts, split_ends)
+            first_of_node = np.cumsum(lengths) - lengths
+            for axis in range(dimensions):
+                rows = by_column[axis][where]
+                goes_left = left[rows]
+                lefts_before = np.cumsum(goes_left) - goes_left
+                lefts_before -= np.repeat(lefts_before[first_of_node[lengths > 0]], lengths[lengths > 0])
+                offset = np.arange(len(where)) - np.repeat(first_of_node, lengths)
+                destination = np.where(goes_left, np.repeat(split_starts, lengths) + lefts_before,
+                                       np.repeat(middles, lengths) + offset - lefts_before)
+                by_column[axis][destination] = rows
+            level_starts = np.stack((split_starts, middles), axis=1).ravel()
+            level_ends = np.stack((middles, split_ends), axis=1).ravel()
+
+        order = by_column[0]
+        self.order = positions[order]
+        self.sorted_points = points[order]
+        self.starts = np.concatenate(starts)
+        self.ends = np.concatenate(ends)
+        self.lows = np.concatenate(lows)
+        self.highs = np.concatenate(highs)
+        self.children = np.concatenate(children)
+
+    def query(self, low, high):
+        """
+        Finds the rows inside a box
+        Walks the tree a level at a time, every node of a level at once
+
+        Args:
+            low(numpy.ndarray): The inclusive low bound of each column
+            high(numpy.ndarray): The inclusive high bound of each column
+        Returns:
+            numpy.ndarray: the row positions inside the box, in no particular order
+        """
+        inside, crossing = [], []
+        level = np.array([0])
+        while len(level):
+            lows, highs = self.lows[level], self.highs[level]
+            touching = ~(np.any(highs < low, axis=1) | np.any(lows > high, axis=1))
+            level, lows, highs = level[touching], lows[touching], highs[touching]
+            contained = np.all(lows >= low, axis=1) & np.all(highs <= high, axis=1)
+            inside.append(level[contained])
+            level = level[~contained]
+            leaf = self.children[level, 0] < 0
+            crossing.append(level[leaf])
+            level = self.children[level[~leaf]].ravel()
+        inside = np.concatenate(inside)
+        crossing = np.concatenate(crossing)
+        tested = slices(self.starts[crossing], self.ends[crossing])
+        points = self.sorted_points[tested]
+        tested = tested[np.all((points >= low) & (points <= high), axis=1)]
+        return self.order[np.concatenate((slices(self.starts[inside], self.ends[inside]), tested))]
+
+
+class RangeIndex():
+    """
+    Sorted permutations and k-d trees of numeric columns, built on first use
+    """
+
+    def __init__(self, columns, names=RANGE_COLUMNS):
+        """
+        Creates the index
+
+        Args:
+            columns(dict): maps column names to numpy arrays
+            names(iterable): The columns that can be searched by range
+        """
+        self.columns = columns
+        self.names = set(names)
+        self.orders = {}
+        self.keys = {}
+        self.trees = {}
+
+    def __contains__(self, name):
+        return name in self.names
+
+    def extend(self, start):
+        """
+        Merges appended rows into the permutations built so far
+        The k-d trees are static, they are dropped and rebuilt on next use
+
+        Args:
+            start(int): The row position of the first appended row
+        """
+        for name, order in self.orders.items():
+            column = np.asarray(self.columns[name])
+            new = np.arange(start, len(column))
+            self.orders[name], self.keys[name] = merge(order, self.keys[name], new, column[new])
+        self.trees = {}
+
+    def check(self, name):
+        """
+        Checks a column can be searched by range
+
+        Args:
+            name(str): The column name
+        """
+        if name not in self.names:
+            raise ValueError("No range index on '{}'".format(name))
+
+    def sorted_column(self, name):
+        """
+        Gets the ascending permutation of a column, missing values last
+
+        Args:
+            name(str): The column name
+        Returns:
+            tuple: the row positions and the values, both in ascending order
+        """
+        self.check(name)
+        if name not in self.orders:
+            column = np.asarray(self.columns[name])
+            order = np.argsort(column, kind="stable")
+            self.orders[name] = order
+            self.keys[name] = column[order]
+        return self.orders[name], self.keys[name]
+
+    def span(self, name, low=None, high=None):
+        """
+        Finds where a range lies in the sorted permutation of a column
+
+        Args:
+            name(str): The column name
+            low(float): The inclusive low bound, None for no bound
+            high(float): The inclusive high bound, None for no bound
+        Returns:
+            tuple: the (start, end) positions of the range in the permutation
+        """
+        order, keys = self.sorted_column(name)
+        start = 0 if low is None else int(np.searchsorted(keys, low, side="left"))
+        if high is None:
+            # Stop before the missing values sorted at the end
+            end = len(keys)
+            if keys.dtype.kind == "f":
+                end = int(np.searchsorted(keys, np.inf, side="right"))
+        else:
+            end = int(np.searchsorted(keys, high, side="right"))
+        return start, max(start, end)
+
+    def count(self, name, low=None, high=None):
+        """
+        Counts the rows in a range without reading them
+
+        Args:
+            name(str): The column name
+            low(float): The inclusive low bound, None for no bound
+            high(float): The inclusive high bound, None for no bound
+        Returns:
+            int: the number of rows in the range
+        """
+        start, end = self.span(name, low, high)
+        return end - start
+
+    def between(self, name, low=None, high=None):
+        """
+        Finds the rows of a column within a range
+
+        Args:
+            name(str): The column name
+            low(float): The inclusive low bound, None for no bound
+            high(float): The inclusive high bound, None for no bound
+        Returns:
+            numpy.ndarray: the row positions in range, in ascending order of the column
+        """
+        order, _ = self.sorted_column(name)
+        start, end = self.span(name, low, high)
+        return order[start:end]
+
+    def tree(self, names):
+        """
+        Gets the k-d tree over a set of columns
+
+        Args:
+            names(tuple): The sorted column names
+        Returns:
+            KDTree: the tree, without the rows missing any of the columns
+        """
+        if names not in self.trees:
+            for name in names:
+                self.check(name)
+            points = np.stack([np.asarray(self.columns[name], dtype=np.float64) for name in names], axis=1)
+            present = np.flatnonzero(~np.isnan(points).any(axis=1))
+            self.trees[names] = KDTree(points[present], present)
+        return self.trees[names]
+
+    def box(self, ranges):
+        """
+        Finds the rows within a range on every given column
+
+        Args:
+            ranges(dict): maps column names to (low, high) inclusive bounds, None for no bound
+        Returns:
+            numpy.ndarray: the row positions in every range, in no particular order
+        """
+        if len(ranges) == 1:
+            (name, (low, high)), = ranges.items()
+            return self.between(name, low, high)
+        if not ranges:
+            return np.arange(len(self.columns["index"]))
+        names = tuple(sorted(ranges))
+        low = np.array([-np.inf if ranges[name][0] is None else ranges[name][0] for name in names],
+                       dtype=np.float64)
+        high = np.array([np.inf if ranges[name][1] is None else ranges[name][1] for name in names],
+                        dtype=np.float64)
+        return self.tree(names).query(low, high)
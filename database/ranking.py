@@ -0,0 +1,209 @@
+"""
+Cached sorted permutations of numeric columns for python-pokedex
+
+:Author:    Jose Enrico Salinas
+:Version:   20181204
+"""
+
+import numpy as np
+
+# Rows scanned by the first step of a top rows search
+FIRST_CHUNK = 64
+
+
+def merge(order, keys, positions, values):
+    """
+    Merges new rows into a sorted permutation without sorting it again
+    New rows go after old rows with equal values, so a stable sort by
+    value then row position is kept when the new positions are larger
+
+    Args:
+        order(numpy.ndarray): row positions in ascending order of their values
+        keys(numpy.ndarray): the values of those rows, in the same order
+        positions(numpy.ndarray): row positions of the new rows
+        values(numpy.ndarray): the values of the new rows
+    Returns:
+        tuple: the merged row positions and values
+    """
+    sort = np.argsort(values, kind="stable")
+    positions, values = positions[sort], values[sort]
+    total = len(order) + len(positions)
+    places = np.searchsorted(keys, values, side="right") + np.arange(len(values))
+    old = np.ones(total, dtype=bool)
+    old[places] = False
+    merged_order = np.empty(total, dtype=np.result_type(order, positions))
+    merged_order[places] = positions
+    merged_order[old] = order
+    merged_keys = np.empty(total, dtype=np.result_type(keys, values))
+    merged_keys[places] = values
+    merged_keys[old] = keys
+    return merged_order, merged_keys
+
+
+class SortedIndex():
+    """
+    Descending permutation of each numeric column, built on first use
+    Sorting a query walks the cached permutation and keeps its rows, so
+    the top rows of any filter cost about limit / selectivity lookups
+    Ties are always ordered by row position and missing values come last
+    in both directions, as in ranges.RangeIndex
+    """
+
+    def __init__(self, columns, names):
+        """
+        Creates the index
+
+        Args:
+            columns(dict): maps column names to numpy arrays
+            names(iterable): The columns that can be sorted through the index
+        """
+        self.columns = columns
+        self.names = set(names)
+        self.orders = {}
+        self.ascending_orders = {}
+        self.ascending_keys = {}
+
+    def __contains__(self, name):
+        return name in self.names
+
+    def order(self, name):
+        """
+        Gets the descending permutation of a column
+
+        Args:
+            name(str): The column name
+        Returns:
+            numpy.ndarray: row positions from the highest to the lowest value,
+                then the rows missing a value
+        """
+        if name not in self.orders:
+            # argsort puts NaN last
+            self.keep(name, np.argsort(-np.asarray(self.columns[name]), kind="stable"))
+        return self.orders[name]
+
+    def keep(self, name, order):
+        """
+        Caches the descending permutation of a column and the ascending
+        values it holds, without the missing ones
+
+        Args:
+            name(str): The column name
+            order(numpy.ndarray): row positions from the highest to the lowest value, NaN last
+        """
+        keys = np.asarray(self.columns[name])[order[::-1]]
+        if keys.dtype.kind == "f":
+            keys = keys[~np.isnan(keys)]
+        self.orders[name] = order
+        self.ascending_orders.pop(name, None)
+        self.ascending_keys[name] = keys
+
+    def view(self, name, descending):
+        """
+        Gets the permutation a sort walks
+
+        Args:
+            name(str): The column name
+            descending(bool): The direction of the view
+        Returns:
+            numpy.ndarray: row positions in the direction's order, ties in
+                any order, rows missing a value last
+        """
+        order = self.order(name)
+        if descending:
+            return order
+        if name not in self.ascending_orders:
+            present = len(self.ascending_keys[name])
+            self.ascending_orders[name] = np.concatenate((order[:present][::-1], order[present:]))
+        return self.ascending_orders[name]
+
+    def extend(self, start):
+        """
+        Merges appended rows into the permutations built so far
+
+        Args:
+            start(int): The row position of the first appended row
+        """
+        for name, order in self.orders.items():
+            column = np.asarray(self.columns[name])
+            new = np.arange(start, len(column))
+            order, _ = merge(order, -column[order], new, -column[new])
+            self.keep(name, order)
+
+    def tie_range(self, name, value, descending):
+        """
+        Finds the rows of a view holding a value
+        Rows missing a value are at the end of both views
+
+        Args:
+            name(str): The column name
+            value: The value of the ties, NaN for the missing values
+            descending(bool): The direction of the view
+        Returns:
+            tuple: the (low, high) positions of the ties in the view
+        """
+        keys = self.ascending_keys[name]
+        if value != value:
+            return len(keys), len(self.orders[name])
+        low = int(np.searchsorted(keys, value, side="left"))
+        high = int(np.searchsorted(keys, value, side="right"))
+        if descending:
+            return len(keys) - high, len(keys) - low
+        return low, high
+
+    def sort(self, name, mask=None, descending=True, limit=None):
+        """
+        Sorts the rows of a filter by a column
+
+        Args:
+            name(str): The column to sort by
+            mask(numpy.ndarray): True for every row position to keep, None for all
+            descending(bool): Sorts in descending order if True
+            limit(int): The largest number of rows to return, None for all
+        Returns:
+            numpy.ndarray: the sorted row positions
+        """
+        view = self.view(name, descending)
+        column = self.columns[name]
+
+        if limit is None or limit >= len(view):
+            picked = view if mask is None else view[mask[view]]
+            if descending:
+                return picked[:limit]
+            return picked[np.lexsort((picked, column[picked]))][:limit]
+        if limit <= 0:
+            return view[:0]
+
+        # Scan growing chunks of the view until enough rows pass the filter
+        found = []
+        count = 0
+        start = 0
+        chunk = max(FIRST_CHUNK, 2 * limit)
+        while start < len(view) and count < limit:
+            block = view[start:start + chunk]
+            if mask is not None:
+                block = block[mask[block]]
+            found.append(block)
+            count += len(block)
+            start += chunk
+            chunk *= 2
+        picked = np.concatenate(found)[:limit]
+        if len(picked) == 0:
+            return picked
+
+        # Rows tied with the last one are ordered by position in the
+        # descending view only, so settle the ties from the whole tie range
+        cutoff = column[picked[-1]]
+        low, high = self.tie_range(name, cutoff, descending)
+        if cutoff != cutoff:
+            before = picked[~np.isnan(column[picked])]
+        else:
+            before = picked[column[picked] != cutoff]
+        tied = view[low:high]
+        if mask is not None:
+            tied = tied[mask[tied]]
+        tied = np.sort(tied)[:limit - len(before)]
+        picked = np.concatenate((before, tied))
+        keys = column[picked]
+        if descending:
+            keys = -keys
+        return picked[np.lexsort((picked, keys))]
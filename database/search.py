@@ -0,0 +1,344 @@
+"""
+Name search indexes for python-pokedex
+
+:Author:    Jose Enrico Salinas
+:Version:   20181204
+"""
+
+import unicodedata
+import numpy as np
+from .ranking import merge
+
+# Sorts after every character a folded name can contain
+PREFIX_END = "\U0010ffff"
+
+
+def normalize(text):
+    """
+    Folds case and diacritics out of a name
+
+    Args:
+        text(str): The name to be folded
+    Returns:
+        str: the folded name, "Flabébé" becomes "flabebe"
+    """
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+class NameIndex():
+    """
+    Sorted array of folded names for exact and prefix lookups
+    """
+
+    def __init__(self, names):
+        """
+        Builds the index over a name column
+
+        Args:
+            names(numpy.ndarray): The names, one per row position
+        """
+        folded = np.array([normalize(name) for name in names])
+        self.order = np.argsort(folded, kind="stable")
+        self.keys = folded[self.order]
+        self.exact_positions = {}
+        for key, position in zip(self.keys.tolist(), self.order.tolist()):
+            self.exact_positions.setdefault(key, []).append(position)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def extend(self, names, start):
+        """
+        Merges the names of appended rows into the index
+        Prefix cursors made before are outdated and must be made again
+
+        Args:
+            names(numpy.ndarray): The names of the appended rows
+            start(int): The row position of the first appended row
+        Returns:
+            list: the folded names
+        """
+        folded = [normalize(name) for name in names]
+        positions = np.arange(start, start + len(folded))
+        self.order, self.keys = merge(self.order, self.keys, positions, np.array(folded, dtype=str))
+        for key, position in zip(folded, positions.tolist()):
+            self.exact_positions.setdefault(key, []).append(position)
+        return folded
+
+    def prefix_range(self, prefix, low=0, high=None):
+        """
+        Finds the keys starting with a folded prefix
+        Only searches keys[low:high], which must contain every match
+
+        Args:
+            prefix(str): The folded prefix
+            low(int): First key position to search
+            high(int): Key position to stop searching at
+        Returns:
+            tuple: the (low, high) key positions of the matches
+        """
+        if high is None:
+            high = len(self.keys)
+        keys = self.keys[low:high]
+        start = low + int(np.searchsorted(keys, prefix, side="left"))
+        stop = low + int(np.searchsorted(keys, prefix + PREFIX_END, side="left"))
+        return start, stop
+
+    def positions(self, low, high):
+        """
+        Gets the row positions of a range of keys
+
+        Args:
+            low(int): First key position
+            high(int): Key position to stop at
+        Returns:
+            numpy.ndarray: the row positions in ascending order
+        """
+        return np.sort(self.order[low:high])
+
+    def prefix(self, prefix):
+        """
+        Finds every row whose name starts with a prefix
+
+        Args:
+            prefix(str): The prefix, folded before lookup
+        Returns:
+            numpy.ndarray: the row positions in ascending order
+        """
+        return self.positions(*self.prefix_range(normalize(prefix)))
+
+    def exact(self, name):
+        """
+        Finds every row with a name, ignoring case and diacritics
+
+        Args:
+            name(str): The name to find
+        Returns:
+            numpy.ndarray: the row positions in ascending order
+        """
+        return np.array(self.exact_positions.get(normalize(name), []), dtype=np.intp)
+
+
+class PrefixCursor():
+    """
+    Incremental prefix search for as-you-type input
+    Each typed character narrows the previous range instead of searching
+    the whole index, and deleted characters restore earlier ranges
+    """
+
+    def __init__(self, index):
+        """
+        Creates a cursor over a name index
+
+        Args:
+            index(NameIndex): The index to be searched
+        """
+        self.index = index
+        self.stack = [("", 0, len(index))]
+
+    def update(self, text):
+        """
+        Moves the cursor to a new input string
+
+        Args:
+            text(str): The current input string
+        Returns:
+            tuple: the (low, high) key positions matching the input
+        """
+        text = normalize(text)
+        while not text.startswith(self.stack[-1][0]):
+            self.stack.pop()
+        prefix, low, high = self.stack[-1]
+        for char in text[len(prefix):]:
+            prefix += char
+            low, high = self.index.prefix_range(prefix, low, high)
+            self.stack.append((prefix, low, high))
+        return low, high
+
+    def positions(self, text):
+        """
+        Finds every row whose name starts with the input string
+
+        Args:
+            text(str): The current input string
+        Returns:
+            numpy.ndarray: the row positions in ascending order
+        """
+        return self.index.positions(*self.update(text))
+
+
+def edit_distance(a, b, limit):
+    """
+    Computes the Levenshtein distance between two strings up to a limit
+    Only fills the diagonal band of the table that can stay within limit
+
+    Args:
+        a(str): The first string
+        b(str): The second string
+        limit(int): The largest distance of interest
+    Returns:
+        int: the number of single character edits turning a into b,
+            limit + 1 if it is larger than limit
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    outside = limit + 1
+    previous = [j if j <= limit else outside for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        low = max(1, i - limit)
+        high = min(len(b), i + limit)
+        current = [outside] * (len(b) + 1)
+        if i <= limit:
+            current[0] = i
+        best = current[0]
+        char_a = a[i - 1]
+        for j in range(low, high + 1):
+            value = min(previous[j] + 1,
+                        current[j - 1] + 1,
+                        previous[j - 1] + (char_a != b[j - 1]))
+            current[j] = value
+            if value < best:
+                best = value
+        if best > limit:
+            return outside
+        previous = current
+    return min(previous[-1], outside)
+
+
+def bigrams(key):
+    """
+    Counts the bigrams of a name padded with start and end markers
+
+    Args:
+        key(str): The folded name
+    Returns:
+        dict: maps each bigram to the number of times it occurs
+    """
+    padded = "\x02" + key + "\x03"
+    counts = {}
+    for i in range(len(padded) - 1):
+        gram = padded[i:i + 2]
+        counts[gram] = counts.get(gram, 0) + 1
+    return counts
+
+
+class FuzzyIndex():
+    """
+    Bigram inverted index over folded names for typo tolerant lookups
+    A name within k edits of the query shares at least
+    max(len) + 1 - 2k padded bigrams with it, so only names passing that
+    count and the length difference get the exact edit distance check
+    """
+
+    def __init__(self, names):
+        """
+        Builds the index over a name index
+
+        Args:
+            names(NameIndex): The index holding the folded names
+        """
+        self.names = names
+        self.keys = list(names.exact_positions)
+        self.lengths = np.array([len(key) for key in self.keys], dtype=np.int32)
+        postings = {}
+        for key_id, key in enumerate(self.keys):
+            for gram, count in bigrams(key).items():
+                postings.setdefault(gram, ([], []))
+                postings[gram][0].append(key_id)
+                postings[gram][1].append(count)
+        self.postings = {gram: (np.array(ids, dtype=np.intp), np.array(counts, dtype=np.int32))
+                         for gram, (ids, counts) in postings.items()}
+        self.known = set(self.keys)
+        self.pending = {}
+
+    def extend(self, keys):
+        """
+        Adds the names of appended rows
+        Their postings are joined to the index on the next search, so many
+        small appends do not copy the postings every time
+
+        Args:
+            keys(iterable): The folded names, see NameIndex.extend
+        """
+        for key in keys:
+            if key in self.known:
+                continue
+            self.known.add(key)
+            key_id = len(self.keys)
+            self.keys.append(key)
+            for gram, count in bigrams(key).items():
+                self.pending.setdefault(gram, ([], []))
+                self.pending[gram][0].append(key_id)
+                self.pending[gram][1].append(count)
+
+    def join_pending(self):
+        """
+        Joins the postings of appended names to the index
+        """
+        if not self.pending:
+            return
+        self.lengths = np.array([len(key) for key in self.keys], dtype=np.int32)
+        empty = (np.empty(0, dtype=np.intp), np.empty(0, dtype=np.int32))
+        for gram, (ids, counts) in self.pending.items():
+            old_ids, old_counts = self.postings.get(gram, empty)
+            self.postings[gram] = (np.concatenate((old_ids, np.array(ids, dtype=np.intp))),
+                                   np.concatenate((old_counts, np.array(counts, dtype=np.int32))))
+        self.pending = {}
+
+    def candidates(self, query, distance):
+        """
+        Finds the names that can be within an edit distance of the query
+
+        Args:
+            query(str): The folded name
+            distance(int): The largest edit distance to accept
+        Returns:
+            numpy.ndarray: ids of the candidate names
+        """
+        self.join_pending()
+        shared = np.zeros(len(self.keys), dtype=np.int32)
+        for gram, count in bigrams(query).items():
+            posting = self.postings.get(gram)
+            if posting is not None:
+                shared[posting[0]] += np.minimum(posting[1], count)
+        needed = np.maximum(self.lengths, len(query)) + 1 - 2 * distance
+        close = np.abs(self.lengths - len(query)) <= distance
+        return np.flatnonzero(close & (shared >= needed))
+
+    def search(self, name, distance=2, limit=10):
+        """
+        Finds the names closest to a misspelled name
+
+        Args:
+            name(str): The name to be searched for
+            distance(int): The largest edit distance to accept
+            limit(int): The largest number of names to return
+        Returns:
+            list: (distance, folded name) tuples, closest first
+        """
+        query = normalize(name)
+        matches = []
+        for key_id in self.candidates(query, distance).tolist():
+            key = self.keys[key_id]
+            found = edit_distance(query, key, distance)
+            if found <= distance:
+                matches.append((found, key))
+        matches.sort()
+        return matches[:limit]
+
+    def positions(self, name, distance=2, limit=10):
+        """
+        Finds the rows whose names are closest to a misspelled name
+
+        Args:
+            name(str): The name to be searched for
+            distance(int): The largest edit distance to accept
+            limit(int): The largest number of names to return
+        Returns:
+            numpy.ndarray: the row positions, closest first
+        """
+        positions = []
+        for found, key in self.search(name, distance, limit):
+            positions.extend(self.names.exact_positions[key])
+        return np.array(positions, dtype=np.intp)
@@ -0,0 +1,273 @@
+"""
+Headless query server for python-pokedex
+
+Loads the Database once and answers requests over a TCP or Unix socket,
+without importing pyglet. Requests and responses are single lines of
+JSON. A client may send many requests without waiting, responses come
+back in request order and carry the request's id.
+
+Requests:
+    {"id": 1, "op": "search", "query": "type:fire sort:-speed", "limit": 10}
+    {"id": 2, "op": "filter", "type": "water", "legendary": false}
+    {"id": 3, "op": "sort", "column": "attack", "descending": true, "query": "gen:1"}
+    {"id": 4, "op": "lookup", "name": "Pikachu"}
+    {"id": 5, "op": "lookup", "index": 24}
+    {"id": 6, "op": "prefix", "prefix": "char"}
+    {"id": 7, "op": "fuzzy", "name": "pikachoo", "distance": 2}
+
+Every request may also give "offset", "limit" and "fields", the columns
+returned for each row. Responses:
+    {"id": 1, "ok": true, "count": 12, "fields": [...], "rows": [[...], ...]}
+    {"id": 1, "ok": false, "error": "Unknown field 'foo'"}
+
+Run as a module to start the server:
+    python -m database.server [--tcp HOST:PORT | --unix PATH] [--data CSV]
+
+:Author:    Jose Enrico Salinas
+:Version:   20181204
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import numpy as np
+from .database import Database
+
+DEFAULT_FIELDS = ("index", "name", "type1", "type2", "hp", "attack", "defense",
+                  "sp_attack", "sp_defense", "speed", "base_total", "generation", "is_legendary")
+
+# Rows returned when a request does not give a limit
+DEFAULT_LIMIT = 50
+
+
+def plain(values):
+    """
+    Converts column values into JSON values
+
+    Args:
+        values(numpy.ndarray): Values read from a column
+    Returns:
+        list: JSON serializable values, None for missing values
+    """
+    values = values.tolist()
+    if values and any(isinstance(value, float) and math.isnan(value) for value in values):
+        return [None if isinstance(value, float) and math.isnan(value) else value for value in values]
+    return values
+
+
+class QueryService():
+    """
+    Answers requests against a loaded database
+    """
+
+    def __init__(self, database):
+        """
+        Creates a new service
+
+        Args:
+            database(Database): The database to be queried
+        """
+        self.database = database
+        self.columns = {}
+        self.refresh()
+        self.requests = 0
+
+    def refresh(self):
+        """
+        Takes new plain arrays over the database columns once rows were appended
+        Plain arrays index without memmap overhead, but keep the length they had
+        """
+        columns = self.database.columns
+        if len(self.columns.get("index", ())) != len(columns["index"]):
+            self.columns = {name: np.asarray(column) for name, column in columns.items()}
+
+    def base(self, request):
+        """
+        Gets the query a request starts from
+
+        Args:
+            request(dict): The request
+        Returns:
+            DatabaseQuery: the rows matching the request's query, every row if it has none
+        """
+        if request.get("query"):
+            return self.database.search(str(request["query"]).lower())
+        return self.database
+
+    def run(self, request):
+        """
+        Runs a request
+
+        Args:
+            request(dict): The request
+        Returns:
+            DatabaseQuery: the matching rows
+        Raises:
+            ValueError: if the request is not valid
+        """
+        op = request.get("op")
+        if op == "search":
+            return self.base(request)
+        if op == "filter":
+            query = self.base(request)
+            if "type" in request:
+                query = query.filter_by_type(str(request["type"]))
+            if "legendary" in request:
+                query = query.filter_by_legendary(bool(request["legendary"]))
+            return query
+        if op == "sort":
+            column = request.get("column")
+            if column not in self.database.columns or self.database.columns[column].dtype.kind not in "iuf":
+                raise ValueError("Cannot sort by '{}'".format(column))
+            return self.base(request).sort_by_column(column, bool(request.get("descending", True)))
+        if op == "lookup":
+            if "name" in request:
+                return self.database.filter_by_name(str(request["name"]))
+            if "index" in request:
+                index = int(request["index"])
+                if not 0 <= index < len(self.database):
+                    raise ValueError("No pokemon at index {}".format(index))
+                return self.database.take(np.array([index]))
+            raise ValueError("Lookup needs a name or an index")
+        if op == "prefix":
+            return self.base(request).filter_by_prefix(str(request.get("prefix", "")))
+        if op == "fuzzy":
+            return self.base(request).filter_by_fuzzy_name(
+                str(request.get("name", "")), int(request.get("distance", 2)), int(request.get("limit", 10)))
+        raise ValueError("Unknown op '{}'".format(op))
+
+    def respond(self, line):
+        """
+        Answers a single request line
+
+        Args:
+            line(bytes): The JSON request
+        Returns:
+            dict: the response
+        """
+        self.requests += 1
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("Expected a JSON object")
+            request_id = request.get("id")
+            self.refresh()
+            query = self.run(request)
+            fields = request.get("fields", DEFAULT_FIELDS)
+            if not isinstance(fields, (list, tuple)):
+                raise ValueError("Fields must be a list of column names")
+            for field in fields:
+                if field not in self.columns:
+                    raise ValueError("Unknown field '{}'".format(field))
+            offset = int(request.get("offset", 0))
+            limit = int(request.get("limit", DEFAULT_LIMIT))
+            positions = query.indices[offset:offset + limit]
+            rows = [list(row) for row in zip(*(plain(self.columns[field][positions]) for field in fields))]
+            return {"id": request_id, "ok": True, "count": len(query), "fields": list(fields), "rows": rows}
+        except Exception as error:
+            # One bad request must not end the connection, e.g. int(1e400) overflows
+            return {"id": request_id, "ok": False, "error": str(error) or type(error).__name__}
+
+    async def read_request(self, reader):
+        """
+        Reads one request line
+        A line longer than the reader's limit is skipped up to its end, so
+        the next request starts on its own line
+
+        Args:
+            reader(asyncio.StreamReader): The connection's input
+        Returns:
+            bytes: the line, empty once the client closes the connection
+        Raises:
+            ValueError: if the line was too long
+        """
+        try:
+            return await reader.readuntil(b"\n")
+        except asyncio.IncompleteReadError as error:
+            return error.partial
+        except asyncio.LimitOverrunError as error:
+            consumed = error.consumed
+        while True:
+            await reader.readexactly(consumed)
+            try:
+                await reader.readuntil(b"\n")
+                break
+            except asyncio.LimitOverrunError as error:
+                consumed = error.consumed
+        raise ValueError("Request line too long")
+
+    async def handle(self, reader, writer):
+        """
+        Serves one connection until the client closes it
+        Requests are answered in order, so pipelined responses stay in order,
+        and the server only waits on a slow client once its output backs up
+
+        Args:
+            reader(asyncio.StreamReader): The connection's input
+            writer(asyncio.StreamWriter): The connection's output
+        """
+        try:
+            while True:
+                try:
+                    line = await self.read_request(reader)
+                except ValueError as error:
+                    self.requests += 1
+                    response = {"id": None, "ok": False, "error": str(error)}
+                else:
+                    if not line:
+                        break
+                    if not line.strip():
+                        continue
+                    response = self.respond(line)
+                writer.write(json.dumps(response, separators=(",", ":")).encode() + b"\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(service, tcp=None, unix=None):
+    """
+    Serves requests until the process is stopped
+
+    Args:
+        service(QueryService): Answers the requests
+        tcp(tuple): The (host, port) to listen on
+        unix(str): The Unix socket path to listen on, used instead of tcp if given
+    """
+    if unix is not None:
+        server = await asyncio.start_unix_server(service.handle, path=unix)
+    else:
+        server = await asyncio.start_server(service.handle, *tcp)
+    async with server:
+        await server.serve_forever()
+
+
+def parse_address(text):
+    """
+    Splits a HOST:PORT address
+
+    Args:
+        text(str): The address
+    Returns:
+        tuple: the host and the port number
+    """
+    host, _, port = text.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serves pokemon queries over a socket")
+    parser.add_argument("--tcp", default="127.0.0.1:8765", help="HOST:PORT to listen on")
+    parser.add_argument("--unix", help="Unix socket path to listen on instead")
+    parser.add_argument("--data", default="resources/data/data.csv", help="the pokemon csv")
+    arguments = parser.parse_args()
+    service = QueryService(Database(arguments.data))
+    print("Serving {} pokemon on {}".format(len(service.database), arguments.unix or arguments.tcp))
+    try:
+        asyncio.run(serve(service, parse_address(arguments.tcp), arguments.unix))
+    except KeyboardInterrupt:
+        pass
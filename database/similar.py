@@ -0,0 +1,288 @@
+"""
+Similar pokemon search for python-pokedex
+
+Every pokemon is a point whose coordinates are its six base stats, in the
+order of the stats hexagon, scaled to zero mean and unit variance. Types
+and log weight/height can be added as extra coordinates. Similarity is
+euclidean distance between points.
+
+The nearest neighbors of every row are computed once, in blocks, and
+saved in the csv's snapshot directory, see database.snapshot, together
+with a key describing the data they were built from, so asking
+for the pokemon most similar to a row is a table lookup. Searches over
+part of the table fall back to a brute force scan of its rows.
+
+:Author:    Jose Enrico Salinas
+:Version:   20181204
+"""
+
+import json
+import os
+import numpy as np
+from . import snapshot
+from .plan import TYPES
+
+STATS = ("hp", "attack", "defense", "speed", "sp_defense", "sp_attack")
+
+# Neighbors kept per row in the saved tables
+NEIGHBORS = 32
+
+# Rows compared at once while building a table
+BLOCK = 1024
+
+# Distance between two pokemon sharing no type, in standard deviations of a stat
+TYPE_WEIGHT = 1.0
+
+
+def standardize(values):
+    """
+    Scales values to zero mean and unit variance, missing values become the mean
+
+    Args:
+        values(numpy.ndarray): The values
+    Returns:
+        numpy.ndarray: the scaled float32 values
+    """
+    values = np.asarray(values, dtype=np.float64)
+    present = ~np.isnan(values)
+    if not present.any():
+        return np.zeros(len(values), dtype=np.float32)
+    mean = values[present].mean()
+    deviation = values[present].std() or 1.0
+    return np.where(present, (values - mean) / deviation, 0).astype(np.float32)
+
+
+def features(columns, types=False, size=False):
+    """
+    Builds the coordinates of every pokemon
+
+    Args:
+        columns(dict): maps column names to numpy arrays
+        types(bool): Adds a coordinate per type, TYPE_WEIGHT / sqrt(2) apart
+        size(bool): Adds the log weight and log height
+    Returns:
+        numpy.ndarray: an n x d float32 matrix
+    """
+    parts = [standardize(columns[name]) for name in STATS]
+    if types:
+        for pokemon_type in TYPES:
+            has_type = (columns["type1"] == pokemon_type) | (columns["type2"] == pokemon_type)
+            parts.append(has_type.astype(np.float32) * np.float32(TYPE_WEIGHT / np.sqrt(2)))
+    if size:
+        for name in ("weight_kg", "height_m"):
+            values = np.asarray(columns[name], dtype=np.float64)
+            parts.append(standardize(np.log(np.where(values > 0, values, np.nan))))
+    return np.stack(parts, axis=1)
+
+
+def nearest_table(points, neighbors=NEIGHBORS, block=BLOCK):
+    """
+    Finds the nearest neighbors of every point, a block of rows at a time
+
+    Args:
+        points(numpy.ndarray): An n x d matrix
+        neighbors(int): The neighbors to keep per point
+        block(int): The rows compared at once, memory grows with block * n
+    Returns:
+        numpy.ndarray: an n x neighbors int32 matrix of row positions, nearest first
+    """
+    count = len(points)
+    neighbors = min(neighbors, count - 1)
+    table = np.empty((count, neighbors), dtype=np.int32)
+    if neighbors <= 0:
+        return table
+    norms = np.einsum("ij,ij->i", points, points)
+    for start in range(0, count, block):
+        rows = np.arange(start, min(start + block, count))
+        distances = norms[rows, None] + norms[None, :] - 2 * points[rows] @ points.T
+        distances[np.arange(len(rows)), rows] = np.inf
+        found = np.argpartition(distances, neighbors - 1, axis=1)[:, :neighbors]
+        found_distances = np.take_along_axis(distances, found, axis=1)
+        # Ties keep row order, so tables are the same on every machine
+        order = np.lexsort((found, found_distances), axis=1)
+        table[rows] = np.take_along_axis(found, order, axis=1)
+    return table
+
+
+class SimilarityIndex():
+    """
+    Nearest neighbor tables for each kind of similarity, built on first use
+    """
+
+    def __init__(self, columns, address=None):
+        """
+        Creates the index
+
+        Args:
+            columns(dict): maps column names to numpy arrays
+            address(str): Address of the csv, the tables are saved in its
+                snapshot directory, None to keep them in memory only
+        """
+        self.columns = columns
+        self.address = address
+        self.points = {}
+        self.tables = {}
+
+    def extend(self):
+        """
+        Forgets the coordinates and tables after rows are appended
+        The stats are scaled over every row, so they are built again on next
+        use, and kept in memory only since the csv does not hold the new rows
+        """
+        self.points = {}
+        self.tables = {}
+        self.address = None
+
+    def kind(self, types, size):
+        """
+        Names a kind of similarity
+
+        Args:
+            types(bool): True if types are compared
+            size(bool): True if weight and height are compared
+        Returns:
+            str: e.g. "stats-types"
+        """
+        return "-".join(["stats"] + (["types"] if types else []) + (["size"] if size else []))
+
+    def features(self, types=False, size=False):
+        """
+        Gets the coordinates of every pokemon for a kind of similarity
+
+        Args:
+            types(bool): Compares types if True
+            size(bool): Compares weight and height if True
+        Returns:
+            numpy.ndarray: an n x d float32 matrix
+        """
+        kind = self.kind(types, size)
+        if kind not in self.points:
+            self.points[kind] = features(self.columns, types, size)
+        return self.points[kind]
+
+    def table(self, types=False, size=False):
+        """
+        Gets the nearest neighbor table for a kind of similarity
+        Loads it from the snapshot directory, or builds and saves it
+
+        Args:
+            types(bool): Compares types if True
+            size(bool): Compares weight and height if True
+        Returns:
+            numpy.ndarray: an n x NEIGHBORS matrix of row positions, nearest first
+        """
+        kind = self.kind(types, size)
+        if kind in self.tables:
+            return self.tables[kind]
+        table = self.load_table(kind)
+        if table is None:
+            table = nearest_table(self.features(types, size))
+            self.save_table(kind, table)
+        self.tables[kind] = table
+        return table
+
+    def table_address(self, kind):
+        """
+        Gets where a table is saved, along with its key
+
+        Args:
+            kind(str): The kind of similarity
+        Returns:
+            str: the address of the table, None if tables are not saved
+        """
+        if self.address is None:
+            return None
+        return os.path.join(snapshot.snapshot_directory(self.address), "neighbors-" + kind + ".npz")
+
+    def table_key(self):
+        """
+        Describes the data a saved table must have been built from
+
+        Returns:
+            dict: the csv digest and the build settings, None without a snapshot
+        """
+        manifest = snapshot.read_manifest(snapshot.snapshot_directory(self.address))
+        if manifest is None:
+            return None
+        return {"sha1": manifest["source"]["sha1"], "rows": len(self.columns["index"]),
+                "neighbors": NEIGHBORS, "type_weight": TYPE_WEIGHT}
+
+    def load_table(self, kind):
+        """
+        Loads a saved table if it matches the current data
+
+        Args:
+            kind(str): The kind of similarity
+        Returns:
+            numpy.ndarray: the table, None if it is missing or outdated
+        """
+        address = self.table_address(kind)
+        if address is None:
+            return None
+        try:
+            with np.load(address, allow_pickle=False) as saved:
+                if json.loads(str(saved["key"])) != self.table_key():
+                    return None
+                return saved["table"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def save_table(self, kind, table):
+        """
+        Saves a table and its key in one file of the snapshot directory,
+        skipped on read-only installs
+        Every writer has its own temporary file, and the saved file is only
+        ever replaced whole, so a reader never pairs a key with another table
+
+        Args:
+            kind(str): The kind of similarity
+            table(numpy.ndarray): The table
+        """
+        address = self.table_address(kind)
+        if address is None:
+            return
+        key = self.table_key()
+        if key is None:
+            return
+        try:
+            temporary = snapshot.temporary_address(address)
+        except OSError:
+            return
+        try:
+            with open(temporary, "wb") as table_file:
+                np.savez(table_file, table=table, key=np.array(json.dumps(key, sort_keys=True)))
+            os.replace(temporary, address)
+        except OSError:
+            snapshot.remove_quietly(temporary)
+
+    def nearest(self, position, limit=10, candidates=None, types=False, size=False):
+        """
+        Finds the pokemon most similar to a row
+
+        Args:
+            position(int): The row position of the pokemon
+            limit(int): The largest number of pokemon to return
+            candidates(numpy.ndarray): row positions to search, every row if None
+            types(bool): Compares types if True
+            size(bool): Compares weight and height if True
+        Returns:
+            numpy.ndarray: row positions of the most similar pokemon, nearest
+                first, never including the pokemon itself
+        """
+        if limit <= 0:
+            return np.empty(0, dtype=np.int64)
+        if candidates is None:
+            table = self.table(types, size)
+            if limit <= table.shape[1]:
+                return table[position, :limit]
+            candidates = np.arange(len(self.columns["index"]))
+        candidates = candidates[candidates != position]
+        points = self.features(types, size)
+        offsets = points[candidates] - points[position]
+        distances = np.einsum("ij,ij->i", offsets, offsets)
+        if limit < len(candidates):
+            found = np.argpartition(distances, limit - 1)[:limit]
+        else:
+            found = np.arange(len(candidates))
+        found = found[np.lexsort((candidates[found], distances[found]))]
+        return candidates[found]
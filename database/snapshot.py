@@ -0,0 +1,544 @@
+"""
+Precompiled binary snapshots of the python-pokedex csv data
+
+A snapshot is a directory of numpy .npy columns next to the csv it was
+built from. Numeric columns are memory-mapped on load so processes on the
+same host share their pages. String columns are stored as int32 codes
+into a string table. The manifest records the csv it was built from and
+the snapshot is rebuilt whenever the csv changes.
+
+The csv is streamed in chunks of rows, once to count the rows and find
+the kind of every column, then again to write each chunk straight into
+the memory-mapped columns, so memory stays a multiple of the chunk size
+plus the string table however large the csv is.
+
+Run as a module to precompile a csv:
+    python -m database.snapshot resources/data/data.csv
+
+:Author:    Jose Enrico Salinas
+:Version:   20181204
+"""
+
+import ast
+import csv
+import hashlib
+import itertools
+import json
+import os
+import sys
+import tempfile
+import numpy as np
+
+VERSION = 2
+MANIFEST = "manifest.json"
+STRINGS = "strings.json"
+
+# Rows parsed at once
+CHUNK_SIZE = 4096
+
+# Columns whose kind is known instead of inferred
+KINDS = {"abilities": "list"}
+
+# Kinds a column can take, each one holds every value of the ones before it
+WIDENING = ("int", "float", "str")
+
+
+def snapshot_directory(csv_address):
+    """
+    Gets the snapshot directory for a csv
+
+    Args:
+        csv_address(str): Address of the csv
+    Returns:
+        str: Address of the snapshot directory
+    """
+    return csv_address + ".snapshot"
+
+
+def file_digest(csv_address):
+    """
+    Hashes the contents of a csv
+
+    Args:
+        csv_address(str): Address of the csv
+    Returns:
+        str: the sha1 hex digest of the file
+    """
+    digest = hashlib.sha1()
+    with open(csv_address, "rb") as csv_file:
+        for block in iter(lambda: csv_file.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_key(csv_address, digest=None):
+    """
+    Describes the csv a snapshot is built from
+
+    Args:
+        csv_address(str): Address of the csv
+        digest(str): sha1 digest of the csv, computed if None
+    Returns:
+        dict: the mtime, size and digest of the csv
+    """
+    status = os.stat(csv_address)
+    if digest is None:
+        digest = file_digest(csv_address)
+    return {"mtime_ns": status.st_mtime_ns, "size": status.st_size, "sha1": digest}
+
+
+def read_manifest(directory):
+    """
+    Reads a snapshot manifest
+
+    Args:
+        directory(str): Address of the snapshot directory
+    Returns:
+        dict: the manifest, or None if it is missing, unreadable or outdated
+    """
+    try:
+        with open(os.path.join(directory, MANIFEST)) as manifest_file:
+            manifest = json.load(manifest_file)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != VERSION:
+        return None
+    return manifest
+
+
+def temporary_address(address):
+    """
+    Creates an empty file to write a new version of a file into
+    Every writer gets its own file in the same directory, so concurrent
+    builds never write into each other's files and os.replace stays atomic
+
+    Args:
+        address(str): Address of the file to be replaced
+    Returns:
+        str: the address of the new file
+    """
+    directory, name = os.path.split(address)
+    descriptor, temporary = tempfile.mkstemp(prefix=name + ".", suffix=".tmp", dir=directory)
+    os.close(descriptor)
+    return temporary
+
+
+def remove_quietly(address):
+    """
+    Removes a file if it still exists
+
+    Args:
+        address(str): Address of the file
+    """
+    try:
+        os.remove(address)
+    except OSError:
+        pass
+
+
+def write_json(address, value):
+    """
+    Atomically writes a json file
+
+    Args:
+        address(str): Address of the file
+        value: The json serializable value
+    """
+    temporary = temporary_address(address)
+    try:
+        with open(temporary, "w") as json_file:
+            json.dump(value, json_file)
+        os.replace(temporary, address)
+    except BaseException:
+        remove_quietly(temporary)
+        raise
+
+
+def is_stale(csv_address, manifest):
+    """
+    Checks if a snapshot no longer matches its csv
+    Only hashes the csv when its mtime or size changed
+
+    Args:
+        csv_address(str): Address of the csv
+        manifest(dict): The snapshot manifest, or None
+    Returns:
+        bool: True if the snapshot must be rebuilt
+    """
+    if manifest is None:
+        return True
+    status = os.stat(csv_address)
+    source = manifest["source"]
+    if status.st_mtime_ns == source["mtime_ns"] and status.st_size == source["size"]:
+        return False
+    return status.st_size != source["size"] or file_digest(csv_address) != source["sha1"]
+
+
+def parse_value(text, kind):
+    """
+    Converts a csv cell into a value of a column kind
+
+    Args:
+        text(str): The csv cell
+        kind(str): "int", "float", "str" or "list"
+    Returns:
+        the converted value, None for a missing string
+    """
+    if kind == "int":
+        return int(text)
+    if kind == "float":
+        return float(text) if text != "" else float("nan")
+    if kind == "list":
+        return parse_list(text) if text != "" else None
+    return text if text != "" else None
+
+
+def parse_list(text):
+    """
+    Checks a csv cell holds a list of strings, like the abilities column
+
+    Args:
+        text(str): The csv cell, e.g. "['Overgrow', 'Chlorophyll']"
+    Returns:
+        str: the list written the way python writes it
+    """
+    try:
+        value = ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        value = None
+    if not isinstance(value, (list, tuple)) or not all(isinstance(item, str) for item in value):
+        raise ValueError("Expected a list of strings, got '{}'".format(text))
+    return repr(list(value))
+
+
+def infer_kind(values):
+    """
+    Finds the narrowest column kind that fits every cell
+
+    Args:
+        values(list): The csv cells of a column
+    Returns:
+        str: "int", "float" or "str"
+    """
+    present = [value for value in values if value != ""]
+    if not present:
+        return "str"
+    try:
+        for value in present:
+            int(value)
+        return "int" if len(present) == len(values) else "float"
+    except ValueError:
+        pass
+    try:
+        for value in present:
+            float(value)
+        return "float"
+    except ValueError:
+        return "str"
+
+
+def widen(kind, other):
+    """
+    Finds the narrowest kind holding the values of two kinds
+
+    Args:
+        kind(str): A column kind, None if no cell was seen yet
+        other(str): Another column kind
+    Returns:
+        str: the wider of the two
+    """
+    if kind is None:
+        return other
+    return WIDENING[max(WIDENING.index(kind), WIDENING.index(other))]
+
+
+def coerce(values, kind, name=""):
+    """
+    Converts the csv cells of a column into typed values
+
+    Args:
+        values(iterable): The csv cells
+        kind(str): The column kind
+        name(str): The column name, for error messages
+    Returns:
+        numpy.ndarray or list: int64 or float64 values, or a list of
+            strings with None for missing values
+    """
+    try:
+        parsed = [parse_value(value, kind) for value in values]
+    except ValueError as error:
+        raise ValueError("Column '{}': {}".format(name, error))
+    if kind == "int":
+        return np.array(parsed, dtype=np.int64)
+    if kind == "float":
+        return np.array(parsed, dtype=np.float64)
+    return parsed
+
+
+def column_kind(name, column):
+    """
+    Gets the kind of a loaded column
+
+    Args:
+        name(str): The column name
+        column(numpy.ndarray): The column
+    Returns:
+        str: "int", "float", "str" or "list"
+    """
+    if name in KINDS:
+        return KINDS[name]
+    if column.dtype.kind in "iu":
+        return "int"
+    if column.dtype.kind == "f":
+        return "float"
+    return "str"
+
+
+def string_column(values):
+    """
+    Converts strings into a column of python objects, the way snapshots load them
+
+    Args:
+        values(list): The strings, None for missing values
+    Returns:
+        numpy.ndarray: an object array with NaN for missing values
+    """
+    column = np.empty(len(values), dtype=object)
+    column[:] = [float("nan") if value is None else value for value in values]
+    return column
+
+
+def read_chunks(csv_address, chunk_size=CHUNK_SIZE):
+    """
+    Streams a csv in chunks of rows
+
+    Args:
+        csv_address(str): Address of the csv
+        chunk_size(int): The most rows in a chunk
+    Returns:
+        generator: the column names, then the csv cells of each chunk as
+            one tuple per column
+    """
+    with open(csv_address, newline="", encoding="utf-8") as csv_file:
+        reader = csv.reader(csv_file)
+        names = next(reader)
+        yield names
+        while True:
+            rows = list(itertools.islice(reader, chunk_size))
+            if not rows:
+                return
+            for row in rows:
+                if len(row) != len(names):
+                    raise ValueError("Expected {} cells, got {}".format(len(names), len(row)))
+            yield list(zip(*rows))
+
+
+def scan(csv_address, chunk_size=CHUNK_SIZE):
+    """
+    Counts the rows of a csv and finds the kind of each column in one pass
+
+    Args:
+        csv_address(str): Address of the csv
+        chunk_size(int): The most rows parsed at once
+    Returns:
+        tuple: the column names (list), their kinds (dict) and the number of rows
+    """
+    chunks = read_chunks(csv_address, chunk_size)
+    names = next(chunks)
+    kinds = dict.fromkeys(names)
+    missing = set()
+    count = 0
+    for cells in chunks:
+        count += len(cells[0])
+        for name, values in zip(names, cells):
+            if name in KINDS or kinds[name] == "str":
+                continue
+            if any(value != "" for value in values):
+                kinds[name] = widen(kinds[name], infer_kind(values))
+            else:
+                missing.add(name)
+    for name in names:
+        if name in KINDS:
+            kinds[name] = KINDS[name]
+        elif kinds[name] is None:
+            kinds[name] = "str"
+        elif kinds[name] == "int" and name in missing:
+            # A chunk of only missing cells, like infer_kind on the whole column
+            kinds[name] = "float"
+    return names, kinds, count
+
+
+def encode_strings(values, strings, codes):
+    """
+    Converts strings into codes into a shared string table
+
+    Args:
+        values(iterable): The strings, None for missing values
+        strings(list): The string table, extended in place
+        codes(dict): maps strings to their position in the table
+    Returns:
+        numpy.ndarray: int32 codes, -1 for missing values
+    """
+    encoded = np.empty(len(values), dtype=np.int32)
+    for i, value in enumerate(values):
+        if value is None:
+            encoded[i] = -1
+            continue
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(strings)
+            strings.append(value)
+        encoded[i] = code
+    return encoded
+
+
+def read_csv(csv_address, chunk_size=CHUNK_SIZE):
+    """
+    Parses a whole csv into typed numpy columns
+
+    Args:
+        csv_address(str): Address of the csv
+        chunk_size(int): The most rows parsed at once
+    Returns:
+        tuple: the column kinds (dict) and the column arrays (dict)
+    """
+    names, kinds, _ = scan(csv_address, chunk_size)
+    parts = {name: [] for name in names}
+    chunks = read_chunks(csv_address, chunk_size)
+    next(chunks)
+    for cells in chunks:
+        for name, values in zip(names, cells):
+            parts[name].append(coerce(values, kinds[name], name))
+    arrays = {}
+    for name in names:
+        if kinds[name] in ("int", "float"):
+            empty = np.empty(0, dtype=np.int64 if kinds[name] == "int" else np.float64)
+            arrays[name] = np.concatenate(parts[name]) if parts[name] else empty
+        else:
+            arrays[name] = [value for part in parts[name] for value in part]
+    return kinds, arrays
+
+
+def build(csv_address, digest=None, chunk_size=CHUNK_SIZE):
+    """
+    Compiles a csv into a snapshot directory, a chunk of rows at a time
+
+    Args:
+        csv_address(str): Address of the csv
+        digest(str): sha1 digest of the csv, computed if None
+        chunk_size(int): The most rows parsed at once
+    Returns:
+        dict: the manifest of the new snapshot
+    """
+    directory = snapshot_directory(csv_address)
+    os.makedirs(directory, exist_ok=True)
+    manifest_address = os.path.join(directory, MANIFEST)
+    if os.path.exists(manifest_address):
+        os.remove(manifest_address)
+
+    source = source_key(csv_address, digest)
+    names, kinds, count = scan(csv_address, chunk_size)
+    # Columns are written to new files so running readers keep their maps
+    # of the old ones, which stay valid once the new files replace them
+    dtypes = {"int": np.int64, "float": np.float64}
+    temporaries = {}
+    outputs = {}
+    try:
+        for name in names:
+            temporaries[name] = temporary_address(os.path.join(directory, name + ".npy"))
+            outputs[name] = np.lib.format.open_memmap(temporaries[name], mode="w+",
+                                                      dtype=dtypes.get(kinds[name], np.int32), shape=(count,))
+        strings = []
+        codes = {}
+        start = 0
+        chunks = read_chunks(csv_address, chunk_size)
+        next(chunks)
+        for cells in chunks:
+            stop = start + len(cells[0])
+            for name, values in zip(names, cells):
+                values = coerce(values, kinds[name], name)
+                if kinds[name] not in dtypes:
+                    values = encode_strings(values, strings, codes)
+                outputs[name][start:stop] = values
+            start = stop
+        for output in outputs.values():
+            output.flush()
+        # Unmap every new column before any file is replaced
+        outputs.clear()
+        for name in names:
+            os.replace(temporaries.pop(name), os.path.join(directory, name + ".npy"))
+    finally:
+        outputs.clear()
+        for temporary in temporaries.values():
+            remove_quietly(temporary)
+
+    write_json(os.path.join(directory, STRINGS), strings)
+    manifest = {"version": VERSION, "source": source,
+                "columns": [[name, kinds[name]] for name in names]}
+    write_json(manifest_address, manifest)
+    return manifest
+
+
+def decode_columns(directory, manifest):
+    """
+    Loads the columns of a snapshot
+
+    Args:
+        directory(str): Address of the snapshot directory
+        manifest(dict): The snapshot manifest
+    Returns:
+        dict: maps column names to numpy arrays
+    """
+    with open(os.path.join(directory, STRINGS)) as strings_file:
+        strings = json.load(strings_file)
+    # Code -1 picks the trailing NaN for missing strings
+    table = np.array(strings + [float("nan")], dtype=object)
+
+    columns = {}
+    for name, kind in manifest["columns"]:
+        values = np.load(os.path.join(directory, name + ".npy"), mmap_mode="r", allow_pickle=False)
+        if kind in ("str", "list"):
+            values = table[values]
+        columns[name] = values
+    return columns
+
+
+def load(csv_address):
+    """
+    Loads the columns of a csv from its snapshot
+    Rebuilds the snapshot first if it is missing or stale
+
+    Args:
+        csv_address(str): Address of the csv
+    Returns:
+        dict: maps column names to numpy arrays
+    """
+    directory = snapshot_directory(csv_address)
+    manifest = read_manifest(directory)
+    if is_stale(csv_address, manifest):
+        try:
+            manifest = build(csv_address)
+        except OSError:
+            # Read-only install, parse the csv without caching it
+            kinds, arrays = read_csv(csv_address)
+            columns = {}
+            for name, kind in kinds.items():
+                if kind in ("str", "list"):
+                    columns[name] = string_column(arrays[name])
+                else:
+                    columns[name] = arrays[name]
+            return columns
+    elif os.stat(csv_address).st_mtime_ns != manifest["source"]["mtime_ns"]:
+        # Same contents under a new mtime, refresh the key without rebuilding
+        manifest["source"] = source_key(csv_address, manifest["source"]["sha1"])
+        try:
+            write_json(os.path.join(directory, MANIFEST), manifest)
+        except OSError:
+            pass
+    return decode_columns(directory, manifest)
+
+
+if __name__ == "__main__":
+    for address in sys.argv[1:] or ["resources/data/data.csv"]:
+        build(address)
+        print("Built {}".format(snapshot_directory(address)))
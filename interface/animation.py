@@ -0,0 +1,173 @@
+"""
+Time-based vertex animations for python-pokedex
+
+:Author:    Jose Enrico Salinas
+:Version:   20181204
+"""
+
+import numpy as np
+import pyglet
+
+
+def linear(progress):
+    """
+    Moves at a constant speed
+
+    Args:
+        progress(numpy.ndarray): Fractions of the animations' durations, from 0 to 1
+    Returns:
+        numpy.ndarray: fractions of the distances covered
+    """
+    return progress
+
+
+def ease_out_cubic(progress):
+    """
+    Starts fast and slows down into the target
+
+    Args:
+        progress(numpy.ndarray): Fractions of the animations' durations, from 0 to 1
+    Returns:
+        numpy.ndarray: fractions of the distances covered
+    """
+    return 1 - (1 - progress) ** 3
+
+
+def ease_in_out_cubic(progress):
+    """
+    Speeds up from the start and slows down into the target
+
+    Args:
+        progress(numpy.ndarray): Fractions of the animations' durations, from 0 to 1
+    Returns:
+        numpy.ndarray: fractions of the distances covered
+    """
+    return np.where(progress < 0.5, 4 * progress ** 3, 1 - (-2 * progress + 2) ** 3 / 2)
+
+
+class VertexAnimator():
+    """
+    Animates the vertices of many widgets towards their targets
+    Every widget's vertices are a row of one array, so each tick
+    interpolates all running animations at once
+    The animator schedules itself on the pyglet clock while anything
+    moves and unschedules itself once every animation has finished
+    """
+
+    def __init__(self, size, duration=0.35, easing=ease_out_cubic, interval=1/120.0):
+        """
+        Creates a new animator
+
+        Args:
+            size(int): The number of coordinates of each widget
+            duration(float): Default seconds an animation takes
+            easing(callable): Maps progress arrays to fractions of the distance covered
+            interval(float): Seconds between ticks while animating
+        """
+        self.size = size
+        self.duration = duration
+        self.easing = easing
+        self.interval = interval
+        self.rows = {}
+        self.setters = []
+        self.values = np.zeros((0, size))
+        self.starts = np.zeros((0, size))
+        self.targets = np.zeros((0, size))
+        self.elapsed = np.zeros(0)
+        self.durations = np.zeros(0)
+        self.active = np.zeros(0, dtype=bool)
+        self.running = False
+
+    def add(self, key, values, setter):
+        """
+        Registers a widget with its current vertices
+
+        Args:
+            key: Identifies the widget
+            values(list): The widget's current coordinates
+            setter(callable): Takes the list of coordinates whenever they move
+        """
+        if len(values) != self.size:
+            raise ValueError("Expected {} coordinates, got {}.".format(self.size, len(values)))
+        if key in self.rows:
+            raise ValueError("Widget is already animated.")
+        row = np.asarray(values, dtype=float)[None, :]
+        self.rows[key] = len(self.setters)
+        self.setters.append(setter)
+        self.values = np.concatenate((self.values, row))
+        self.starts = np.concatenate((self.starts, row))
+        self.targets = np.concatenate((self.targets, row))
+        self.elapsed = np.append(self.elapsed, 0.0)
+        self.durations = np.append(self.durations, self.duration)
+        self.active = np.append(self.active, False)
+
+    def animate(self, key, target, duration=None):
+        """
+        Starts moving a widget from where it is now towards new vertices
+
+        Args:
+            key: Identifies the widget
+            target(list): The coordinates to move to
+            duration(float): Seconds the animation takes, None for the default
+        """
+        row = self.rows[key]
+        self.starts[row] = self.values[row]
+        self.targets[row] = target
+        self.elapsed[row] = 0.0
+        self.durations[row] = self.duration if duration is None else duration
+        self.active[row] = True
+        if not self.running:
+            self.running = True
+            pyglet.clock.schedule_interval(self.tick, self.interval)
+
+    def is_animating(self, key=None):
+        """
+        Checks if animations are still running
+
+        Args:
+            key: Identifies the widget, None for any widget
+        Returns:
+            bool: True if the widget, or any widget, is still moving
+        """
+        if key is None:
+            return bool(self.active.any())
+        return bool(self.active[self.rows[key]])
+
+    def step(self, dt):
+        """
+        Advances every running animation
+
+        Args:
+            dt(float): Seconds since the last step
+        Returns:
+            bool: True once every animation has finished
+        """
+        rows = np.flatnonzero(self.active)
+        if len(rows) == 0:
+            return True
+        self.elapsed[rows] += dt
+        durations = self.durations[rows]
+        progress = np.ones(len(rows))
+        np.divide(self.elapsed[rows], durations, out=progress, where=durations > 0)
+        np.minimum(progress, 1.0, out=progress)
+
+        starts = self.starts[rows]
+        eased = self.easing(progress)[:, None]
+        self.values[rows] = starts + (self.targets[rows] - starts) * eased
+        for row in rows:
+            self.setters[row](self.values[row].tolist())
+
+        self.active[rows[progress >= 1.0]] = False
+        return not self.active.any()
+
+    def tick(self, dt):
+        """
+        Steps the animations from the pyglet clock
+        Unschedules itself once every animation has finished
+
+        Args:
+            dt(float): Seconds since the last tick
+        """
+        if self.step(dt):
+            self.running = False
+            pyglet.clock.unschedule(self.tick)
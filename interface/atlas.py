@@ -0,0 +1,218 @@
+"""
+Texture atlases for the python-pokedex interface images
+
+The builder packs the tiles and type backgrounds into a few large images
+and writes the region of every packed image to a json file. The loader
+serves the packed images as regions of the atlas textures, so the panels
+bind a few textures per frame instead of one per image. The atlases are
+rebuilt when any packed image changes.
+
+Run as a module to build the atlases:
+    python -m interface.atlas
+
+:Author:    Daniel Montecastro
+:Author:    Jose Enrico Salinas
+:Version:   20181204
+"""
+
+import glob
+import json
+import os
+import pyglet
+from pyglet.image.atlas import Allocator, AllocatorException
+from database.snapshot import remove_quietly, temporary_address
+
+VERSION = 1
+DIRECTORY = "resources/atlas"
+METADATA = "atlas.json"
+SIZE = 2048
+# Transparent pixels between packed images so filtering never bleeds
+PADDING = 1
+
+SOURCES = ["resources/tiles/select_active.png",
+           "resources/tiles/select_inactive.png",
+           "resources/tiles/fav_active.png",
+           "resources/tiles/fav_inactive.png",
+           "resources/tiles/search_bar.png",
+           "resources/tiles/search_icon.png",
+           "resources/tiles/scroll_bar.png",
+           "resources/tiles/stat_wheel.png",
+           "resources/tiles/stat_names.png"]
+
+
+def sources():
+    """
+    Gets the addresses of every image to be packed
+
+    Returns:
+        list: addresses of the tiles and type backgrounds
+    """
+    return SOURCES + sorted(glob.glob("resources/backgrounds/*.png"))
+
+
+def source_mtimes(addresses):
+    """
+    Gets the modification times of the packed images
+
+    Args:
+        addresses(list): Addresses of the images
+    Returns:
+        dict: maps each address to its mtime in nanoseconds
+    """
+    return {address: os.stat(address).st_mtime_ns for address in addresses}
+
+
+def compose(width, height, placements):
+    """
+    Copies images into a single RGBA image
+
+    Args:
+        width(int): The width of the atlas
+        height(int): The height of the atlas
+        placements(list): (image, x, y) tuples, image is a pyglet ImageData
+    Returns:
+        pyglet.image.ImageData: the atlas image
+    """
+    pixels = bytearray(width * height * 4)
+    for image, x, y in placements:
+        pitch = image.width * 4
+        data = image.get_data('RGBA', pitch)
+        for row in range(image.height):
+            start = ((y + row) * width + x) * 4
+            pixels[start:start + pitch] = data[row * pitch:(row + 1) * pitch]
+    return pyglet.image.ImageData(width, height, 'RGBA', bytes(pixels))
+
+
+def replace_file(address, write):
+    """
+    Writes a new version of a file and moves it into place atomically
+    Every writer has its own temporary file, so clients rebuilding the
+    atlases at the same time never write into each other's files
+
+    Args:
+        address(str): Address of the file
+        write(callable): Takes the open binary file and writes the contents
+    """
+    temporary = temporary_address(address)
+    try:
+        with open(temporary, "wb") as output:
+            write(output)
+        os.replace(temporary, address)
+    except BaseException:
+        remove_quietly(temporary)
+        raise
+
+
+def build(directory=DIRECTORY, addresses=None, size=SIZE):
+    """
+    Packs images into atlases and writes their metadata
+
+    Args:
+        directory(str): Address of the directory to write the atlases to
+        addresses(list): Addresses of the images, uses sources() if None
+        size(int): The width and height of each atlas
+    Returns:
+        dict: the atlas metadata
+    """
+    if addresses is None:
+        addresses = sources()
+    images = {address: pyglet.image.load(address) for address in addresses}
+    # The strip allocator packs best from the tallest image down
+    ordered = sorted(addresses, key=lambda address: (-images[address].height, address))
+
+    atlases = []
+    placements = []
+    allocator = Allocator(size, size)
+    for address in ordered:
+        image = images[address]
+        try:
+            x, y = allocator.alloc(image.width + PADDING, image.height + PADDING)
+        except AllocatorException:
+            atlases.append(placements)
+            placements = []
+            allocator = Allocator(size, size)
+            x, y = allocator.alloc(image.width + PADDING, image.height + PADDING)
+        placements.append((address, x, y))
+    atlases.append(placements)
+
+    os.makedirs(directory, exist_ok=True)
+    metadata = {"version": VERSION, "sources": source_mtimes(addresses), "atlases": []}
+    for number, placements in enumerate(atlases):
+        name = "atlas{}.png".format(number)
+        height = max(y + images[address].height for address, x, y in placements)
+        atlas = compose(size, height, [(images[address], x, y) for address, x, y in placements])
+        # The name picks the png encoder
+        replace_file(os.path.join(directory, name), lambda output: atlas.save(name, file=output))
+        regions = {address: [x, y, images[address].width, images[address].height]
+                   for address, x, y in placements}
+        metadata["atlases"].append({"image": name, "regions": regions})
+
+    replace_file(os.path.join(directory, METADATA), lambda output: output.write(json.dumps(metadata).encode()))
+    return metadata
+
+
+def read_metadata(directory):
+    """
+    Reads the atlas metadata if it matches the current images
+
+    Args:
+        directory(str): Address of the atlas directory
+    Returns:
+        dict: the metadata, None if it is missing or stale
+    """
+    try:
+        with open(os.path.join(directory, METADATA)) as metadata_file:
+            metadata = json.load(metadata_file)
+        if metadata.get("version") != VERSION:
+            return None
+        if metadata["sources"] != source_mtimes(sources()):
+            return None
+    except (OSError, ValueError):
+        return None
+    return metadata
+
+
+class AtlasLibrary():
+    """
+    Serves packed images as regions of the atlas textures
+    """
+
+    def __init__(self, directory=DIRECTORY):
+        """
+        Loads the atlases, building them first if they are missing or stale
+        Serves nothing if the atlases cannot be built
+
+        Args:
+            directory(str): Address of the atlas directory
+        """
+        self.regions = {}
+        metadata = read_metadata(directory)
+        if metadata is None:
+            try:
+                metadata = build(directory)
+            except (OSError, pyglet.image.codecs.ImageEncodeException):
+                return
+        for atlas in metadata["atlases"]:
+            texture = pyglet.image.load(os.path.join(directory, atlas["image"])).get_texture()
+            for address, (x, y, width, height) in atlas["regions"].items():
+                self.regions[address] = texture.get_region(x, y, width, height)
+
+    def __contains__(self, address):
+        return address in self.regions
+
+    def region(self, address):
+        """
+        Gets the region of a packed image
+
+        Args:
+            address(str): Address of the original image
+        Returns:
+            pyglet.image.TextureRegion: the image in its atlas, None if it is not packed
+        """
+        return self.regions.get(address)
+
+
+if __name__ == "__main__":
+    metadata = build()
+    print("Packed {} images into {} atlases".format(
+        sum(len(atlas["regions"]) for atlas in metadata["atlases"]), len(metadata["atlases"])))
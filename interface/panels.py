@@ -6,26 +6,42 @@ Module containing GUI components for python-pokedex
 :Version:   20181204
 """
 
+import os
+import numpy as np
 import pyglet
 from .colors import Color
+from .textures import TextureManager
+from .redraw import invalidate
+from .text import TextCache, CachedLabel
 from . import processes
 
+# Draw order of the render batch shared by every panel
+BACKGROUND = pyglet.graphics.OrderedGroup(0)
+SECOND_BACKGROUND = pyglet.graphics.OrderedGroup(1)
+SHAPES = pyglet.graphics.OrderedGroup(2)
+SPRITES = pyglet.graphics.OrderedGroup(3)
+FOREGROUND = pyglet.graphics.OrderedGroup(4)
+HEXAGON = pyglet.graphics.OrderedGroup(5)
+OUTLINE = pyglet.graphics.OrderedGroup(6)
+
 class InformationPanel():
     """
     View class to display pokemon information for currently selected pokemon
     """
 
-    def __init__(self, data):
+    def __init__(self, data, textures=None, batch=None):
         """
         Creates a new information panel
 
         Args:
             data(DataRow): The initial data to be loaded
+            textures(TextureManager): Loads and caches the panel's images
+            batch(pyglet.graphics.Batch): The render batch to add the panel to
         """
         
         self.data = data
-        self.front = pyglet.graphics.Batch()
-        self.back = pyglet.graphics.Batch()
+        self.textures = textures if textures is not None else TextureManager()
+        self.batch = batch if batch is not None else pyglet.graphics.Batch()
         self.initialize_components()
 
     def initialize_components(self):
@@ -39,8 +55,8 @@ class InformationPanel():
         self.type_2 = self.data.type2
 
         # Load initial type 1 and 2 background images and sprites
-        self.background_1_image = pyglet.image.load('resources/backgrounds/{}.png'.format(self.type_1))
-        self.background_1_sprite = pyglet.sprite.Sprite(self.background_1_image, batch=self.back)
+        self.background_1_image = self.textures.load_now(self.background_address(self.type_1))
+        self.background_1_sprite = pyglet.sprite.Sprite(self.background_1_image, batch=self.batch, group=BACKGROUND)
 
         # self.type_1_image = pyglet.image.load('resources/types/{}.png'.format(self.type_1.lower()))
         # self.type_1_sprite = pyglet.sprite.Sprite(self.type_1_image, batch=self.front)
@@ -49,91 +65,161 @@ class InformationPanel():
         # Made as an artifact of using pandas for data loading
         if isinstance(self.type_2, str):
             if self.type_2 == 'none':
-                self.background_2_image = pyglet.image.load('resources/backgrounds/{}.png'.format(self.type_1))
-                self.background_2_sprite = pyglet.sprite.Sprite(self.background_2_image, batch=self.back)
+                self.background_2_image = self.textures.load_now(self.background_address(self.type_1))
+                self.background_2_sprite = pyglet.sprite.Sprite(self.background_2_image, batch=self.batch, group=SECOND_BACKGROUND)
             else:
-                self.background_2_image = pyglet.image.load('resources/backgrounds/{}.png'.format(self.type_2))
-                self.background_2_sprite = pyglet.sprite.Sprite(self.background_2_image, batch=self.back)
+                self.background_2_image = self.textures.load_now(self.background_address(self.type_2))
+                self.background_2_sprite = pyglet.sprite.Sprite(self.background_2_image, batch=self.batch, group=SECOND_BACKGROUND)
 
         # Load initial pokemon image and sprite
-        # Attempt to load jpg version if it exists
-        # else, load png version
-        try:
-            self.pokemon_image = pyglet.image.load('resources/pokemon/{}.jpg'.format(self.name.lower()))
-        except(FileNotFoundError):
-            pass
-        try:
-            self.pokemon_image = pyglet.image.load('resources/pokemon/{}.png'.format(self.name.lower()))
-        except(FileNotFoundError):
+        address = self.pokemon_address(self.name)
+        if not os.path.exists(address):
             raise FileNotFoundError("Invalid pokemon name.")
+        self.pokemon_image = self.textures.load_now(address)
         self.pokemon_image.anchor_x = self.pokemon_image.width
-        self.pokemon_sprite = pyglet.sprite.Sprite(self.pokemon_image, self.background_1_sprite.width, self.background_1_sprite.width, batch=self.front)
+        self.pokemon_sprite = pyglet.sprite.Sprite(self.pokemon_image, self.background_1_sprite.width, self.background_1_sprite.width, batch=self.batch, group=SPRITES)
 
-        # Load labels
-        self.label_name = pyglet.text.Label("Name: {}".format(self.data.name), font_name="Power Clear", x=30, y=440, font_size=15, batch=self.front)
-        self.label_abilities_title = pyglet.text.Label("Abilities:", font_name="Power Clear", x=30, y=420, font_size=12, batch=self.front)
-        self.label_abilities = pyglet.text.Label("{}".format(' | '.join(self.data.abilities)), font_name="Power Clear", x=40, y=400, font_size=12, batch=self.front)
-        self.label_weight = pyglet.text.Label("WT: {} kg".format(self.data.weight), font_name="Power Clear", x=30, y=375, font_size=12, batch=self.front)
-        self.label_height = pyglet.text.Label("HT: {} m".format(self.data.height), font_name="Power Clear", x=30, y=355, font_size=12, batch=self.front)
+        # Transparent image shown while a new pokemon image is decoded
+        self.placeholder_image = pyglet.image.SolidColorImagePattern((0, 0, 0, 0)).create_image(
+            self.pokemon_image.width, self.pokemon_image.height)
+        self.placeholder_image.anchor_x = self.placeholder_image.width
+
+        # Load labels, the ones that change are laid out once per string
+        self.text_cache = TextCache(self.batch, FOREGROUND)
+        self.label_name = CachedLabel(self.text_cache, "Name: {}".format(self.data.name), font_name="Power Clear", x=30, y=440, font_size=15)
+        self.label_abilities_title = pyglet.text.Label("Abilities:", font_name="Power Clear", x=30, y=420, font_size=12, batch=self.batch, group=FOREGROUND)
+        self.label_abilities = CachedLabel(self.text_cache, "{}".format(' | '.join(self.data.abilities)), font_name="Power Clear", x=40, y=400, font_size=12)
+        self.label_weight = CachedLabel(self.text_cache, "WT: {} kg".format(self.data.weight), font_name="Power Clear", x=30, y=375, font_size=12)
+        self.label_height = CachedLabel(self.text_cache, "HT: {} m".format(self.data.height), font_name="Power Clear", x=30, y=355, font_size=12)
 
         # Loads hexagon image and sprite
-        self.hexagon_image = pyglet.image.load('resources/tiles/stat_wheel.png')
+        self.hexagon_image = self.textures.load_now('resources/tiles/stat_wheel.png')
         self.hexagon_image.anchor_x = int(self.hexagon_image.width/2)
         self.hexagon_image.anchor_y = int(self.hexagon_image.height/2)
-        self.hexagon_sprite = pyglet.sprite.Sprite(self.hexagon_image, self.background_1_sprite.width/2, self.hexagon_image.height/2 + 25, batch=self.front)
+        self.hexagon_sprite = pyglet.sprite.Sprite(self.hexagon_image, self.background_1_sprite.width/2, self.hexagon_image.height/2 + 25, batch=self.batch, group=SPRITES)
 
         # Loads stat information sprites
-        self.stats_image = pyglet.image.load('resources/tiles/stat_names.png')
+        self.stats_image = self.textures.load_now('resources/tiles/stat_names.png')
         self.stats_image.anchor_x = int(self.stats_image.width/2) + 10
         self.stats_image.anchor_y = int(self.stats_image.height/2)
-        self.stats_sprite = pyglet.sprite.Sprite(self.stats_image, self.hexagon_sprite.x, self.hexagon_sprite.y, batch=self.front)
+        self.stats_sprite = pyglet.sprite.Sprite(self.stats_image, self.hexagon_sprite.x, self.hexagon_sprite.y, batch=self.batch, group=FOREGROUND)
 
         # Loads pokemon stat information
         self.stats = [self.data.hp, self.data.attack, self.data.defense, self.data.speed, self.data.sp_defense, self.data.sp_attack]
         self.current_stats = processes.vertex_create(self.stats, self.hexagon_sprite.x, self.hexagon_sprite.y)
-        self.previous_stats = self.current_stats
+
+        # Stats hexagon, its vertices are updated in place as it animates
+        self.hexagon_fill = self.batch.add_indexed(7, pyglet.gl.GL_TRIANGLES, HEXAGON,
+                                                   [0, 6, 1, 0, 1, 2, 0, 2, 3, 0, 3, 4, 0, 4, 5, 0, 5, 6],
+                                                   ('v2f/stream', tuple([self.hexagon_sprite.x, self.hexagon_sprite.y] + self.current_stats)),
+                                                   ('c4B/static', (Color.WHITE + tuple([150])) * 7))
+        self.hexagon_outline = self.batch.add_indexed(6, pyglet.gl.GL_LINES, OUTLINE,
+                                                      [0, 1, 1, 2, 2, 3, 3, 4, 4, 5, 5, 0],
+                                                      ('v2f/stream', tuple(self.current_stats)),
+                                                      ('c3B/static', Color.BLACK * 6))
 
         # Set panel width
         self.width = self.background_1_image.width
         self.height = self.background_1_image.height
 
+        # White area behind the browser
+        self.white_quad = self.batch.add(4, pyglet.gl.GL_QUADS, BACKGROUND,
+                                         ('v2f/static', (self.background_1_sprite.width, self.background_1_sprite.y,
+                                                         self.background_1_sprite.width, self.background_1_sprite.height,
+                                                         640,             self.background_1_sprite.height,
+                                                         640,             self.background_1_sprite.y)),
+                                         ('c3B/static', Color.WHITE*4))
+
+    def background_address(self, pokemon_type):
+        """
+        Gets the address of a type background image
+
+        Args:
+            pokemon_type(str): The lowercase type
+        Returns:
+            str: Address of the background image
+        """
+        return 'resources/backgrounds/{}.png'.format(pokemon_type)
+
+    def pokemon_address(self, name):
+        """
+        Gets the address of a pokemon image
+        Uses the png version if it exists, else the jpg version
+
+        Args:
+            name(str): The pokemon name
+        Returns:
+            str: Address of the pokemon image
+        """
+        address = 'resources/pokemon/{}.png'.format(name.lower())
+        if not os.path.exists(address):
+            address = 'resources/pokemon/{}.jpg'.format(name.lower())
+        return address
+
     def update_background_sprite(self):
         """
         Updates the background image to the currently selected pokemon's type
+        Images load in the background and are ignored if the selection
+        changed before they were ready
         """
+        index = self.index
+
+        def show_background_1(texture):
+            if self.index == index:
+                self.background_1_sprite.image = texture
+                invalidate()
+
+        def show_background_2(texture):
+            if self.index == index:
+                self.background_2_sprite.image = texture
+                invalidate()
 
         # Replace type_1 sprite background image
-        self.background_1_sprite.image = pyglet.image.load('resources/backgrounds/{}.png'.format(self.type_1))
+        self.textures.load(self.background_address(self.type_1), show_background_1)
         # self.type_1_sprite.image = pyglet.image.load('resources/backgrounds/{}.png'.format(self.type_1.lower()))
 
         # Check if type_2 is a string or a NaN float
         # Made as an artifact of using pandas for data loading
         if isinstance(self.type_2, str):
             if self.type_2 == 'none':
-                self.background_2_sprite.image = pyglet.image.load('resources/backgrounds/{}.png'.format(self.type_1))
+                self.textures.load(self.background_address(self.type_1), show_background_2)
                 # self.type_2_sprite.image = pyglet.image.load('resources/types/{}.png'.format(self.type_1.lower()))
             else:
-                self.background_2_sprite.image = pyglet.image.load('resources/backgrounds/{}.png'.format(self.type_2))
+                self.textures.load(self.background_address(self.type_2), show_background_2)
                 # self.type_2_sprite.image = pyglet.image.load('resources/types/{}.png'.format(self.type_2.lower()))
 
 
     def update_pokemon_sprite(self):
         """
         Updates the pokemon image to the currently selected pokemon
+        Shows a placeholder until the image is decoded
         """
+        index = self.index
 
-        # Load the jpg version of the pokemon image if it exists,
-        # else, load the png version
-        try:
-            self.pokemon_image = pyglet.image.load('resources/pokemon/{}.jpg'.format(self.data.name.lower()))
-        except(FileNotFoundError):
-            pass
-        try:
-            self.pokemon_image = pyglet.image.load('resources/pokemon/{}.png'.format(self.data.name.lower()))
-        except(FileNotFoundError):
-           pass
-        self.pokemon_image.anchor_x = self.pokemon_image.width
-        self.pokemon_sprite.image = self.pokemon_image
+        def show_pokemon(texture):
+            if self.index == index:
+                texture.anchor_x = texture.width
+                self.pokemon_image = texture
+                self.pokemon_sprite.image = texture
+                invalidate()
+
+        if not self.textures.load(self.pokemon_address(self.data.name), show_pokemon):
+            self.pokemon_sprite.image = self.placeholder_image
+
+    def prefetch(self, rows):
+        """
+        Decodes the images of pokemon that may be selected next
+
+        Args:
+            rows(list): DataRows of the pokemon that may be selected next
+        """
+        addresses = []
+        for row in rows:
+            addresses.append(self.pokemon_address(row.name))
+            addresses.append(self.background_address(row.type1))
+            if isinstance(row.type2, str) and row.type2 != 'none':
+                addresses.append(self.background_address(row.type2))
+        self.textures.prefetch(addresses)
 
     def update_labels(self):
         """
@@ -163,22 +249,45 @@ class InformationPanel():
         self.update_background_sprite()
         self.update_pokemon_sprite()
         self.update_labels()
+        invalidate()
+
+    def similar(self, database, limit=10):
+        """
+        Finds the pokemon whose stats hexagon looks most like the current one
+
+        Args:
+            database(DatabaseQuery): The pokemon to search
+            limit(int): The largest number of similar pokemon
+        Returns:
+            DatabaseQuery: the current pokemon followed by the most similar ones
+        """
+        found = database.similar_to(self.data, limit)
+        return database.take(np.concatenate(([self.data.position], found.indices)))
+
+    def update_hexagon(self, vertices):
+        """
+        Moves the stats hexagon without rebuilding its vertex lists
+
+        Args:
+            vertices(list): The six x, y pairs of the hexagon's corners
+        """
+        self.hexagon_fill.vertices[2:] = vertices
+        self.hexagon_outline.vertices[:] = vertices
+        invalidate()
 
     def draw_self(self):
-        self.back.draw()
-        self.front.draw()
-        pyglet.graphics.draw(4, pyglet.gl.GL_QUADS, ('v2f', (self.background_1_sprite.width, self.background_1_sprite.y,
-                                                   self.background_1_sprite.width, self.background_1_sprite.height,
-                                                   640,             self.background_1_sprite.height,
-                                                   640,             self.background_1_sprite.y)),
-                                          ('c3B', Color.WHITE*4))
+        """
+        Draws the panel's batch
+        Only needed when the panel does not share the window's batch
+        """
+        self.batch.draw()
 
 class Browser():
     """
     View class to display the list of pokemon.
     """
 
-    def __init__(self, database, favorites, x, y):
+    def __init__(self, database, favorites, x, y, textures=None, batch=None):
         """
         Creates a new browser
 
@@ -187,31 +296,31 @@ class Browser():
             favorites(Favorites): favorites module to read and write favorites
             x(int): the x position of the browser
             y(int): the y position of the browser
+            textures(TextureManager): Loads and caches the browser's images
+            batch(pyglet.graphics.Batch): The render batch to add the browser to
         """
         self.database = database
+        self.textures = textures if textures is not None else TextureManager()
         self.favorites = favorites
-        self.front = pyglet.graphics.Batch()
-        self.back = pyglet.graphics.Batch()
+        self.batch = batch if batch is not None else pyglet.graphics.Batch()
 
         # Preload image tiles
-        self.select_active_image = pyglet.image.load('resources/tiles/select_active.png')
+        self.select_active_image = self.textures.load_now('resources/tiles/select_active.png')
         self.select_active_image.anchor_x = self.select_active_image.width//2
         self.select_active_image.anchor_y = self.select_active_image.height//2
-        self.select_inactive_image = pyglet.image.load('resources/tiles/select_inactive.png')
+        self.select_inactive_image = self.textures.load_now('resources/tiles/select_inactive.png')
         self.select_inactive_image.anchor_x = self.select_inactive_image.width//2
         self.select_inactive_image.anchor_y = self.select_inactive_image.height//2
-        self.star_active_image = pyglet.image.load('resources/tiles/fav_active.png')
+        self.star_active_image = self.textures.load_now('resources/tiles/fav_active.png')
         self.star_active_image.anchor_x = self.star_active_image.width//2
         self.star_active_image.anchor_y = self.star_active_image.height//2
-        self.star_inactive_image = pyglet.image.load('resources/tiles/fav_inactive.png')
+        self.star_inactive_image = self.textures.load_now('resources/tiles/fav_inactive.png')
         self.star_inactive_image.anchor_x = self.star_inactive_image.width//2
         self.star_inactive_image.anchor_y = self.star_inactive_image.height//2
 
-        # Set states
-        if len(database) >= 10:
-            self.cycle_max = 10
-        else:
-            self.cycle_max = len(database)
+        # Set states, the browser shows a window of cycle_max rows
+        # starting at top, wrapping around the end of the database
+        self.cycle_max = min(10, len(database))
         self.index = 0
         self.top = self.index
         self.selected = self.index
@@ -224,31 +333,27 @@ class Browser():
         self.stars    = []
         self.star_pos = (x, y, self.offset)
 
+        # What each tile currently shows, so only changed tiles are redrawn
+        self.shown = [None] * 10
+        # Row labels are laid out once per name and color
+        self.text_cache = TextCache(self.batch, FOREGROUND)
+
         # Create individual tiles for each pokemon in the list
-        for i in range(self.cycle_max):
-            self.tiles.append(pyglet.sprite.Sprite(self.select_inactive_image, batch=self.back, x=self.tile_pos[0], y=self.tile_pos[1]-self.tile_pos[2]*i))
-            self.stars.append(pyglet.sprite.Sprite(self.star_inactive_image, batch=self.back, x=self.star_pos[0], y=self.star_pos[1]-self.star_pos[2]*i))
+        for i in range(10):
+            self.tiles.append(pyglet.sprite.Sprite(self.select_inactive_image, batch=self.batch, group=SPRITES, x=self.tile_pos[0], y=self.tile_pos[1]-self.tile_pos[2]*i))
+            self.stars.append(pyglet.sprite.Sprite(self.star_inactive_image, batch=self.batch, group=SPRITES, x=self.star_pos[0], y=self.star_pos[1]-self.star_pos[2]*i))
             self.stars[i].scale = self.tiles[i].height/self.stars[i].height
-            if self.bottom < self.cycle_max-1:
-                target_fav = i
-            else:
-                target_fav = self.top + i
-            if self.database[target_fav].index in self.favorites:
-                self.stars[i].color = Color.GREY
-            else:
-                self.stars[i].color = Color.WHITE
-            self.texts.append(pyglet.text.Label('{} - {}'.format(processes.add0(self.database[i].index), self.database[i].name)
-                            , batch=self.front, x=self.text_pos[0], font_size=15,
+            self.texts.append(CachedLabel(self.text_cache, '', x=self.text_pos[0], font_size=15,
                               y=self.text_pos[1] - self.text_pos[2]*i, anchor_y='center', font_name='Power Clear',
                               color=Color.BLACK + tuple([255]) ) )
-
-        # Setting the first item as the currently selected item
-        self.tiles[0].image = self.select_active_image
-        self.texts[0].color = Color.WHITE + tuple([255])
+        self.refresh()
 
     def update_data(self, shift):
         """
         Moves the entire list position by an integer
+        The selection moves inside the window and the window scrolls once
+        the selection reaches its edge, shifts of a whole window or more
+        scroll the window and keep the selected tile
 
         Args:
             shift(int): The amount to move the list by
@@ -257,100 +362,86 @@ class Browser():
         """
         
         # Ignore the shift if there is only one item in the database
-        if len(self.database) == 1:
+        if len(self.database) <= 1:
             return self.index
 
-        # Adjust the selected, index, top, and bottom of the list
-        if shift >= self.cycle_max or shift <= -self.cycle_max:
-            self.top += shift
-            self.index += shift
-            self.bottom += shift
-        elif self.index != self.bottom and shift > 0:
-            self.index += shift
-            self.selected += shift
-        elif self.index != self.top and shift < 0:
-            self.index += shift
-            self.selected += shift
-        elif self.index == self.top and shift < 0:
-            self.top += shift
-            self.index += shift
-            self.bottom += shift
-        elif self.index == self.bottom and shift > 0:
-            self.top += shift
-            self.index += shift
-            self.bottom += shift
-
-        # Cycle the indexes if indexes are outside database range
-        if self.top < 0:
-            self.top = len(self.database) + self.top
-        if self.top > len(self.database) - 1:
-            self.top = self.top - len(self.database)
-        if self.bottom > len(self.database) - 1:
-            self.bottom = self.bottom - len(self.database)
-        if self.bottom < 0:
-            self.bottom = len(self.database) + self.bottom
-        if self.selected < 0:
-            self.selected = 0
-        if self.selected > self.cycle_max - 1:
-            self.selected = self.cycle_max - 1
-        if self.index > len(self.database) - 1:
-            self.index = self.index - len(self.database)
-        if self.index < 0:
-            self.index = len(self.database) + self.index
-
-        # Select the items to be displayed
-        target_database = []
-        if self.bottom < self.top:
-            target_database = target_database + self.database[self.top:]
-            target_database = target_database + self.database[0:self.bottom+1]
-        elif self.top > self.bottom and self.bottom < self.cycle_max:
-            target_database = target_database + self.database[self.bottom:]
-            target_database = target_database + self.database[:self.top]
-        else:
-            target_database = target_database + self.database[self.top:self.bottom+1]
-
-        # Display items in the database
-        for i in range(len(target_database)):
-            self.texts[i].text = "{} - {}".format(processes.add0(target_database[i].index), target_database[i].name)
-            target_fav = self.top + i
-            if target_fav > len(self.database) - 1:
-                target_fav = target_fav - len(self.database)
-            if self.database[target_fav].index in self.favorites:
-                self.stars[i].color = Color.GREY
-            else:
-                self.stars[i].color = Color.WHITE
-            if i == self.selected:
-                self.tiles[i].image = self.select_active_image
-                self.texts[i].color = Color.WHITE + tuple([255])
+        self.index = (self.index + shift) % len(self.database)
+        if -self.cycle_max < shift < self.cycle_max:
+            self.selected = min(max(self.selected + shift, 0), self.cycle_max - 1)
+        self.top = (self.index - self.selected) % len(self.database)
+        self.bottom = (self.top + self.cycle_max - 1) % len(self.database)
+
+        self.refresh()
+        return self.index
+
+    def refresh(self):
+        """
+        Shows the rows in the window, only touching the tiles whose row,
+        selection or favorite state changed
+        """
+        changed = False
+        for i in range(len(self.tiles)):
+            if i < self.cycle_max:
+                row = self.database[(self.top + i) % len(self.database)]
+                state = (row.index, row.name, i == self.selected, row.index in self.favorites)
             else:
-                self.tiles[i].image = self.select_inactive_image
-                self.texts[i].color = Color.BLACK + tuple([255])
+                state = None
+            if state == self.shown[i]:
+                continue
+            changed = True
+            previous = self.shown[i]
+            self.shown[i] = state
+            if state is None:
+                self.texts[i].text = ""
+                self.tiles[i].visible = False
+                self.stars[i].visible = False
+                continue
+
+            index, name, selected, favorite = state
+            if previous is None or previous[:3] != state[:3]:
+                color = Color.WHITE if selected else Color.BLACK
+                self.texts[i].update("{} - {}".format(processes.add0(index), name), color + tuple([255]))
+            if previous is None or previous[2] != selected:
+                self.tiles[i].image = self.select_active_image if selected else self.select_inactive_image
+            if previous is None or previous[3] != favorite:
+                self.stars[i].color = Color.GREY if favorite else Color.WHITE
             self.tiles[i].visible = True
             self.stars[i].visible = True
+        if changed:
+            invalidate()
 
-        return self.index
+    def neighbors(self, shifts):
+        """
+        Gets the items the selection would move to
+
+        Args:
+            shifts(iterable): The amounts the list may be moved by
+        Returns:
+            list: DataRows of the items at each shift from the selection
+        """
+        return [self.database[(self.index + shift) % len(self.database)] for shift in shifts]
 
     def clear_browser(self):
         """
         Hides all items in the browser
         """
-        for text in self.texts:
-            text.text = ""
-        for sprite in self.tiles:
-            sprite.visible = False
-        for star in self.stars:
-            star.visible = False
+        for i in range(len(self.tiles)):
+            self.texts[i].text = ""
+            self.tiles[i].visible = False
+            self.stars[i].visible = False
+            self.shown[i] = None
+        invalidate()
 
     def update_favs(self):
         """
         Toggles the favorite state of the currently selected item
         """
-        if self.index in self.favorites:
-            self.favorites.remove(self.index)
-            self.stars[self.selected].color = Color.WHITE
+        index = self.database[self.index].index
+        if index in self.favorites:
+            self.favorites.remove(index)
         else:
-            self.favorites.append(self.index)
-            self.stars[self.selected].color = Color.GREY
+            self.favorites.append(index)
+        self.refresh()
 
     def update_database(self, database):
         """
@@ -360,31 +451,26 @@ class Browser():
             database(DatabaseQuery): The new database
         """
         self.database = database
-
-        if len(database) >= 10:
-            self.cycle_max = 10
-        else:
-            self.cycle_max = len(self.database)
+        self.cycle_max = min(10, len(database))
         self.index = 0
         self.top = self.index
         self.selected = self.index
         self.bottom = self.index + self.cycle_max - 1
-        self.clear_browser()
-        self.update_data(0)
+        self.refresh()
 
     def draw_self(self):
         """
         Draws all components in the Browser
+        Only needed when the browser does not share the window's batch
         """
-        self.back.draw()
-        self.front.draw()
+        self.batch.draw()
 
 class SearchPanel():
     """
     View class to display the search bar
     """
 
-    def __init__(self, database, x, y, window):
+    def __init__(self, database, x, y, window, textures=None, batch=None):
         """
         Creates a new search bar
 
@@ -392,82 +478,102 @@ class SearchPanel():
             database(DatabaseQuery): the database to be searched
             x: the x position of the lower-left of the search bar
             y: the y position of the lower-left of the search bar
+            textures(TextureManager): Loads and caches the search bar's images
+            batch(pyglet.graphics.Batch): The render batch to add the search bar to
         """
-        self.front = pyglet.graphics.Batch()
-        self.back = pyglet.graphics.Batch()
+        self.textures = textures if textures is not None else TextureManager()
+        self.batch = batch if batch is not None else pyglet.graphics.Batch()
         self.square = (           x,             y,
                                   x, window.height,
                        window.width, window.height,
                        window.width,             y)
+        self.quad = self.batch.add(4, pyglet.gl.GL_QUADS, SHAPES, ('v2f/static', self.square), ('c3B/static', Color.GREY * 4))
         self.database = database
+        self.cursor = database.prefix_cursor()
         self.search_string = ""
-        self.label = pyglet.text.Label(text="Search...", font_name="Power Clear", font_size=14, x=430, y=450, batch=self.front, color=Color.BLACK+tuple([255]), anchor_x="left", anchor_y="center")
-        self.bar_image = pyglet.image.load('resources/tiles/search_bar.png')
+        self.label = pyglet.text.Label(text="Search...", font_name="Power Clear", font_size=14, x=430, y=450, batch=self.batch, group=FOREGROUND, color=Color.BLACK+tuple([255]), anchor_x="left", anchor_y="center")
+        self.bar_image = self.textures.load_now('resources/tiles/search_bar.png')
         self.bar_image.anchor_y = int(self.bar_image.height/2)
-        self.bar = pyglet.sprite.Sprite(self.bar_image, x + 30, y = 450, batch=self.back)
-        self.icon_image = pyglet.image.load('resources/tiles/search_icon.png')
+        self.bar = pyglet.sprite.Sprite(self.bar_image, x + 30, y = 450, batch=self.batch, group=SPRITES)
+        self.icon_image = self.textures.load_now('resources/tiles/search_icon.png')
         self.icon_image.anchor_y = int(self.icon_image.height/2)
-        self.icon = pyglet.sprite.Sprite(self.icon_image, x + 40, y = 450, batch=self.front)
+        self.icon = pyglet.sprite.Sprite(self.icon_image, x + 40, y = 450, batch=self.batch, group=FOREGROUND)
 
     def draw_self(self):
         """
         Draws all components of the search bar
+        Only needed when the search bar does not share the window's batch
         """
-        pyglet.graphics.draw(4, pyglet.gl.GL_QUADS, ('v2f', self.square), ('c3B', Color.GREY * 4))
-        self.back.draw()
-        self.front.draw()
+        self.batch.draw()
 
     def handle_backspace(self):
         """
         Removes the last character from the search input
+
+        Returns:
+            DatabaseQuery: pokemon whose name starts with the input, None if there are none
         """
         self.search_string = self.search_string[:-1]
         self.label.text = self.search_string
+        invalidate()
+        return self.search_prefix()
 
     def handle_char(self, key):
         """
         Adds a character to the end of the search input
+
+        Returns:
+            DatabaseQuery: pokemon whose name starts with the input, None if there are none
         """
         self.search_string += key.lower()
-        self.search_string = self.search_string[:15]
+        self.search_string = self.search_string[:24]
         self.search_string = self.search_string.capitalize()
         self.label.text = self.search_string
+        invalidate()
+        return self.search_prefix()
+
+    def search_prefix(self):
+        """
+        Finds the pokemon whose name starts with the search input
+        Refines the previous matches instead of searching the whole database
+
+        Returns:
+            DatabaseQuery: pokemon whose name starts with the input, None if there are none
+        """
+        positions = self.cursor.positions(self.search_string)
+        if len(positions) == 0:
+            return None
+        return self.database.take(positions)
 
     def handle_enter(self):
         """
         Queries the database for the search query
+        Accepts the query language of database.plan, single words search
+        for legendary, common, a type, a stat or a name
 
         Returns:
             DatabaseQuery: database matching the query
         """
-        types  = ['bug', 'dark', 'dragon', 'electric', 'fairy', 'fight', 'fire',
-                       'flying', 'ghost', 'grass', 'ground', 'ice', 'normal', 'poison',
-                       'psychic', 'rock', 'steel', 'water']
-        stats  = ['hp', 'attack', 'defense', 'speed', 'spdefense', 'spattack']
-
         if self.search_string == "":
             return self.database
-        elif self.search_string.lower() == "legendary":
-            self.query = self.database.filter_by_legendary(True)
-        elif self.search_string.lower() == "common":
-            self.query = self.database.filter_by_legendary(False)
-        elif self.search_string.lower() in types:
-            self.query = self.database.filter_by_type(self.search_string.lower())
-        elif self.search_string.lower() in stats:
-            self.query = self.database.sort_by_stat(self.search_string.lower())
-        else:
-            self.query = self.database.filter_by_name(self.search_string)
+        try:
+            self.query = self.database.search(self.search_string)
+        except ValueError:
+            self.query = None
+        if self.query != None and self.query.isempty() and self.search_string.isalpha():
+            self.query = self.database.filter_by_fuzzy_name(self.search_string)
         if self.query != None and not self.query.isempty():
             return self.query
         else:
             self.label.text = "No results..."
+            invalidate()
             return self.database
 
 class ScrollBar():
     """
     View class to display the scroll bar
     """
-    def __init__(self, database, up=0, down=0, left=0, right=0):
+    def __init__(self, database, up=0, down=0, left=0, right=0, textures=None, batch=None):
         """
         Creates a new scroll bar
         
@@ -476,7 +582,11 @@ class ScrollBar():
             up(int): The upper coordinate of the scroll bar
             down(int): The lower coordinate of the scroll bar
             left(int): The left coordinate of the scroll bar
+            textures(TextureManager): Loads and caches the scroll bar's images
+            batch(pyglet.graphics.Batch): The render batch to add the scroll bar to
         """
+        self.textures = textures if textures is not None else TextureManager()
+        self.batch = batch if batch is not None else pyglet.graphics.Batch()
         self.square  =  (right,   up,
                          right, down,
                          left,  down,
@@ -484,12 +594,13 @@ class ScrollBar():
         self.width   = right-left
         self.height  = up-down
         self.ratio   = len(database)/self.height
-        self.bar_img = pyglet.image.load('resources/tiles/scroll_bar.png')
+        self.bar_img = self.textures.load_now('resources/tiles/scroll_bar.png')
         self.bar_img.anchor_x = int(self.bar_img.width/2)
         self.bar_img.anchor_y = int(self.bar_img.height/2)
         self.maximum = up
         self.minimum = down
-        self.bar   = pyglet.sprite.Sprite(self.bar_img, x=right-self.width/2, y=up)
+        self.bar   = pyglet.sprite.Sprite(self.bar_img, x=right-self.width/2, y=up, batch=self.batch, group=SPRITES)
+        self.quad  = self.batch.add(4, pyglet.gl.GL_QUADS, SHAPES, ('v2f/static', self.square), ('c3B/static', Color.GREY * 4))
 
     def update(self, top):
         """
@@ -499,6 +610,7 @@ class ScrollBar():
             top(int): The new top position of the scroll bar
         """
         self.bar.y = int(self.maximum-((top+5)/self.ratio))
+        invalidate()
 
 
     def update_database(self, database):
@@ -513,6 +625,6 @@ class ScrollBar():
     def draw_self(self):
         """
         Draws the scroll bar
+        Only needed when the scroll bar does not share the window's batch
         """
-        pyglet.graphics.draw(4, pyglet.gl.GL_QUADS, ('v2f', self.square), ('c3B', Color.GREY * 4))
-        self.bar.draw()
+        self.batch.draw()
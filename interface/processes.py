@@ -67,20 +67,3 @@ def vertex_create(stats, x, y, limit=255, size=100):
     f1, f2 = x - stats[5] * dx, y + stats[5] * dy  # SDef vertex
     return [a1, a2, b1, b2, c1, c2, d1, d2, e1, e2, f1, f2]
 
-
-def vertex_change(previous, current):
-    """
-    Updates the position of a list of vertices
-
-    Args:
-        previous(list): The current position of vertices to be updated
-        current(list): The new position of vertices
-    Returns:
-        list: The updated list of vertices
-    """
-    for stat in range(len(previous)):
-        if previous[stat] < current[stat]:
-            previous[stat] += int(current[stat]/previous[stat])
-        if previous[stat] > current[stat]:
-            previous[stat] -= int(previous[stat]/current[stat])
-    return [int(i) for i in previous]
@@ -0,0 +1,82 @@
+"""
+Frame profiler for python-pokedex
+
+:Author:    Jose Enrico Salinas
+:Version:   20181204
+"""
+
+import time
+import pyglet
+import pyglet.graphics.vertexdomain
+
+# OpenGL draw functions used by pyglet's batches and immediate drawing
+DRAW_FUNCTIONS = ("glDrawArrays", "glMultiDrawArrays", "glDrawElements", "glMultiDrawElements")
+
+
+class FrameProfiler():
+    """
+    Counts frames, frame times and OpenGL draw calls
+    """
+
+    def __init__(self):
+        """
+        Creates a new profiler, see install to start counting draw calls
+        """
+        self.draw_calls = 0
+        self.frames = 0
+        self.frame_time = 0.0
+        self.frame_start = None
+        self.frame_start_draw_calls = 0
+        self.frame_draw_calls = 0
+
+    def install(self):
+        """
+        Wraps pyglet's draw functions to count draw calls
+        """
+        for module in (pyglet.graphics, pyglet.graphics.vertexdomain):
+            for name in DRAW_FUNCTIONS:
+                function = getattr(module, name, None)
+                if function is not None:
+                    setattr(module, name, self.counted(function))
+
+    def counted(self, function):
+        """
+        Wraps a draw function to count its calls
+
+        Args:
+            function(callable): The draw function
+        Returns:
+            callable: the wrapped draw function
+        """
+        def wrapper(*args):
+            self.draw_calls += 1
+            return function(*args)
+        return wrapper
+
+    def begin_frame(self):
+        """
+        Marks the start of a frame
+        """
+        self.frame_start = time.perf_counter()
+        self.frame_start_draw_calls = self.draw_calls
+
+    def end_frame(self):
+        """
+        Marks the end of a frame
+        """
+        self.frames += 1
+        self.frame_time += time.perf_counter() - self.frame_start
+        self.frame_draw_calls = self.draw_calls - self.frame_start_draw_calls
+
+    def report(self, dt):
+        """
+        Prints the frame statistics since the last report and resets them
+
+        Args:
+            dt(float): Seconds since the last report
+        """
+        if self.frames:
+            print("{:.1f} fps, {:.2f} ms/frame, {} draw calls/frame".format(
+                self.frames / dt, 1000 * self.frame_time / self.frames, self.frame_draw_calls))
+        self.frames = 0
+        self.frame_time = 0.0
@@ -0,0 +1,70 @@
+"""
+On-demand redrawing for python-pokedex
+
+Windows are only redrawn after something marks them invalid, so the
+application sleeps between interactions instead of redrawing at the
+clock rate.
+
+:Author:    Jose Enrico Salinas
+:Version:   20181204
+"""
+
+import time
+import pyglet
+
+
+def invalidate():
+    """
+    Marks every window as needing a redraw
+    Called by the panels whenever something they display changes
+    """
+    for window in pyglet.app.windows:
+        window.invalid = True
+
+
+class OnDemandEventLoop(pyglet.app.EventLoop):
+    """
+    Event loop that only redraws invalid windows, at most max_fps times a second
+    Sleeps until the next event or scheduled function when nothing is invalid
+    """
+
+    def __init__(self, max_fps=60):
+        """
+        Creates a new event loop
+
+        Args:
+            max_fps(float): The largest number of frames per second, None for no cap
+        """
+        super().__init__()
+        self.frame_interval = 1.0 / max_fps if max_fps else 0.0
+        self.last_frame = 0.0
+
+    def idle(self):
+        """
+        Runs scheduled functions and redraws invalid windows
+
+        Returns:
+            float: Seconds before the loop should run again, None to wait for events
+        """
+        dt = self.clock.update_time()
+        self.clock.call_scheduled_functions(dt)
+
+        wait = None
+        invalid = [window for window in pyglet.app.windows if window.invalid]
+        if invalid:
+            remaining = self.last_frame + self.frame_interval - time.perf_counter()
+            if remaining > 0:
+                # Too soon after the last frame, come back when the cap allows
+                wait = remaining
+            else:
+                self.last_frame = time.perf_counter()
+                for window in invalid:
+                    window.invalid = False
+                    window.switch_to()
+                    window.dispatch_event('on_draw')
+                    window.flip()
+
+        sleep = self.clock.get_sleep_time(True)
+        if wait is not None and (sleep is None or wait < sleep):
+            return wait
+        return sleep
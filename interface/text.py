@@ -0,0 +1,289 @@
+"""
+Cached text layouts for python-pokedex
+
+Laying out a label builds a vertex list for its glyphs, which is the most
+expensive part of changing a label. The cache keeps laid out labels in a
+batch that is never drawn and moves their vertex lists into the window's
+batch while they are shown, so showing a string that was shown before
+only copies its vertices.
+
+Moving vertex lists needs pyglet internals, which label_parts reads for
+the pyglet pinned in requirements.txt. With any other layout the cache
+falls back to plain labels drawn straight in the window's batch.
+
+:Author:    Jose Enrico Salinas
+:Version:   20181204
+"""
+
+import collections
+import pyglet
+
+
+def label_parts(label, batch):
+    """
+    Finds the vertex lists of a laid out label and the group of each
+    Reads pyglet 1.3 internals: the layout's vertex lists and the batch's group map
+
+    Args:
+        label(pyglet.text.Label): The laid out label
+        batch(pyglet.graphics.Batch): The batch the label was laid out in
+    Returns:
+        list: (vertex list, group) pairs, None if this pyglet keeps them elsewhere
+    """
+    try:
+        groups = {}
+        for group in label.groups.values():
+            for domain in batch.group_map.get(group, {}).values():
+                groups[id(domain)] = group
+        return [(vertex_list, groups[id(vertex_list.domain)]) for vertex_list in label._vertex_lists]
+    except (AttributeError, KeyError, TypeError):
+        return None
+
+
+class CachedText():
+    """
+    A laid out label and the groups of its vertex lists
+    """
+
+    __slots__ = ("label", "parts", "shown")
+
+    def __init__(self, label, parts):
+        """
+        Creates a new cache entry
+
+        Args:
+            label(pyglet.text.Label): The laid out label
+            parts(list): (vertex list, group) pairs of the label's glyphs,
+                None for a plain label drawn in the window's batch
+        """
+        self.label = label
+        self.parts = parts
+        self.shown = False
+
+
+class TextCache():
+    """
+    LRU cache of laid out labels keyed by their string and style
+    Entries that are not shown are evicted once the cache is full
+    """
+
+    def __init__(self, batch, group=None, capacity=1024):
+        """
+        Creates a new text cache
+
+        Args:
+            batch(pyglet.graphics.Batch): The batch shown labels are drawn in
+            group(pyglet.graphics.Group): The group shown labels are drawn in
+            capacity(int): The largest number of labels to keep
+        """
+        self.batch = batch
+        self.group = group
+        self.capacity = capacity
+        self.storage = pyglet.graphics.Batch()
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def layout(self, key):
+        """
+        Lays out a label in the storage batch
+        Falls back to a plain label in the window's batch if its vertex
+        lists cannot be moved, see label_parts
+
+        Args:
+            key(tuple): The text, font name, font size, color, anchor_x and anchor_y
+        Returns:
+            CachedText: the laid out label
+        """
+        text, font_name, font_size, color, anchor_x, anchor_y = key
+        label = pyglet.text.Label(text, font_name=font_name, font_size=font_size, color=color,
+                                  anchor_x=anchor_x, anchor_y=anchor_y,
+                                  batch=self.storage, group=self.group)
+        parts = label_parts(label, self.storage)
+        if parts is None:
+            label.delete()
+            label = pyglet.text.Label(text, font_name=font_name, font_size=font_size, color=color,
+                                      anchor_x=anchor_x, anchor_y=anchor_y,
+                                      batch=self.batch, group=self.group)
+        return CachedText(label, parts)
+
+    def acquire(self, key):
+        """
+        Gets a laid out label that is not shown yet
+        Lays out a private copy if the cached label is already shown
+
+        Args:
+            key(tuple): The text, font name, font size, color, anchor_x and anchor_y
+        Returns:
+            CachedText: the label
+        """
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            if not entry.shown:
+                self.hits += 1
+                return entry
+            self.misses += 1
+            return self.layout(key)
+        self.misses += 1
+        entry = self.layout(key)
+        if entry.parts is None:
+            # Plain labels cannot be hidden, so they are not kept
+            return entry
+        self.entries[key] = entry
+        self.evict()
+        return entry
+
+    def release(self, key, entry):
+        """
+        Hands back a label once it is not shown anymore
+        Private copies are deleted, plain labels were deleted when hidden
+
+        Args:
+            key(tuple): The key the label was acquired with
+            entry(CachedText): The label
+        """
+        if self.entries.get(key) is not entry and entry.parts is not None:
+            entry.label.delete()
+        self.evict()
+
+    def evict(self):
+        """
+        Deletes the least recently used labels that are not shown until
+        the cache fits its capacity
+        """
+        if len(self.entries) <= self.capacity:
+            return
+        # The newest label is about to be shown, so it is never evicted
+        for key in list(self.entries)[:-1]:
+            if len(self.entries) <= self.capacity:
+                break
+            entry = self.entries[key]
+            if not entry.shown:
+                del self.entries[key]
+                entry.label.delete()
+                self.evictions += 1
+
+    def show(self, entry, x, y):
+        """
+        Moves a label into the window's batch
+
+        Args:
+            entry(CachedText): The label
+            x(int): The x position of the label
+            y(int): The y position of the label
+        """
+        # Labels without inline elements move by offsetting their vertices
+        entry.label.x = x
+        entry.label.y = y
+        entry.shown = True
+        if entry.parts is None:
+            return
+        for vertex_list, group in entry.parts:
+            self.storage.migrate(vertex_list, pyglet.gl.GL_QUADS, group, self.batch)
+
+    def hide(self, entry):
+        """
+        Moves a label back into the storage batch, plain labels are deleted
+
+        Args:
+            entry(CachedText): The label
+        """
+        entry.shown = False
+        if entry.parts is None:
+            entry.label.delete()
+            return
+        for vertex_list, group in entry.parts:
+            self.batch.migrate(vertex_list, pyglet.gl.GL_QUADS, group, self.storage)
+
+    def stats(self):
+        """
+        Gets the cache counters
+
+        Returns:
+            dict: hits, misses, evictions and cached labels
+        """
+        return {"hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "labels": len(self.entries)}
+
+
+class CachedLabel():
+    """
+    A label position that shows labels from a text cache
+    Setting its text or color swaps in the cached layout instead of
+    laying the label out again
+    """
+
+    def __init__(self, cache, text="", x=0, y=0, font_name=None, font_size=None,
+                 color=(255, 255, 255, 255), anchor_x="left", anchor_y="baseline"):
+        """
+        Creates a new cached label
+
+        Args:
+            cache(TextCache): The cache to take laid out labels from
+            text(str): The initial text
+            x(int): The x position of the label
+            y(int): The y position of the label
+            font_name(str): The font of the label
+            font_size(float): The font size in points
+            color(tuple): The RGBA color of the text
+            anchor_x(str): The horizontal anchor, left, center or right
+            anchor_y(str): The vertical anchor, bottom, baseline, center or top
+        """
+        self.cache = cache
+        self.x = x
+        self.y = y
+        self.font_name = font_name
+        self.font_size = font_size
+        self.anchor_x = anchor_x
+        self.anchor_y = anchor_y
+        self._text = text
+        self._color = tuple(color)
+        self.key = None
+        self.entry = None
+        self.swap()
+
+    def swap(self):
+        """
+        Shows the cached layout of the current text and color
+        """
+        key = (self._text, self.font_name, self.font_size, self._color, self.anchor_x, self.anchor_y)
+        if key == self.key:
+            return
+        if self.entry is not None:
+            self.cache.hide(self.entry)
+            self.cache.release(self.key, self.entry)
+        self.key = key
+        self.entry = self.cache.acquire(key)
+        self.cache.show(self.entry, self.x, self.y)
+
+    def update(self, text, color):
+        """
+        Changes the text and color with a single swap
+
+        Args:
+            text(str): The new text
+            color(tuple): The new RGBA color
+        """
+        self._text = text
+        self._color = tuple(color)
+        self.swap()
+
+    @property
+    def text(self):
+        return self._text
+
+    @text.setter
+    def text(self, text):
+        self._text = text
+        self.swap()
+
+    @property
+    def color(self):
+        return self._color
+
+    @color.setter
+    def color(self, color):
+        self._color = tuple(color)
+        self.swap()
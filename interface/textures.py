@@ -0,0 +1,193 @@
+"""
+Texture loading and caching for python-pokedex
+
+:Author:    Daniel Montecastro
+:Author:    Jose Enrico Salinas
+:Version:   20181204
+"""
+
+import collections
+import concurrent.futures
+import logging
+import pyglet
+
+logger = logging.getLogger(__name__)
+
+
+class TextureManager():
+    """
+    Loads images into textures and keeps them in an LRU cache
+    Images are decoded on a background thread pool and uploaded to the
+    GPU on the main thread when the pyglet clock polls the manager
+    Images packed in an atlas are served as regions of the atlas instead
+    """
+
+    def __init__(self, atlas=None, budget=64 * 1024 * 1024, workers=2, interval=1/120.0):
+        """
+        Creates a new texture manager
+
+        Args:
+            atlas(AtlasLibrary): Serves packed images, None to load every image on its own
+            budget(int): The largest number of texture bytes to keep cached
+            workers(int): The number of decoding threads
+            interval(float): Seconds between polls for finished decodes
+        """
+        self.atlas = atlas
+        self.budget = budget
+        self.interval = interval
+        self.cache = collections.OrderedDict()
+        self.size = 0
+        self.pending = {}
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+        self.polling = False
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.prefetches = 0
+        self.cancellations = 0
+        self.failures = 0
+
+    def get(self, address):
+        """
+        Gets a texture from the cache
+
+        Args:
+            address(str): Address of the image
+        Returns:
+            pyglet.image.Texture: the texture, None if it is not cached
+        """
+        if self.atlas is not None and address in self.atlas:
+            return self.atlas.region(address)
+        texture = self.cache.get(address)
+        if texture is not None:
+            self.cache.move_to_end(address)
+        return texture
+
+    def store(self, address, texture):
+        """
+        Adds a texture to the cache and evicts the least recently used
+        textures until the cache fits its budget
+
+        Args:
+            address(str): Address of the image
+            texture(pyglet.image.Texture): The uploaded texture
+        """
+        self.cache[address] = texture
+        self.size += texture.width * texture.height * 4
+        while self.size > self.budget and len(self.cache) > 1:
+            evicted = self.cache.popitem(last=False)[1]
+            self.size -= evicted.width * evicted.height * 4
+            self.evictions += 1
+
+    def load_now(self, address):
+        """
+        Loads a texture on the main thread, from the cache if possible
+
+        Args:
+            address(str): Address of the image
+        Returns:
+            pyglet.image.Texture: the texture
+        """
+        texture = self.get(address)
+        if texture is not None:
+            self.hits += 1
+            return texture
+        self.misses += 1
+        texture = pyglet.image.load(address).get_texture()
+        self.store(address, texture)
+        return texture
+
+    def load(self, address, callback):
+        """
+        Loads a texture in the background, from the cache if possible
+        Calls back immediately on a cache hit, else after the upload
+
+        Args:
+            address(str): Address of the image
+            callback(callable): Takes the texture once it is ready
+        Returns:
+            bool: True if the texture was cached and the callback already ran
+        """
+        texture = self.get(address)
+        if texture is not None:
+            self.hits += 1
+            callback(texture)
+            return True
+        if address in self.pending:
+            self.pending[address][1].append(callback)
+            return False
+        self.misses += 1
+        self.submit(address, [callback])
+        return False
+
+    def prefetch(self, addresses):
+        """
+        Warms the cache with images that are likely to be needed next
+        Cancels earlier prefetches that are not wanted anymore and have not
+        started decoding, prefetches that were since requested are kept
+
+        Args:
+            addresses(iterable): Addresses of the images
+        """
+        wanted = set(addresses)
+        for address, (future, callbacks) in list(self.pending.items()):
+            if not callbacks and address not in wanted and future.cancel():
+                del self.pending[address]
+                self.cancellations += 1
+        for address in wanted:
+            if self.get(address) is None and address not in self.pending:
+                self.prefetches += 1
+                self.submit(address, [])
+
+    def submit(self, address, callbacks):
+        """
+        Starts decoding an image and polls until it is done
+
+        Args:
+            address(str): Address of the image
+            callbacks(list): Callables taking the texture once it is ready
+        """
+        self.pending[address] = (self.executor.submit(pyglet.image.load, address), callbacks)
+        if not self.polling:
+            self.polling = True
+            pyglet.clock.schedule_interval(self.poll, self.interval)
+
+    def poll(self, dt):
+        """
+        Uploads finished decodes and calls back their requesters
+        A failed decode is logged and forgotten, so the next load tries again
+        Stops polling once nothing is pending
+
+        Args:
+            dt(float): Seconds since the last poll
+        """
+        for address, (future, callbacks) in list(self.pending.items()):
+            if future.cancelled() or not future.done():
+                continue
+            del self.pending[address]
+            try:
+                texture = future.result().get_texture()
+            except Exception:
+                logger.exception("Could not load %s", address)
+                self.cache.pop(address, None)
+                self.failures += 1
+                continue
+            self.store(address, texture)
+            for callback in callbacks:
+                callback(texture)
+        if not self.pending:
+            self.polling = False
+            pyglet.clock.unschedule(self.poll)
+
+    def stats(self):
+        """
+        Gets the cache counters
+
+        Returns:
+            dict: hits, misses, evictions, prefetches, cancelled prefetches,
+                failed loads, cached textures and cached bytes
+        """
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "prefetches": self.prefetches, "cancellations": self.cancellations,
+                "failures": self.failures,
+                "textures": len(self.cache), "bytes": self.size}
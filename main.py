@@ -6,17 +6,55 @@ Main file for python-pokedex
 :Version:   20181204
 """
 
+import sys
 import pyglet
 from pyglet.window import key
-from interface.processes import vertex_change
 from database.database import Database
 from database.fav import Favorites
-from interface.colors import Color
+from database.favstore import SQLiteStore
 from interface.panels import InformationPanel, Browser, SearchPanel, ScrollBar
+from interface.textures import TextureManager
+from interface.atlas import AtlasLibrary
+from interface.profiler import FrameProfiler
+from interface.redraw import OnDemandEventLoop, invalidate
+from interface.animation import VertexAnimator
+
+USAGE = "usage: python main.py [--user=NAME] [--fps=N] [--profile]"
+
+
+def parse_fps(value):
+    """
+    Utility function to read the --fps option, exits with the usage if it is not a frame rate
+
+    Args:
+        value(str): The text after --fps=
+    Returns:
+        float: the frame rate cap, 0 for no cap
+    """
+    try:
+        fps = float(value)
+    except ValueError:
+        fps = float("nan")
+    if not 0 <= fps < float("inf"):
+        sys.exit("{}\n--fps takes a frame rate, or 0 for no cap, got '{}'".format(USAGE, value))
+    return fps
+
+
+# Cap the frame rate, change it with --fps=N or turn it off with --fps=0
+max_fps = 60
+for argument in sys.argv[1:]:
+    if argument.startswith("--fps="):
+        max_fps = parse_fps(argument[len("--fps="):])
 
 # Get resources
 database = Database()
-favorites = Favorites()
+# Keep each user's favorites in an SQLite database when run with --user=NAME
+user = None
+for argument in sys.argv[1:]:
+    if argument.startswith("--user="):
+        user = argument[len("--user="):]
+favorites = Favorites(SQLiteStore(profile=user)) if user else Favorites()
+database.use_favorites(favorites)
 current_pokemon = 0
 pyglet.font.add_file("resources/fonts/pkmndp.ttf")
 icon = pyglet.image.load("resources/tiles/icon.png")
@@ -41,26 +79,75 @@ window = pyglet.window.Window(caption='Pokedex V1.0', width=640, height=480)
 pyglet.gl.glEnable(pyglet.gl.GL_BLEND)
 pyglet.gl.glBlendFunc(pyglet.gl.GL_SRC_ALPHA, pyglet.gl.GL_ONE_MINUS_SRC_ALPHA)
 
-# Load gui panels
-information = InformationPanel(database.index(current_pokemon))
+# Load textures, the atlases need the window's GL context
+textures = TextureManager(AtlasLibrary())
+
+# Load gui panels into a single render batch
+batch = pyglet.graphics.Batch()
+information = InformationPanel(database.index(current_pokemon), textures, batch)
 browser = Browser(database, favorites, x=information.width +
-                  30, y=window.height-90)
+                  30, y=window.height-90, textures=textures, batch=batch)
 search_panel = SearchPanel(
-    database, x=information.width, y=window.height-60, window=window)
+    database, x=information.width, y=window.height-60, window=window, textures=textures, batch=batch)
 scroll_bar = ScrollBar(database, window.height-80, 10,
-                       window.width-30, window.width-20)
+                       window.width-30, window.width-20, textures=textures, batch=batch)
+
+# Report frame times and draw calls when run with --profile
+profiler = FrameProfiler()
+if "--profile" in sys.argv:
+    profiler.install()
+    pyglet.clock.schedule_interval(profiler.report, 1.0)
+
+# Animate the stats hexagon towards each new selection
+hexagons = VertexAnimator(len(information.current_stats))
+hexagons.add(information, information.current_stats, information.update_hexagon)
 
 # Initialize states
-previous_stats = information.current_stats
 scroll_state = False
+key_shifts = {key.DOWN: 1, key.UP: -1, key.RIGHT: 10,
+              key.LEFT: -10, key.PAGEDOWN: 50, key.PAGEUP: -50}
+
+
+def animate_hexagon():
+    """
+    Utility function to start animating the stats hexagon towards the current stats
+    """
+    hexagons.animate(information, information.current_stats)
+
+
+def prefetch_neighbors(dt):
+    """
+    Utility function to decode the images of every pokemon a key press can select next
+    """
+    information.prefetch(browser.neighbors(key_shifts.values()))
 
 
-def update_hexagon(dt):
+def select_pokemon(shift):
     """
-    Utility function to update pokemon stats hexagon
+    Utility function to move the selection and update the panels
+    Prefetches the next likely selections once the clock is idle
     """
-    global previous_stats
-    previous_stats = vertex_change(previous_stats, information.current_stats)
+    current_pokemon = browser.update_data(shift)
+    information.update(database.index(current_pokemon))
+    animate_hexagon()
+    scroll_bar.update(browser.top)
+    pyglet.clock.unschedule(prefetch_neighbors)
+    pyglet.clock.schedule_once(prefetch_neighbors, 0)
+
+
+def show_results(query):
+    """
+    Utility function to display a new database in the panels
+    """
+    global database
+    database = query
+    information.update(database.first())
+    animate_hexagon()
+    browser.update_database(database)
+    scroll_bar.update_database(database)
+    scroll_bar.update(browser.top)
+    pyglet.clock.unschedule(prefetch_neighbors)
+    pyglet.clock.schedule_once(prefetch_neighbors, 0)
 
 
 @window.event
@@ -68,30 +155,38 @@ def on_key_press(symbol, mod):
     """
     Event handler function for keyboard input
     """
-    global database, browser, previous_stat
+    global database, browser
 
-    key_shifts = {key.DOWN: 1, key.UP: -1, key.RIGHT: 10,
-                  key.LEFT: -10, key.PAGEDOWN: 50, key.PAGEUP: -50}
     if symbol in key_shifts:
         # Select a new pokemon
-        current_pokemon = browser.update_data(key_shifts[symbol])
-        information.update(database.index(current_pokemon))
-        scroll_bar.update(browser.top)
+        select_pokemon(key_shifts[symbol])
     elif symbol == key.SPACE:
         # Toggle favorite on currently selected pokemon
         browser.update_favs()
     elif symbol == key.BACKSPACE:
         # Remove last character from search input string
-        search_panel.handle_backspace()
+        results = search_panel.handle_backspace()
+        if results is not None:
+            show_results(results)
     elif symbol == key.ENTER:
         # Toggle search function and update panels
-        database = search_panel.handle_enter()
-        current_pokemon = database.first().index
-        information.update(database.first())
-        browser.update_database(database)
-    elif str.isalpha(chr(symbol)):
-        # Append search input string
-        search_panel.handle_char(chr(symbol))
+        show_results(search_panel.handle_enter())
+    elif symbol == key.TAB:
+        # Show the pokemon with the most similar stats to the selected one
+        show_results(information.similar(search_panel.database))
+
+
+@window.event
+def on_text(text):
+    """
+    Event handler function for typed characters
+    Space toggles favorites, so query terms are separated with commas
+    """
+    if text.isprintable() and not text.isspace():
+        # Append search input string and show matching names as you type
+        results = search_panel.handle_char(text)
+        if results is not None:
+            show_results(results)
 
 
 @window.event
@@ -99,9 +194,7 @@ def on_mouse_scroll(x, y, dx, dy):
     """
     Event handler function for mouse scrolling
     """
-    current_pokemon = browser.update_data(int(-dy))
-    information.update(database.index(current_pokemon))
-    scroll_bar.update(browser.top)
+    select_pokemon(int(-dy))
 
 
 @window.event
@@ -119,9 +212,7 @@ def on_mouse_drag(x, y, dx, dy, button, modifier):
             shift = int(len(database)-(dy*scroll_bar.ratio))
         elif scroll_bar.bar.y + int(dy) > scroll_bar.maximum or scroll_bar.bar.y + int(dy) < scroll_bar.minimum:
             shift = 0
-        current_pokemon = browser.update_data(shift)
-        information.update(database.index(current_pokemon))
-        scroll_bar.update(browser.top)
+        select_pokemon(shift)
 
 
 @window.event
@@ -135,29 +226,26 @@ def on_mouse_release(x, y, button, modifier):
         scroll_state = False
 
 
+@window.event
+def on_expose():
+    """
+    Event handler function for the window being shown or uncovered
+    """
+    invalidate()
+
+
 @window.event
 def on_draw():
     """
-    Redraws the view periodically
+    Redraws the view when a panel changed
     """
+    profiler.begin_frame()
     window.clear()
-    information.draw_self()
-    browser.draw_self()
-    search_panel.draw_self()
-    scroll_bar.draw_self()
-
-    # Draw the pokemon stats hexagon
-    vertices = [information.hexagon_sprite.x,
-                information.hexagon_sprite.y] + previous_stats
-    pyglet.graphics.draw_indexed(7, pyglet.gl.GL_TRIANGLES,
-                                 [0, 6, 1, 0, 1, 2, 0, 2, 3, 0,
-                                     3, 4, 0, 4, 5, 0, 5, 6],
-                                 ('v2f', tuple(vertices)), ('c4B', (Color.WHITE + tuple([150])) * 7))
-    pyglet.graphics.draw(6, pyglet.gl.GL_LINE_LOOP,
-                         ('v2f', previous_stats), ('c3B', (Color.BLACK * 6)))
+    batch.draw()
+    profiler.end_frame()
 
 
 if __name__ == "__main__":
-    # Set view to update periodically
-    pyglet.clock.schedule_interval(update_hexagon, 1/120.0)
-    pyglet.app.run()
+    # Only redraw when a panel changed
+    pyglet.app.event_loop = OnDemandEventLoop(max_fps)
+    pyglet.app.event_loop.run()
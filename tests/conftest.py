@@ -0,0 +1,25 @@
+"""
+Shared fixtures for the python-pokedex tests
+
+:Author:    Jose Enrico Salinas
+:Version:   20181204
+"""
+
+import os
+import sys
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from database.database import Database
+
+DATA = os.path.join(ROOT, "resources", "data", "data.csv")
+
+
+@pytest.fixture
+def database():
+    """
+    A freshly loaded database, tests may append to it
+    """
+    return Database(DATA)
@@ -0,0 +1,65 @@
+"""
+Tests for database.batch
+
+:Author:    Jose Enrico Salinas
+:Version:   20181204
+"""
+
+import numpy as np
+from database import batch
+from database.batch import BatchExecutor
+from database.fav import Favorites
+from database.favstore import JournalStore
+
+QUERIES = ["fav", "favorites type:fire", "fav sort:-speed limit:3", "type:water hp>80",
+           "gen:1 sort:-attack limit:5", "legendary", "not a query:", "fav legendary:no"]
+
+
+def batch_of(size):
+    return [QUERIES[number % len(QUERIES)] for number in range(size)]
+
+
+def positions(results):
+    return [None if result is None else result.indices.tolist() for result in results]
+
+
+def test_matches_plan_execute(database):
+    texts = batch_of(len(QUERIES))
+    with BatchExecutor(database, workers=1) as executor:
+        results = executor.run(texts)
+    for text, result in zip(texts, results):
+        if text == "not a query:":
+            assert result is None
+        else:
+            assert result.indices.tolist() == database.search(text).indices.tolist()
+
+
+def test_pool_sees_favorites_and_appended_rows(database, tmp_path, monkeypatch):
+    monkeypatch.setattr(batch, "POOL_THRESHOLD", 16)
+    favorites = Favorites(JournalStore(str(tmp_path / "fav.npy"), legacy=None))
+    try:
+        for key in (0, 3, 6, 24, 149):
+            favorites.append(key)
+        database.use_favorites(favorites)
+        texts = batch_of(64)
+        with BatchExecutor(database, workers=1) as executor:
+            alone = positions(executor.run(texts))
+        with BatchExecutor(database, workers=2) as executor:
+            pooled = positions(executor.run(texts))
+            assert pooled == alone
+            assert len(pooled[0]) == 5
+
+            # Favorites changed after the workers started
+            favorites.remove(24)
+            assert positions(executor.run(texts)) == positions(BatchExecutor(database, workers=1).run(texts))
+
+            # Rows appended after the workers started
+            database.append_csv(database.database_address, chunk_size=100)
+            favorites.append(7)
+            pooled = positions(executor.run(texts))
+        alone = positions(BatchExecutor(database, workers=1).run(texts))
+        assert pooled == alone
+        assert len(database) == 1602
+        assert np.array_equal(np.array(pooled[0]), database.search("fav").indices)
+    finally:
+        favorites.close()
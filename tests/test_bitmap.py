@@ -0,0 +1,71 @@
+"""
+Tests for database.bitmap
+
+:Author:    Jose Enrico Salinas
+:Version:   20181204
+"""
+
+import numpy as np
+import pytest
+from database.bitmap import Bitset, BitmapIndex
+from database.database import BITMAP_COLUMNS
+
+
+@pytest.mark.parametrize("size", [0, 1, 63, 64, 65, 200])
+def test_bitset_matches_sets(size):
+    generator = np.random.RandomState(size)
+    first = generator.random_sample(size) < 0.3
+    second = generator.random_sample(size) < 0.6
+    left, right = Bitset.from_mask(first), Bitset.from_mask(second)
+    assert np.array_equal((left & right).mask(), first & second)
+    assert np.array_equal((left | right).mask(), first | second)
+    assert np.array_equal((left - right).mask(), first & ~second)
+    assert np.array_equal((~left).mask(), ~first)
+    assert len(left) == np.count_nonzero(first)
+    assert left.positions().tolist() == np.flatnonzero(first).tolist()
+    assert left.test(np.arange(size)).tolist() == first.tolist()
+    assert Bitset.from_positions(np.flatnonzero(first), size).mask().tolist() == first.tolist()
+
+
+def test_bitset_edits_and_resize():
+    bits = Bitset.empty(10)
+    bits.add(3)
+    bits.update([5, 9])
+    bits.discard(5)
+    assert bits.positions().tolist() == [3, 9]
+    assert 3 in bits and 5 not in bits
+    bits.resize(130)
+    bits.add(129)
+    assert bits.positions().tolist() == [3, 9, 129]
+    assert len(~bits) == 127
+
+
+@pytest.mark.parametrize("name", sorted(BITMAP_COLUMNS))
+def test_index_matches_brute_force(database, name):
+    columns = [database.columns[column] for column in BITMAP_COLUMNS[name]]
+    index = database.indexes["bitmaps"][name]
+    for value in index.values():
+        expected = np.zeros(len(database), dtype=bool)
+        for column in columns:
+            expected |= column == value
+        assert index.get(value).mask().tolist() == expected.tolist()
+    assert len(index.get("no such value")) == 0
+
+
+def test_index_any_and_where():
+    column = np.array([1, 2, 3, 2, 1, 5])
+    index = BitmapIndex(column)
+    assert index.any([1, 5]).positions().tolist() == [0, 4, 5]
+    assert index.where(lambda value: value >= 2).positions().tolist() == [1, 2, 3, 5]
+
+
+def test_extend_matches_rebuild():
+    first = np.array(["fire", "water", "grass", np.nan, "fire"], dtype=object)
+    second = np.array([np.nan, "fire", "ice", "water", "ice"], dtype=object)
+    index = BitmapIndex(first[:3], second[:3])
+    index.extend(first, second)
+    rebuilt = BitmapIndex(first, second)
+    assert sorted(value for value in index.values() if value == value) == \
+        sorted(value for value in rebuilt.values() if value == value)
+    for value in ("fire", "water", "grass", "ice"):
+        assert index.get(value).positions().tolist() == rebuilt.get(value).positions().tolist()
@@ -0,0 +1,88 @@
+"""
+Tests for database.database, appended rows against a reloaded csv
+
+:Author:    Jose Enrico Salinas
+:Version:   20181204
+"""
+
+import numpy as np
+import pytest
+from database.database import Database
+from conftest import DATA
+
+QUERIES = ["type:fire sort:-speed limit:5", "gen:1..3 legendary:no hp>80", "pikachu", "name:char",
+           "water atk>=100 sort:+defense", "weight<10.5 sort:-total limit:40", "legendary speed"]
+
+
+@pytest.fixture
+def doubled(tmp_path):
+    """
+    A database loaded from a csv holding every row twice
+    """
+    with open(DATA, encoding="utf-8") as csv_file:
+        header, *rows = csv_file.read().splitlines(True)
+    address = str(tmp_path / "doubled.csv")
+    with open(address, "w", encoding="utf-8") as csv_file:
+        csv_file.write(header + "".join(rows) + "".join(rows))
+    return Database(address)
+
+
+def same(first, second):
+    return first.indices.tolist() == second.indices.tolist()
+
+
+@pytest.mark.parametrize("chunk_size", [100, 10000])
+def test_append_csv_matches_reload(database, doubled, chunk_size):
+    # Build the lazy indexes first so they are extended, not built after
+    for text in QUERIES:
+        database.search(text)
+    database.filter_by_ranges(hp=(50, 100), speed=(None, 90))
+    database.filter_by_fuzzy_name("pikachoo")
+    assert database.append_csv(DATA, chunk_size) == 801
+    assert len(database) == len(doubled) == 1602
+    for name, column in doubled.columns.items():
+        if np.asarray(column).dtype.kind in "iuf":
+            np.testing.assert_array_equal(database.columns[name], column, err_msg=name)
+        else:
+            assert [None if value != value else value for value in database.columns[name]] == \
+                [None if value != value else value for value in column], name
+    for text in QUERIES:
+        assert same(database.search(text), doubled.search(text)), text
+    assert same(database.filter_by_ranges(hp=(50, 100), speed=(None, 90)),
+                doubled.filter_by_ranges(hp=(50, 100), speed=(None, 90)))
+    assert same(database.filter_by_range("attack", 100), doubled.filter_by_range("attack", 100))
+    assert same(database.filter_by_fuzzy_name("pikachoo"), doubled.filter_by_fuzzy_name("pikachoo"))
+    assert same(database.filter_by_prefix("bul"), doubled.filter_by_prefix("bul"))
+    assert same(database.filter_by_resistance("fire", "water"), doubled.filter_by_resistance("fire", "water"))
+    assert same(database.counters(database.row(900)), doubled.counters(doubled.row(900)))
+    assert same(database.similar_to(database.row(1000), types=True),
+                doubled.similar_to(doubled.row(1000), types=True))
+
+
+def test_append_rows(database):
+    row = {name: database.columns[name][24] for name in database.columns}
+    row.update({"name": "Pikachu Clone", "abilities": "['Static']", "index": 801})
+    database.append([row])
+    assert len(database) == 802
+    assert database.filter_by_name("Pikachu Clone").indices.tolist() == [801]
+    assert 801 in database.search("type:electric").indices.tolist()
+    assert database.search("name:pikachu").indices.tolist() == [24, 801]
+    with pytest.raises(ValueError):
+        database.extend({"index": np.array([802])})
+
+
+def test_bad_extend_changes_nothing(database):
+    database.search("type:fire sort:-speed limit:5")
+    arrays = {name: database.columns[name][:2] for name in database.columns}
+    lengths = {name: len(column) for name, column in database.columns.items()}
+    for name in ("name", "weight_kg"):
+        short = dict(arrays, **{name: arrays[name][:1]})
+        with pytest.raises(ValueError):
+            database.extend(short)
+    with pytest.raises(ValueError):
+        database.extend(dict(arrays, hp=np.array(["a", "b"], dtype=object)))
+    assert {name: len(column) for name, column in database.columns.items()} == lengths
+    assert len(database) == 801 and database.appended == 0
+    database.extend(arrays)
+    assert len(database) == 803
+    assert database.filter_by_name("Bulbasaur").indices.tolist() == [0, 801]
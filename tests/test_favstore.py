@@ -0,0 +1,131 @@
+"""
+Tests for database.favstore and database.fav
+
+:Author:    Jose Enrico Salinas
+:Version:   20181204
+"""
+
+import numpy as np
+import pytest
+from database.fav import Favorites
+from database.favstore import JournalStore, SQLiteStore
+
+
+def random_changes(seed, count=400, keys=900):
+    """
+    Random favorite toggles and the set they leave behind
+    """
+    generator = np.random.RandomState(seed)
+    changes = [(int(key), bool(favorite)) for key, favorite in
+               zip(generator.randint(0, keys, count), generator.random_sample(count) < 0.6)]
+    expected = set()
+    for key, favorite in changes:
+        if favorite:
+            expected.add(key)
+        else:
+            expected.discard(key)
+    return changes, expected
+
+
+@pytest.mark.parametrize("sync", ["always", "interval", "never"])
+def test_journal_store_round_trip(tmp_path, sync):
+    address = str(tmp_path / "fav.npy")
+    changes, expected = random_changes(1)
+    store = JournalStore(address, legacy=None, sync=sync, compact_after=50)
+    store.load()
+    for start in range(0, len(changes), 7):
+        store.save(dict(changes[start:start + 7]))
+    # Reopened without closing, so the journal is replayed over the last compaction
+    assert set(JournalStore(address, legacy=None).load().positions().tolist()) == expected
+    store.close()
+    assert set(JournalStore(address, legacy=None).load().positions().tolist()) == expected
+
+
+def test_journal_store_ignores_torn_line(tmp_path):
+    address = str(tmp_path / "fav.npy")
+    store = JournalStore(address, legacy=None)
+    store.load()
+    store.save({3: True, 7: True})
+    store.journal.write("+1")
+    store.journal.flush()
+    assert JournalStore(address, legacy=None).load().positions().tolist() == [3, 7]
+    store.close()
+
+
+@pytest.mark.parametrize("torn", ["+1", "-", "+"])
+def test_journal_store_appends_after_torn_line(tmp_path, torn):
+    address = str(tmp_path / "fav.npy")
+    store = JournalStore(address, legacy=None)
+    store.load()
+    store.save({3: True, 5: True})
+    store.journal.write(torn)
+    store.journal.flush()
+
+    store = JournalStore(address, legacy=None)
+    assert store.load().positions().tolist() == [3, 5]
+    store.save({12: True, 5: False})
+    store.save({34: True})
+    assert JournalStore(address, legacy=None).load().positions().tolist() == [3, 12, 34]
+    store.close()
+
+
+def test_journal_store_imports_legacy_csv(tmp_path):
+    legacy = tmp_path / "fav.csv"
+    legacy.write_text("4\n12\n\n")
+    store = JournalStore(str(tmp_path / "fav.npy"), legacy=str(legacy))
+    assert store.load().positions().tolist() == [4, 12]
+    store.close()
+
+
+def test_sqlite_store_profiles(tmp_path):
+    address = str(tmp_path / "favorites.db")
+    changes, expected = random_changes(2)
+    store = SQLiteStore(address, profile="ash")
+    for start in range(0, len(changes), 5):
+        store.save(dict(changes[start:start + 5]))
+    store.use("misty")
+    store.save({1: True})
+    store.close()
+
+    store = SQLiteStore(address, profile="ash")
+    assert set(store.load().positions().tolist()) == expected
+    assert store.profiles() == ["ash", "misty"]
+    store.use("misty")
+    assert store.load().positions().tolist() == [1]
+    store.close()
+
+
+def test_favorites_write_through(tmp_path):
+    address = str(tmp_path / "favorites.db")
+    changes, expected = random_changes(3, count=100)
+    favorites = Favorites(SQLiteStore(address, profile="ash"), delay=0)
+    for key, favorite in changes:
+        if favorite:
+            favorites.append(key)
+        else:
+            favorites.remove(key)
+    assert set(favorites) == expected
+    keys = np.arange(-2, 1100)
+    assert favorites.rows(keys).positions().tolist() == [key + 2 for key in sorted(expected)]
+    favorites.flush()
+    favorites.switch_profile("misty")
+    assert len(favorites) == 0
+    favorites.close()
+
+    store = SQLiteStore(address, profile="ash")
+    assert set(store.load().positions().tolist()) == expected
+    store.close()
+
+
+def test_compactions_use_their_own_temporaries(tmp_path):
+    address = str(tmp_path / "fav.npy")
+    first = JournalStore(address, legacy=None, compact_after=1)
+    second = JournalStore(address, legacy=None, compact_after=1)
+    first.load()
+    second.load()
+    first.save({1: True})
+    second.save({2: True})
+    first.close()
+    second.close()
+    assert JournalStore(address, legacy=None).load().positions().tolist() in ([1], [2])
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["fav.npy", "fav.npy.journal"]
@@ -0,0 +1,82 @@
+"""
+Tests for database.matchups
+
+:Author:    Jose Enrico Salinas
+:Version:   20181204
+"""
+
+import itertools
+import numpy as np
+import pytest
+from database import matchups
+
+
+def brute_force_teams(index, pool, targets, size):
+    """
+    Scores every team of a pool with team_report, teams of interchangeable
+    pokemon counted once
+    """
+    covers, balances = index.team_inputs(pool, targets)
+    scores = {}
+    for team in itertools.combinations(range(len(pool)), size):
+        key = tuple(sorted((covers[member], balances[member]) for member in team))
+        if key not in scores:
+            scores[key] = index.team_report(pool[list(team)], targets)["score"]
+    return sorted(scores.values(), reverse=True)
+
+
+@pytest.mark.parametrize("pokemon_type", ["ghost", "dragon", "ice"])
+@pytest.mark.parametrize("size", [1, 2, 3, 4])
+def test_best_teams_match_brute_force(database, pokemon_type, size):
+    index = database.indexes["matchups"]
+    pool = database.filter_by_type(pokemon_type).indices[:14]
+    expected = brute_force_teams(index, pool, database.indices, size)[:8]
+    found = matchups.best_teams(index, pool, database.indices, size, 8)
+    assert np.allclose([team[0] for team in found], expected)
+    for score, coverage, exposure, members in found:
+        report = index.team_report(members, database.indices)
+        assert score == pytest.approx(report["score"])
+        assert coverage == pytest.approx(report["coverage"])
+        assert exposure == report["exposure"]
+        assert len(set(members.tolist())) == size
+
+
+def test_best_teams_same_with_workers(database):
+    index = database.indexes["matchups"]
+    pool = database.filter_by_type("dragon").indices
+    alone = matchups.best_teams(index, pool, database.indices, 4, 10)
+    pooled = matchups.best_teams(index, pool, database.indices, 4, 10, workers=2)
+    assert [team[0] for team in alone] == [team[0] for team in pooled]
+    assert all(np.array_equal(first[3], second[3]) for first, second in zip(alone, pooled))
+
+
+def test_best_teams_limits(database):
+    index = database.indexes["matchups"]
+    with pytest.raises(ValueError):
+        matchups.best_teams(index, database.indices, database.indices, matchups.MAX_SIZE + 1)
+    with pytest.raises(ValueError):
+        matchups.best_teams(index, database.indices, database.indices, 3)
+    assert matchups.best_teams(index, database.indices[:2], database.indices, 3) == []
+
+
+def test_counters_match_brute_force(database):
+    index = database.indexes["matchups"]
+    candidates = np.arange(0, len(database), 7)
+    target = 5
+    matrix = index.matrix
+
+    def best_hit(attacker, defender):
+        types = [number for number in range(len(matchups.TYPES)) if index.attacks[attacker, number]]
+        return max(matrix[defender, number] for number in types)
+
+    expected = [np.log2(max(best_hit(candidate, target), 0.125)) - np.log2(max(best_hit(target, candidate), 0.125))
+                for candidate in candidates]
+    assert np.allclose(index.counters(target, candidates), expected)
+
+
+def test_resisting_matches_brute_force(database):
+    index = database.indexes["matchups"]
+    fire = np.asarray(database.columns["against_fire"], dtype=float)
+    water = np.asarray(database.columns["against_water"], dtype=float)
+    expected = [row for row in range(len(database)) if fire[row] < 1 and water[row] < 1]
+    assert np.flatnonzero(index.resisting(["fire", "water"])).tolist() == expected
@@ -0,0 +1,89 @@
+"""
+Tests for database.plan
+
+:Author:    Jose Enrico Salinas
+:Version:   20181204
+"""
+
+import numpy as np
+import pytest
+from database import plan
+
+
+def test_word_is_an_exact_name(database):
+    parsed = plan.parse("pikachu")
+    assert [type(predicate) for predicate in parsed.predicates] == [plan.NameEquals]
+    assert database.search("pikachu").indices.tolist() == [24]
+    assert database.search("pika").indices.tolist() == []
+
+
+def test_name_field_is_a_prefix(database):
+    parsed = plan.parse("name:char")
+    assert [type(predicate) for predicate in parsed.predicates] == [plan.NamePrefix]
+    names = [database.columns["name"][position] for position in database.search("name:char").indices]
+    assert sorted(names) == ["Charizard", "Charjabug", "Charmander", "Charmeleon"]
+
+
+def test_predicates_must_define_mask():
+    class Incomplete(plan.Predicate):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+    with pytest.raises(TypeError):
+        plan.NameMatch()
+
+
+def brute_force(columns, keep, sort=None, descending=True, limit=None):
+    """
+    Filters row by row, then sorts by value and row position
+    """
+    rows = np.flatnonzero(keep(columns))
+    if sort is not None:
+        keys = np.asarray(columns[sort], dtype=np.float64)[rows]
+        rows = rows[np.lexsort((rows, -keys if descending else keys, np.isnan(keys)))]
+    return rows[:limit].tolist()
+
+
+def has_type(columns, pokemon_type):
+    return (columns["type1"] == pokemon_type) | (columns["type2"] == pokemon_type)
+
+
+QUERIES = [
+    ("type:fire sort:-speed limit:5",
+     lambda c: has_type(c, "fire"), "speed", True, 5),
+    ("gen:1..3 legendary:no hp>80",
+     lambda c: (c["generation"] >= 1) & (c["generation"] <= 3) & (c["is_legendary"] == 0) & (c["hp"] > 80),
+     None, True, None),
+    ("water, atk>=100 sort:+defense",
+     lambda c: has_type(c, "water") & (c["attack"] >= 100), "defense", False, None),
+    ("legendary speed", lambda c: c["is_legendary"] == 1, "speed", True, None),
+    ("fight dragon limit:0", lambda c: has_type(c, "fighting") & has_type(c, "dragon"), None, True, 0),
+    ("weight<10.5 height!=1 sort:-total limit:17",
+     lambda c: (c["weight_kg"] < 10.5) & (c["height_m"] != 1), "base_total", True, 17),
+    ("gen:4 sort:capture limit:40", lambda c: c["generation"] == 4, "capture_rate", False, 40),
+    ("eggsteps:5120 growth:1059860", lambda c: (c["base_egg_steps"] == 5120) &
+     (c["experience_growth"] == 1059860), None, True, None),
+    ("name:char common", lambda c: np.array([name.lower().startswith("char") for name in c["name"]]) &
+     (c["is_legendary"] == 0), None, True, None),
+    ("spattack limit:3", lambda c: np.ones(len(c["index"]), dtype=bool), "sp_attack", True, 3),
+]
+
+
+@pytest.mark.parametrize("text, keep, sort, descending, limit", QUERIES)
+def test_queries_match_brute_force(database, text, keep, sort, descending, limit):
+    columns = {name: np.asarray(column) for name, column in database.columns.items()}
+    expected = brute_force(columns, keep, sort, descending, limit)
+    assert database.search(text).indices.tolist() == expected
+    # The same plan over a part of the table
+    part = database.filter_by_range("hp", 50, 120)
+    inside = set(part.indices.tolist())
+    expected = [row for row in brute_force(columns, keep, sort, descending) if row in inside][:limit]
+    assert plan.parse(text).execute(part).indices.tolist() == expected
+
+
+@pytest.mark.parametrize("text", ["type:plastic", "foo:1", "hp>1.2.3", "limit:-1", "limit:2.5",
+                                  "legendary:maybe", "gen:1..x", "sort:-colour"])
+def test_bad_queries_raise(text):
+    with pytest.raises(ValueError):
+        plan.parse(text)
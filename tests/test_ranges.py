@@ -0,0 +1,101 @@
+"""
+Tests for database.ranges
+
+:Author:    Jose Enrico Salinas
+:Version:   20181204
+"""
+
+import numpy as np
+import pytest
+from database.ranges import RangeIndex, KDTree, above, below
+
+
+def random_columns(seed, size=2000):
+    generator = np.random.RandomState(seed)
+    columns = {"index": np.arange(size),
+               "hp": generator.randint(1, 200, size).astype(np.int64),
+               "speed": generator.normal(80, 30, size),
+               "weight_kg": generator.exponential(50, size)}
+    columns["weight_kg"][generator.random_sample(size) < 0.1] = np.nan
+    return columns
+
+
+def inside(column, low, high):
+    with np.errstate(invalid="ignore"):
+        keep = ~np.isnan(column.astype(np.float64))
+        if low is not None:
+            keep &= column >= low
+        if high is not None:
+            keep &= column <= high
+    return np.flatnonzero(keep)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_between_matches_brute_force(seed):
+    columns = random_columns(seed)
+    index = RangeIndex(columns, ("hp", "speed", "weight_kg"))
+    generator = np.random.RandomState(seed)
+    for name in ("hp", "speed", "weight_kg"):
+        values = columns[name][~np.isnan(columns[name].astype(np.float64))]
+        for _ in range(30):
+            low, high = sorted(generator.choice(values, 2))
+            low = None if generator.random_sample() < 0.2 else low
+            high = None if generator.random_sample() < 0.2 else high
+            expected = inside(columns[name], low, high)
+            found = index.between(name, low, high)
+            assert np.sort(found).tolist() == expected.tolist()
+            assert index.count(name, low, high) == len(expected)
+            assert np.all(np.diff(columns[name][found]) >= 0)
+
+
+def test_strict_bounds():
+    columns = {"index": np.arange(5), "hp": np.array([10, 20, 20, 30, 40])}
+    index = RangeIndex(columns, ("hp",))
+    assert np.sort(index.between("hp", above(20), None)).tolist() == [3, 4]
+    assert np.sort(index.between("hp", None, below(20))).tolist() == [0]
+    with pytest.raises(ValueError):
+        index.between("attack", 1, 2)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_box_matches_brute_force(seed):
+    columns = random_columns(seed)
+    index = RangeIndex(columns, ("hp", "speed", "weight_kg"))
+    generator = np.random.RandomState(seed + 10)
+    for _ in range(40):
+        ranges = {}
+        for name in generator.choice(["hp", "speed", "weight_kg"], generator.randint(2, 4), replace=False):
+            values = columns[name][~np.isnan(columns[name].astype(np.float64))]
+            low, high = sorted(generator.choice(values, 2))
+            ranges[str(name)] = (None if generator.random_sample() < 0.2 else low, high)
+        expected = np.arange(len(columns["index"]))
+        for name, (low, high) in ranges.items():
+            expected = np.intersect1d(expected, inside(columns[name], low, high))
+        assert np.sort(index.box(ranges)).tolist() == expected.tolist()
+
+
+def test_kd_tree_small_leaves():
+    generator = np.random.RandomState(5)
+    points = generator.randint(0, 10, (500, 3)).astype(np.float64)
+    tree = KDTree(points, np.arange(500) * 2, leaf_size=4)
+    for _ in range(50):
+        low = generator.randint(0, 10, 3)
+        high = low + generator.randint(0, 5, 3)
+        expected = np.flatnonzero(np.all((points >= low) & (points <= high), axis=1)) * 2
+        assert np.sort(tree.query(low, high)).tolist() == expected.tolist()
+
+
+def test_extend_matches_rebuild():
+    columns = random_columns(9)
+    size = len(columns["index"])
+    index = RangeIndex({name: column[:1500] for name, column in columns.items()}, ("hp", "weight_kg"))
+    index.between("hp", 50, 60)
+    index.between("weight_kg", None, 20)
+    index.box({"hp": (10, 90), "weight_kg": (5, 50)})
+    index.columns = columns
+    index.extend(1500)
+    for name, low, high in (("hp", 50, 60), ("weight_kg", None, 20)):
+        assert np.sort(index.between(name, low, high)).tolist() == inside(columns[name], low, high).tolist()
+    expected = np.intersect1d(inside(columns["hp"], 10, 90), inside(columns["weight_kg"], 5, 50))
+    assert np.sort(index.box({"hp": (10, 90), "weight_kg": (5, 50)})).tolist() == expected.tolist()
+    assert index.count("hp") == size
@@ -0,0 +1,88 @@
+"""
+Tests for database.ranking
+
+:Author:    Jose Enrico Salinas
+:Version:   20181204
+"""
+
+import numpy as np
+import pytest
+from database import plan
+from database.ranking import SortedIndex, merge
+
+
+def brute_force_sort(column, mask, descending, limit):
+    """
+    Sorts by value then row position, missing values last in both directions
+    """
+    rows = np.flatnonzero(mask)
+    keys = -column[rows] if descending else column[rows]
+    order = np.lexsort((rows, keys, np.isnan(keys)))
+    return rows[order][:limit]
+
+
+def random_column(seed, size=300, missing=0.1):
+    generator = np.random.RandomState(seed)
+    column = generator.randint(0, 20, size).astype(np.float64)
+    column[generator.random_sample(size) < missing] = np.nan
+    return column
+
+
+def test_nan_column_from_review():
+    column = np.array([3, np.nan, 1, 5, np.nan, 2, 5, 0])
+    index = SortedIndex({"value": column}, ["value"])
+    assert index.sort("value", descending=False, limit=3).tolist() == [7, 2, 5]
+    assert index.sort("value", descending=True, limit=3).tolist() == [3, 6, 0]
+    assert index.sort("value", descending=False).tolist() == [7, 2, 5, 0, 3, 6, 1, 4]
+    assert index.sort("value", descending=True).tolist() == [3, 6, 0, 5, 2, 7, 1, 4]
+    index.order("value")
+    assert index.tie_range("value", 5, True) == (0, 2)
+    assert index.tie_range("value", 5, False) == (4, 6)
+    assert index.tie_range("value", np.nan, False) == (6, 8)
+
+
+@pytest.mark.parametrize("seed", range(6))
+@pytest.mark.parametrize("descending", [True, False])
+def test_sort_matches_brute_force(seed, descending):
+    column = random_column(seed, missing=0.05 * seed)
+    index = SortedIndex({"value": column}, ["value"])
+    generator = np.random.RandomState(seed + 100)
+    for selectivity in (1.0, 0.5, 0.05):
+        mask = generator.random_sample(len(column)) < selectivity
+        for limit in (None, 0, 1, 3, 10, 64, 200, 290, 400):
+            expected = brute_force_sort(column, mask, descending, limit)
+            assert index.sort("value", mask, descending, limit).tolist() == expected.tolist()
+        expected = brute_force_sort(column, np.ones(len(column), dtype=bool), descending, 50)
+        assert index.sort("value", None, descending, 50).tolist() == expected.tolist()
+
+
+@pytest.mark.parametrize("descending", [True, False])
+def test_extend_matches_brute_force(descending):
+    column = random_column(7)
+    index = SortedIndex({"value": column[:200]}, ["value"])
+    index.order("value")
+    index.columns["value"] = column
+    index.extend(200)
+    mask = np.ones(len(column), dtype=bool)
+    for limit in (None, 5, 120, 280):
+        expected = brute_force_sort(column, mask, descending, limit)
+        assert index.sort("value", mask, descending, limit).tolist() == expected.tolist()
+
+
+def test_merge_matches_stable_sort():
+    values = random_column(3, missing=0)
+    order = np.argsort(values[:100], kind="stable")
+    merged, keys = merge(order, values[order], np.arange(100, 300), values[100:])
+    assert merged.tolist() == np.argsort(values, kind="stable").tolist()
+    assert np.array_equal(keys, np.sort(values))
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 5, 6])
+@pytest.mark.parametrize("descending", [True, False])
+def test_plan_fallback_with_nan_cutoff(limit, descending):
+    column = np.array([np.nan, 50, np.nan, 10, np.nan, np.nan])
+    columns = {"index": np.arange(len(column)), "value": column}
+    sorting = plan.Plan(sort="value", descending=descending, limit=limit)
+    expected = brute_force_sort(column, np.ones(len(column), dtype=bool), descending, limit)
+    # No sorted index, so the plan partitions the top rows itself
+    assert sorting.order(columns, {}, np.arange(len(column))).tolist() == expected.tolist()
@@ -0,0 +1,77 @@
+"""
+Tests for database.search
+
+:Author:    Jose Enrico Salinas
+:Version:   20181204
+"""
+
+import numpy as np
+import pytest
+from database.search import NameIndex, FuzzyIndex, PrefixCursor, edit_distance, normalize
+
+
+def levenshtein(a, b):
+    """
+    The full dynamic programming edit distance
+    """
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        previous = current
+    return previous[-1]
+
+
+@pytest.fixture
+def folded(database):
+    return [normalize(name) for name in database.columns["name"]]
+
+
+def test_prefix_and_exact_match_brute_force(database, folded):
+    index = database.indexes["name"]
+    for prefix in ("", "c", "char", "PIKA", "flabe", "mr", "zz", "é"):
+        expected = [row for row, name in enumerate(folded) if name.startswith(normalize(prefix))]
+        assert index.prefix(prefix).tolist() == expected
+    assert index.exact("FLABÉBÉ").tolist() == [row for row, name in enumerate(folded) if name == "flabebe"]
+    assert index.exact("pika").tolist() == []
+
+
+def test_cursor_matches_prefix(database):
+    index = database.indexes["name"]
+    cursor = PrefixCursor(index)
+    for text in ("c", "ch", "cha", "char", "charm", "cha", "b", "bu", "bul", "", "ze"):
+        assert cursor.positions(text).tolist() == index.prefix(text).tolist()
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_edit_distance_matches_levenshtein(seed):
+    generator = np.random.RandomState(seed)
+    for _ in range(300):
+        a = "".join(generator.choice(list("abcd"), generator.randint(0, 8)))
+        b = "".join(generator.choice(list("abcd"), generator.randint(0, 8)))
+        for limit in (0, 1, 2, 3):
+            assert edit_distance(a, b, limit) == min(levenshtein(a, b), limit + 1)
+
+
+@pytest.mark.parametrize("query", ["pikachoo", "charzard", "bulbsaur", "mew", "xxxxx", "flabebe"])
+def test_fuzzy_matches_brute_force(database, folded, query):
+    index = database.indexes["fuzzy"]
+    for distance in (1, 2):
+        expected = sorted((levenshtein(query, key), key) for key in set(folded)
+                          if levenshtein(query, key) <= distance)
+        assert index.search(query, distance, limit=len(folded)) == expected
+
+
+def test_extend_matches_rebuild():
+    names = np.array(["Pikachu", "Raichu", "Pichu", "Flabébé", "Charmander", "Pikachu", "Mew", "Mewtwo"])
+    index = NameIndex(names[:4])
+    fuzzy = FuzzyIndex(index)
+    fuzzy.search("pichu")
+    fuzzy.extend(index.extend(names[4:], 4))
+    rebuilt = NameIndex(names)
+    for prefix in ("p", "pi", "mew", "c", "flab", ""):
+        assert index.prefix(prefix).tolist() == rebuilt.prefix(prefix).tolist()
+    assert index.exact("pikachu").tolist() == [0, 5]
+    assert fuzzy.search("mewtoo") == FuzzyIndex(rebuilt).search("mewtoo")
+    assert fuzzy.positions("pikachoo").tolist() == [0, 5]
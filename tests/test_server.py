@@ -0,0 +1,110 @@
+"""
+Tests for database.server
+
+:Author:    Jose Enrico Salinas
+:Version:   20181204
+"""
+
+import asyncio
+import json
+import pytest
+from database.server import QueryService
+
+
+@pytest.fixture
+def service(database):
+    return QueryService(database)
+
+
+def respond(service, request):
+    return service.respond(json.dumps(request).encode())
+
+
+class Writer():
+    """
+    Collects what the server writes to a connection
+    """
+
+    def __init__(self):
+        self.data = b""
+        self.closed = False
+
+    def write(self, data):
+        self.data += data
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def serve_lines(service, data, limit=2 ** 16):
+    """
+    Runs one connection over the given input and returns the parsed replies
+    """
+    async def run():
+        reader = asyncio.StreamReader(limit=limit)
+        reader.feed_data(data)
+        reader.feed_eof()
+        writer = Writer()
+        await service.handle(reader, writer)
+        assert writer.closed
+        return [json.loads(line) for line in writer.data.splitlines()]
+    return asyncio.run(run())
+
+
+def test_search_matches_database(service, database):
+    response = respond(service, {"id": 1, "op": "search", "query": "type:fire sort:-speed", "limit": 5,
+                                 "fields": ["index", "speed"]})
+    expected = database.search("type:fire sort:-speed")
+    assert response["ok"] and response["id"] == 1
+    assert response["count"] == len(expected)
+    assert [row[0] for row in response["rows"]] == expected.indices[:5].tolist()
+
+
+def test_lookup_and_missing_values(service, database):
+    response = respond(service, {"op": "lookup", "index": 24, "fields": ["name", "japanese_name"]})
+    assert response["rows"] == [["Pikachu", None]]
+
+
+@pytest.mark.parametrize("request_text", [
+    b'{"op":"lookup","index":1e400}',
+    b'{"op":"lookup","index":"x"}',
+    b'{"op":"search","fields":"name"}',
+    b'{"op":"search","fields":[["name"]]}',
+    b'{"op":"search","limit":null}',
+    b'{"op":"nothing"}',
+    b'[1, 2]',
+    b'{not json',
+])
+def test_bad_requests_get_error_replies(service, request_text):
+    response = service.respond(request_text)
+    assert response["ok"] is False
+    assert response["error"]
+
+
+def test_connection_survives_bad_requests(service):
+    replies = serve_lines(service, b'{"id":1,"op":"lookup","index":1e400}\n'
+                                   b'{"id":2,"op":"lookup","index":24,"fields":["name"]}\n')
+    assert [reply["ok"] for reply in replies] == [False, True]
+    assert replies[1]["rows"] == [["Pikachu"]]
+
+
+def test_long_line_is_skipped(service):
+    long_line = b'{"id":1,"op":"search","query":"' + b"a" * 500 + b'"}\n'
+    replies = serve_lines(service, long_line + b'{"id":2,"op":"lookup","index":0,"fields":["name"]}\n'
+                                   b'{"id":3,"op":"lookup","index":3,"fields":["name"]}', limit=64)
+    assert [reply["ok"] for reply in replies] == [False, True, True]
+    assert [reply["id"] for reply in replies] == [None, 2, 3]
+    assert replies[1]["rows"] == [["Bulbasaur"]]
+
+
+def test_appended_rows_are_served(service, database):
+    respond(service, {"op": "lookup", "index": 0})
+    database.append_csv(database.database_address, chunk_size=500)
+    response = respond(service, {"op": "lookup", "index": 801 + 24, "fields": ["index", "name"]})
+    assert response["ok"], response
+    assert response["rows"] == [[24, "Pikachu"]]
+    response = respond(service, {"op": "search", "query": "name:pikachu", "fields": ["name"]})
+    assert response["rows"] == [["Pikachu"], ["Pikachu"]]
@@ -0,0 +1,81 @@
+"""
+Tests for database.similar
+
+:Author:    Jose Enrico Salinas
+:Version:   20181204
+"""
+
+import os
+import shutil
+import numpy as np
+import pytest
+from database import similar
+from database.database import Database
+from conftest import DATA
+
+
+def brute_force_nearest(points, position, candidates, limit):
+    candidates = candidates[candidates != position]
+    distances = np.sum((points[candidates].astype(np.float64) - points[position]) ** 2, axis=1)
+    return candidates[np.lexsort((candidates, distances))][:limit], np.sort(distances)[:limit]
+
+
+def test_nearest_table_matches_brute_force():
+    generator = np.random.RandomState(0)
+    points = generator.normal(size=(700, 6)).astype(np.float32)
+    table = similar.nearest_table(points, neighbors=8, block=128)
+    everyone = np.arange(len(points))
+    for position in range(0, len(points), 7):
+        expected, _ = brute_force_nearest(points, position, everyone, 8)
+        assert table[position].tolist() == expected.tolist()
+
+
+def test_standardize():
+    scaled = similar.standardize([1.0, 2.0, np.nan, 3.0])
+    assert scaled[2] == 0
+    assert np.allclose(scaled[[0, 1, 3]], [-1.2247449, 0, 1.2247449])
+    assert not similar.standardize([np.nan, np.nan]).any()
+
+
+@pytest.mark.parametrize("types", [False, True])
+@pytest.mark.parametrize("size", [False, True])
+def test_nearest_matches_brute_force(database, types, size):
+    index = database.indexes["similar"]
+    points = similar.features(database.columns, types, size)
+    generator = np.random.RandomState(1)
+    everyone = np.arange(len(database))
+    subset = np.flatnonzero(generator.random_sample(len(database)) < 0.3)
+    for position in (0, 24, 149, 500):
+        for candidates, limit in ((None, 10), (None, similar.NEIGHBORS + 5), (subset, 10)):
+            found = index.nearest(position, limit, candidates, types, size)
+            _, expected = brute_force_nearest(points, position, everyone if candidates is None else candidates,
+                                              limit)
+            assert position not in found.tolist()
+            distances = np.sum((points[found].astype(np.float64) - points[position]) ** 2, axis=1)
+            # Float32 rounding can swap rows at equal distances
+            assert np.allclose(distances, expected, atol=1e-4)
+
+
+def test_tables_are_saved_and_reloaded(tmp_path):
+    address = str(tmp_path / "data.csv")
+    shutil.copy(DATA, address)
+    table = Database(address).indexes["similar"].table(types=True)
+    reloaded = Database(address).indexes["similar"]
+    assert reloaded.load_table(reloaded.kind(True, False)) is not None
+    assert np.array_equal(reloaded.table(types=True), table)
+    assert not [name for name in os.listdir(str(tmp_path / "data.csv.snapshot")) if ".tmp" in name]
+
+
+def test_table_with_another_key_is_rebuilt(tmp_path):
+    address = str(tmp_path / "data.csv")
+    shutil.copy(DATA, address)
+    index = Database(address).indexes["similar"]
+    table = index.table()
+    saved = index.table_address(index.kind(False, False))
+    # A table saved for other data, in the same single file as its key
+    with open(saved, "wb") as table_file:
+        np.savez(table_file, table=table[::-1], key=np.array('{"sha1": "other"}'))
+    reloaded = Database(address).indexes["similar"]
+    assert reloaded.load_table(reloaded.kind(False, False)) is None
+    assert np.array_equal(reloaded.table(), table)
+    assert np.array_equal(Database(address).indexes["similar"].load_table("stats"), table)
@@ -0,0 +1,116 @@
+"""
+Tests for database.snapshot
+
+:Author:    Jose Enrico Salinas
+:Version:   20181204
+"""
+
+import csv
+import os
+import shutil
+import numpy as np
+import pytest
+from database import snapshot
+from conftest import DATA
+
+
+@pytest.fixture
+def csv_copy(tmp_path):
+    address = str(tmp_path / "data.csv")
+    shutil.copy(DATA, address)
+    return address
+
+
+def test_rebuild_keeps_loaded_columns_and_leaves_no_temporaries(csv_copy):
+    columns = snapshot.load(csv_copy)
+    attack = np.array(columns["attack"])
+    snapshot.build(csv_copy)
+    snapshot.build(csv_copy)
+    assert np.array_equal(columns["attack"], attack)
+    assert np.array_equal(snapshot.load(csv_copy)["attack"], attack)
+    directory = snapshot.snapshot_directory(csv_copy)
+    assert not [name for name in os.listdir(directory) if name.endswith(".tmp")]
+
+
+def test_failed_build_removes_its_temporaries(csv_copy, monkeypatch):
+    snapshot.build(csv_copy)
+
+    def broken(values, kind, name=""):
+        raise ValueError("broken")
+
+    monkeypatch.setattr(snapshot, "coerce", broken)
+    with pytest.raises(ValueError):
+        snapshot.build(csv_copy)
+    directory = snapshot.snapshot_directory(csv_copy)
+    assert not [name for name in os.listdir(directory) if name.endswith(".tmp")]
+
+
+def whole_file_kinds(address):
+    """
+    Infers every column's kind from all of its cells at once
+    """
+    with open(address, newline="", encoding="utf-8") as csv_file:
+        rows = list(csv.reader(csv_file))
+    names, cells = rows[0], list(zip(*rows[1:]))
+    return {name: snapshot.KINDS.get(name) or snapshot.infer_kind(list(values))
+            for name, values in zip(names, cells)}
+
+
+def same_columns(first, second):
+    assert first.keys() == second.keys()
+    for name in first:
+        left, right = first[name], second[name]
+        if isinstance(left, np.ndarray) and left.dtype.kind in "iuf":
+            assert left.dtype.kind == np.asarray(right).dtype.kind, name
+            np.testing.assert_array_equal(left, right, err_msg=name)
+        else:
+            assert [None if value != value else value for value in left] == \
+                [None if value != value else value for value in right], name
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 100, 100000])
+def test_chunked_read_matches_whole_file(chunk_size):
+    kinds, arrays = snapshot.read_csv(DATA, chunk_size)
+    assert kinds == whole_file_kinds(DATA)
+    whole_kinds, whole_arrays = snapshot.read_csv(DATA, 100000)
+    same_columns(arrays, whole_arrays)
+    assert len(arrays["name"]) == 801
+
+
+def test_kinds_widen_across_chunks(tmp_path):
+    address = str(tmp_path / "small.csv")
+    with open(address, "w", newline="") as csv_file:
+        csv_file.write("index,count,ratio,label,abilities,empty\n"
+                       "0,1,1,a,['x'],\n"
+                       "1,2,,b,\"['x', 'y']\",\n"
+                       "2,3,2.5,,[],\n"
+                       "3,,4,d,['z'],\n")
+    for chunk_size in (1, 2, 4):
+        kinds, arrays = snapshot.read_csv(address, chunk_size)
+        assert kinds == {"index": "int", "count": "float", "ratio": "float", "label": "str",
+                         "abilities": "list", "empty": "str"}
+        assert kinds == whole_file_kinds(address)
+        np.testing.assert_array_equal(arrays["count"], [1, 2, 3, np.nan])
+        assert arrays["label"] == ["a", "b", None, "d"]
+        assert arrays["abilities"] == ["['x']", "['x', 'y']", "[]", "['z']"]
+
+
+def test_bad_rows_are_rejected(tmp_path):
+    address = str(tmp_path / "bad.csv")
+    with open(address, "w", newline="") as csv_file:
+        csv_file.write("index,abilities\n0,['x']\n1,not a list\n")
+    with pytest.raises(ValueError):
+        snapshot.read_csv(address)
+    with open(address, "w", newline="") as csv_file:
+        csv_file.write("index,name\n0,a\n1\n")
+    with pytest.raises(ValueError):
+        snapshot.read_csv(address)
+
+
+def test_snapshot_matches_parsed_csv(csv_copy):
+    columns = snapshot.load(csv_copy)
+    kinds, arrays = snapshot.read_csv(csv_copy)
+    parsed = {name: snapshot.string_column(values) if kinds[name] in ("str", "list") else values
+              for name, values in arrays.items()}
+    same_columns(columns, parsed)
+    assert {name: snapshot.column_kind(name, column) for name, column in columns.items()} == kinds